@@ -5,22 +5,42 @@ AI学习陪伴助手 - 主应用入口
 为用户提供全方位的学习陪伴体验。
 """
 
+import argparse
+import asyncio
+import functools
 import gradio as gr
+import os
 import threading
+import uvicorn
 import time
 from datetime import datetime
-from typing import Dict, List, Tuple, Any
+from typing import Dict, List, Any, Optional
+from fastapi import FastAPI
 
 # 导入模块
-from core.chat_manager import ChatManager
-from core.tts_manager import TTSManager
-from game.stats_tracker import StatsTracker
-from game.achievements import AchievementManager
+from core.session_registry import session_registry, UserSession
+from core.state_backend import state_backend
+from core.tts_manager import TTSManager, speech_pool
+from core.tts_executor import tts_executor
 from ui.layouts import UILayout
 from ui.assets import CUSTOM_CSS
+from ui.stream_coalescer import StreamCoalescer, estimate_payload_bytes
+from ui.audio_route import audio_output, register_audio_route
 from utils.helpers import hex_to_audio_data
 from utils.logger import logger
-from config.settings import SERVER_NAME, SERVER_PORT, INITIAL_MESSAGE
+from utils.metrics import metrics
+from utils.prefork import PreforkSupervisor
+from utils.affinity_proxy import AffinityProxy
+from config.settings import (
+    SERVER_NAME,
+    SERVER_PORT,
+    INITIAL_MESSAGE,
+    APP_WORKERS,
+    WORKER_BASE_PORT,
+    WORKER_HEALTH_PATH,
+    WORKER_WARMUP_WAIT,
+    METRICS_LOG_INTERVAL
+)
 
 
 class StudyCompanionApp:
@@ -28,27 +48,20 @@ class StudyCompanionApp:
     AI学习陪伴应用主类
     """
     
-    def __init__(self):
-        # 初始化核心组件
-        self.chat_manager = ChatManager()
+    def __init__(self, warm_up: bool = True):
+        # 初始化核心组件（对话、统计等用户状态按会话保存在 session_registry 中）
         self.tts_manager = TTSManager()
-        self.stats_tracker = StatsTracker()
-        self.achievement_manager = AchievementManager(self.stats_tracker)
-            
-        # 应用状态
-        self.learning_active = False  # 将在创建界面后由施设置为true
-        self.rest_active = False
-        self.webcam_active = False
+        # 后台预先合成所有提醒语音，分神提醒触发时直接从内存返回（多进程模式改为 fork 前同步预热）
+        if warm_up:
+            self.tts_manager.warm_up_alerts()
+        self.sessions = session_registry
+        self.started_at = time.monotonic()
             
         # 创建 UI布局
         self.ui_layout = UILayout()
             
         # 初始化应用
         self._setup_callbacks()
-            
-        # 【修复 UX-3】默认开启学习模式
-        self.learning_active = True
-        self.start_learning_session()
         
     def _setup_callbacks(self):
         """
@@ -65,120 +78,133 @@ class StudyCompanionApp:
             'on_camera_frame': self.on_camera_frame,
             'on_update_stats': self.on_update_stats,
             'on_refresh_achievements': self.on_refresh_achievements,
-            'on_alert_trigger': self.on_alert_trigger
+            'on_alert_trigger': self.on_alert_trigger,
+            'on_play_message': self.on_play_message,
+            'on_session_end': self.on_session_end
         }
     
-    def on_style_change(self, style: str):
+    def _session(self, request: Optional[gr.Request]) -> UserSession:
+        """
+        按 Gradio 会话 ID 取出当前用户的会话状态（首次访问时创建）
+        托管部署时不运行调度器，运行指标由这里按 METRICS_LOG_INTERVAL 定期写入日志
+        """
+        metrics.report_if_due(METRICS_LOG_INTERVAL)
+        return self.sessions.get(getattr(request, "session_hash", None))
+    
+    async def _session_async(self, request: Optional[gr.Request]) -> UserSession:
+        """
+        异步回调使用的 _session：创建或刷新会话时可能读取网络状态后端，在线程中执行，不阻塞事件循环
+        """
+        return await asyncio.to_thread(self._session, request)
+    
+    def _complete_turn(self, session: UserSession) -> List[Dict[str, Any]]:
+        """
+        一轮对话结束后的收尾：检查新成就、保存对话状态并重新估算会话内存占用，返回新解锁的成就
+        会读写状态后端（网络后端时是阻塞调用），由异步回调放到线程中执行
+        """
+        new_achievements = session.achievement_manager.check_and_unlock_achievements()
+        session.persist()
+        self.sessions.account(session)
+        return new_achievements
+    
+    def on_session_end(self, request: gr.Request = None):
+        """
+        页面关闭回调 - 立即释放该会话的状态
+        """
+        self.sessions.remove(getattr(request, "session_hash", None))
+    
+    def on_style_change(self, style: str, request: gr.Request = None):
         """
         角色风格改变回调
         """
         logger.info(f"Changing character style to: {style}")
-        self.chat_manager.set_character_style(style)
-        self.tts_manager.set_voice(style)
+        self._session(request).chat_manager.set_character_style(style)
         return f"角色风格已切换为：{style}"
     
-    def on_webcam_toggle(self, active: bool):
+    def on_webcam_toggle(self, active: bool, request: gr.Request = None):
         """
         摄像头开关回调
         """
-        self.webcam_active = active
+        self._session(request).webcam_active = active
         if active:
             return "摄像头已开启"
         else:
             return "摄像头已关闭"
     
-    def on_learning_mode_toggle(self, active: bool):
+    def on_learning_mode_toggle(self, active: bool, request: gr.Request = None):
         """
         学习模式开关回调
         """
-        self.learning_active = active
+        session = self._session(request)
         if active:
             # 开启学习模式时初始化
-            self.start_learning_session()
+            session.start_learning()
             return gr.Button(value="停止学习", interactive=True)
         else:
-            self.stop_learning_session()
+            session.stop_learning()
             return gr.Button(value="开始学习", interactive=True)
     
-    def start_learning_session(self):
-        """
-        开始学习会话
-        """
-        # 初始化统计数据
-        if not self.stats_tracker.user_data["firstStudyDate"]:
-            self.stats_tracker.user_data["firstStudyDate"] = self.stats_tracker.get_today_str()
-        
-        self.stats_tracker.user_data["lastStudyDate"] = self.stats_tracker.get_today_str()
-        
-        # 检查签到
-        self.stats_tracker.handle_check_in()
-        
-        # 添加初始消息
-        if not self.chat_manager.get_chat_history():
-            self.chat_manager.ai_agent.add_message("assistant", INITIAL_MESSAGE)
-    
-    def stop_learning_session(self):
-        """
-        结束学习会话
-        """
-        self.learning_active = False
-        self.rest_active = False
-    
-    def on_checkin_click(self):
+    def on_checkin_click(self, request: gr.Request = None):
         """
         签到按钮点击回调
         """
-        if not self.learning_active:
+        session = self._session(request)
+        if not session.learning_active:
             return "", "请先开启学习模式！"
         
-        result = self.stats_tracker.handle_check_in()
+        result = session.stats_tracker.handle_check_in()
         if result["is_new"]:
             message = f"签到成功！获得{result['bonus']}积分，当前连续签到{result['consecutive_days']}天。"
         else:
             message = f"今日已签到，连续签到{result['consecutive_days']}天。"
         
         # 检查是否有新成就解锁
-        new_achievements = self.achievement_manager.check_and_unlock_achievements()
+        new_achievements = session.achievement_manager.check_and_unlock_achievements()
         if new_achievements:
             achievement_names = [a["name"] for a in new_achievements]
             message += f"\n🎉 解锁新成就: {', '.join(achievement_names)}"
         
         return "", message
     
-    def on_rest_click(self):
+    def on_rest_click(self, request: gr.Request = None):
         """
         休息按钮点击回调
         """
-        if not self.learning_active:
+        session = self._session(request)
+        if not session.learning_active:
             return "", "请先开启学习模式！"
         
-        self.rest_active = not self.rest_active
+        session.rest_active = not session.rest_active
         
-        if self.rest_active:
+        if session.rest_active:
             # 开始休息
-            self.stats_tracker.increment_early_end_rest()
+            session.stats_tracker.increment_early_end_rest()
             return "", "开始休息模式，点击按钮结束休息"
         else:
             # 结束休息
             return "", "结束休息，继续学习！"
     
-    def on_reset_chat(self):
+    def on_reset_chat(self, request: gr.Request = None):
         """
         重置聊天回调
         """
-        self.chat_manager.reset_chat()
-        self.chat_manager.ai_agent.add_message("assistant", INITIAL_MESSAGE)
-        return [(None, INITIAL_MESSAGE)], "对话已重置"
+        session = self._session(request)
+        session.chat_manager.reset_chat()
+        session.chat_manager.add_greeting(INITIAL_MESSAGE)
+        session.persist()
+        return session.chat_manager.get_transcript(), "对话已重置"
     
-    def on_send_message(self, user_input: str, chat_history: List[Tuple[str, str]], style: str, voice_enabled: bool):
+    async def on_send_message(self, user_input: str, style: str, voice_enabled: bool, request: gr.Request = None):
         """
-        发送消息回调 - 流式版本
+        发送消息回调 - 异步流式版本（等待模型输出期间不占用 Gradio 工作线程）
+        对话记录以服务端会话中保存的为准：浏览器只上传本条消息，不再上传整段对话，
+        请求大小与对话长度无关；流式输出的后续帧由 Gradio 按与上一帧的差异发送
             
         Args:
             user_input: 用户输入的文本
-            chat_history: Gradio Chatbot 的历史记录（列表格式）
             style: 当前选择的角色风格
             voice_enabled: 是否启用语音播报
+            request: Gradio 请求（用于定位当前用户的会话）
                 
         Yields:
             (updated_history, input_status, audio_data)
@@ -188,57 +214,67 @@ class StudyCompanionApp:
             
         if not user_input or not user_input.strip():
             logger.debug("[CHAT_INPUT] 消息为空, 返回空应答")
-            yield chat_history or [], "请输入有效内容", None
+            yield gr.update(), "请输入有效内容", None
             return
             
         logger.info(f"[CHAT_INPUT] ✅ 消息有效, 开始处理")
             
-        if not self.learning_active:
+        session = await self._session_async(request)
+        if not session.learning_active:
             logger.warning("[CHAT_INPUT] ⚠️ 学习模式未开启")
-            yield chat_history or [], "请先开启学习模式！", None
+            yield gr.update(), "请先开启学习模式！", None
             return
             
         # 设置当前风格
-        self.chat_manager.set_character_style(style)
+        chat_manager = session.chat_manager
+        chat_manager.set_character_style(style)
             
-        # 初始化更新的历史记录
-        updated_history = (chat_history or []).copy()
+        # 以服务端保存的对话记录为基础，追加本轮消息
+        updated_history = chat_manager.get_transcript()
         updated_history.append({"role": "user", "content": user_input})
         updated_history.append({"role": "assistant", "content": ""})
             
         try:
-            logger.debug(f"[CHAT_PROCESS] 调用 chat_manager.send_message_stream()...")
+            logger.debug(f"[CHAT_PROCESS] 调用 chat_manager.send_message_stream_async()...")
             logger.debug(f"[CHAT_PROCESS] 输入参数: user_input={user_input[:50]}..., voice_enabled={voice_enabled}")
                         
-            # 流式获取 AI 回复和语龊数据
+            # 流式获取 AI 回复和逐句合成的语音
             full_response = ""
-            audio_data = None
+            audio_segment_count = 0
+            # 合并上游增量，减少整段历史的重复序列化与发送
+            coalescer = StreamCoalescer(base_payload_bytes=estimate_payload_bytes(updated_history))
                         
-            for result in self.chat_manager.send_message_stream(user_input):
+            # 未开启语音时不做任何语音合成，用户之后可以点击消息按需播放
+            async for result in chat_manager.send_message_stream_async(user_input, voice_enabled):
                 text_chunk = result.get("text", "")
                 is_streaming = result.get("is_streaming", False)
                             
-                if is_streaming:
+                audio_segment = result.get("audio", None)
+                            
+                if audio_segment:
+                    # 新的语音帧：追加到流式播放器，顺带刷新已累积的文本
+                    audio_segment_count += 1
+                    logger.debug(f"[CHAT_STREAM] 第 {audio_segment_count} 帧语音: {len(audio_segment)} bytes")
+                    updated_history[-1]["content"] = full_response
+                    coalescer.record_frame(full_response)
+                    yield updated_history, "", audio_segment
+                elif result.get("text_done"):
+                    # 文本已全部生成（语音仍在合成）：立即显示合并器中尚未刷新的文本，不等下一帧语音
+                    if coalescer.flush():
+                        updated_history[-1]["content"] = full_response
+                        coalescer.record_frame(full_response)
+                        yield updated_history, "", None
+                elif is_streaming:
                     # 文本流式输出阶段
                     full_response += text_chunk
-                    updated_history[-1]["content"] = full_response
                     logger.debug(f"[CHAT_STREAM] 接收文本块: {len(text_chunk)} 字符")
-                    yield updated_history, "", None  # 逐字更新前端，不播放语龊
-                else:
-                    # 流式完成，获取音频数据
-                    audio_data = result.get("audio", None)
-                    logger.debug(f"[CHAT_STREAM] 流式完成，音频数据类型: {type(audio_data).__name__}")
-                    if audio_data:
-                        if isinstance(audio_data, bytes):
-                            logger.debug(f"[CHAT_STREAM] 音频字节数: {len(audio_data)} bytes")
-                            logger.debug(f"[CHAT_STREAM] 音频头部: {audio_data[:16]}")
-                        else:
-                            logger.warning(f"[CHAT_STREAM] 音频数据类型预有: {type(audio_data).__name__}")
-                    else:
-                        logger.warning("[CHAT_STREAM] 音频数据为None")
+                    if coalescer.add(text_chunk):
+                        updated_history[-1]["content"] = full_response
+                        coalescer.record_frame(full_response)
+                        yield updated_history, "", None  # 按刷新策略更新前端，不追加语音
                         
-            # 检查新成就
-            new_achievements = self.achievement_manager.check_and_unlock_achievements()
+            # 检查新成就、保存对话状态，并重新估算会话内存占用
+            new_achievements = await asyncio.to_thread(self._complete_turn, session)
             if new_achievements:
                 achievement_names = [a["name"] for a in new_achievements]
                 notification = f"🎉 解锁新成就: {', '.join(achievement_names)}"
@@ -246,18 +282,39 @@ class StudyCompanionApp:
                 notification = ""  # 清空输入框，不显示提示
                         
             logger.info(f"[CHAT_PROCESS] ✅ 消息处理完成, 通知: {notification}")
-            logger.info(f"[CHAT_PROCESS] 语龊启用: {voice_enabled}, 音频数据是否存在: {audio_data is not None}")
+            logger.info(f"[CHAT_PROCESS] 语龊启用: {voice_enabled}, 语音帧数: {audio_segment_count}")
                         
-            # 如果启用了语龊，返回音频数据；否则返回 None
-            final_audio = audio_data if voice_enabled else None
-            logger.debug(f"[CHAT_PROCESS] 最终返回音频: {type(final_audio).__name__} {'(' + str(len(final_audio)) + ' bytes)' if isinstance(final_audio, bytes) else ''}")
-            yield updated_history, notification, final_audio
+            # 语音已按句流式发送，最后一帧只更新文本
+            updated_history[-1]["content"] = full_response
+            coalescer.record_frame(full_response)
+            coalescer.finish()
+            yield updated_history, notification, None
                         
         except Exception as e:
             error_msg = f"发送消息时出现错误: {str(e)}"
             logger.error(f"[CHAT_ERROR] {error_msg}", exc_info=True)
             yield updated_history, error_msg, None
     
+    async def on_play_message(self, style: str, evt: gr.SelectData, request: gr.Request = None):
+        """
+        点击聊天消息回调 - 按需合成并播放该条消息的语音
+        按点击位置从服务端保存的对话记录中取出消息（不上传整段对话）
+        返回音频 URL，重复播放同一条消息时浏览器直接使用缓存
+        """
+        chat_manager = (await self._session_async(request)).chat_manager
+        chat_history = chat_manager.get_chat_history()
+        index = evt.index[0] if isinstance(evt.index, (list, tuple)) else evt.index
+        if not isinstance(index, int) or not 0 <= index < len(chat_history):
+            return None
+        message = chat_history[index]
+        content = message.content
+        if message.role != "assistant":
+            return None
+            
+        logger.info(f"[PLAY_MESSAGE] 按需播放第 {index} 条消息, 长度: {len(content)}")
+        chat_manager.set_character_style(style)
+        return audio_output(await chat_manager.synthesize_message(content), request)
+    
     def on_camera_frame(self, frame):
         """
         摄像头帧处理回调
@@ -266,11 +323,11 @@ class StudyCompanionApp:
         # 目前只是简单返回原始帧
         return frame
     
-    def on_update_stats(self):
+    def on_update_stats(self, request: gr.Request = None):
         """
         更新统计信息回调
         """
-        stats = self.stats_tracker.get_stats_summary()
+        stats = self._session(request).stats_tracker.get_stats_summary()
         
         return (
             stats["points"],
@@ -281,18 +338,19 @@ class StudyCompanionApp:
             stats["achievementsCount"]
         )
     
-    def on_refresh_achievements(self):
+    def on_refresh_achievements(self, request: gr.Request = None):
         """
         刷新成就回调
         """
-        achievements_status = self.achievement_manager.get_all_achievements_status()
+        achievements_status = self._session(request).achievement_manager.get_all_achievements_status()
         return achievements_status
     
-    def on_alert_trigger(self, trigger_val: str, style: str):
+    def on_alert_trigger(self, trigger_val: str, style: str, request: gr.Request = None):
         """
         分神提醒回调 - 当检测到用户分神时触发
+        提醒语音以 URL 下发，同一条提醒反复触发时浏览器直接使用缓存
         """
-        if not trigger_val or not self.learning_active:
+        if not trigger_val or not self._session(request).learning_active:
             return None
             
         logger.info(f"[ALERT] 检测到分神, 触发值: {trigger_val}, 风格: {style}")
@@ -323,7 +381,7 @@ class StudyCompanionApp:
             else:
                 logger.warning(f"[ALERT] 提醒语音生成失败")
                 
-            return audio_bytes
+            return audio_output(audio_bytes, request)
                 
         except Exception as e:
             logger.error(f"[ALERT_ERROR] 提醒回调失败: {str(e)}", exc_info=True)
@@ -341,16 +399,104 @@ class StudyCompanionApp:
         logger.info(f"Access URL: http://{SERVER_NAME}:{SERVER_PORT}")
         print(f"访问地址: http://{SERVER_NAME}:{SERVER_PORT}")
         
-        # 启动应用
-        interface.launch(
-            server_name=SERVER_NAME,
-            server_port=SERVER_PORT,
-            share=share,
-            debug=debug,
+        if share:
+            # 公网分享链接只能由 Gradio 自行启动，此时没有音频路由，语音由 Gradio 文件服务提供
+            interface.launch(
+                server_name=SERVER_NAME,
+                server_port=SERVER_PORT,
+                share=share,
+                debug=debug,
+                theme=gr.themes.Soft(),
+                css=CUSTOM_CSS,
+                js=combined_js if combined_js else None  # 【修复】回复 Gradio 6.0 点管理 js 参数 + 页面重载检测
+            )
+            return
+        
+        # 启动应用：音频路由与 Gradio 挂载在同一个 FastAPI 应用上
+        server_app = self._build_server_app(interface, combined_js)
+        uvicorn.run(server_app, host=SERVER_NAME, port=SERVER_PORT, log_level="debug" if debug else "info")
+    
+    def _build_server_app(self, interface: gr.Blocks, combined_js: Optional[str]) -> FastAPI:
+        """
+        创建服务端应用：音频路由、健康检查和 Gradio 界面挂载在同一个 FastAPI 应用上
+        """
+        server_app = FastAPI()
+        register_audio_route(server_app)
+        server_app.add_api_route(WORKER_HEALTH_PATH, self.health_status, methods=["GET"])
+        return gr.mount_gradio_app(
+            server_app,
+            interface,
+            path="/",
             theme=gr.themes.Soft(),
             css=CUSTOM_CSS,
-            js=combined_js if combined_js else None  # 【修复】回复 Gradio 6.0 点管理 js 参数 + 页面重载检测
+            js=combined_js if combined_js else None
         )
+    
+    async def health_status(self) -> Dict[str, Any]:
+        """
+        健康检查：在事件循环中直接返回，事件循环卡住时检查超时，由主进程重启该工作进程
+        同时返回本进程的运行指标（准入、对冲、超时等计数器）
+        """
+        return {
+            "status": "ok",
+            "pid": os.getpid(),
+            "uptime": round(time.monotonic() - self.started_at, 1),
+            "sessions": self.sessions.get_stats(),
+            "tts": tts_executor.get_stats(),
+            "metrics": metrics.snapshot()
+        }
+    
+    def run_production(self, workers: int, debug=False):
+        """
+        多进程生产模式运行应用：
+            1. 主进程导入所有模块、构建界面和服务端应用（STYLE_PROMPTS、合并后的 JS 等只读数据），并预热提醒语音
+            2. fork 出 workers 个工作进程，以写时复制方式共享上述内存，各自监听 127.0.0.1 上的独立端口
+            3. fork 出一个路由进程监听 SERVER_PORT，按会话把请求转发到固定的工作进程
+        主进程只负责监控，子进程崩溃或健康检查连续失败时自动重启
+        多个工作进程之间不共享内存中的会话，工作进程重启后需要 STATE_BACKEND=redis 才能恢复用户状态
+        """
+        if not hasattr(os, "fork"):
+            logger.warning("[PREFORK] 当前平台不支持 fork，以单进程模式运行")
+            self.tts_manager.warm_up_alerts()
+            run_scheduler()
+            self.run(debug=debug)
+            return
+        
+        # Gradio 的统计上报在后台线程中进行，fork 前不能有其它线程在运行
+        os.environ.setdefault("GRADIO_ANALYTICS_ENABLED", "False")
+        interface, combined_js = self.ui_layout.create_main_layout(self.callbacks)
+        server_app = self._build_server_app(interface, combined_js)
+        
+        # 在主进程中预热提醒语音，所有工作进程共享结果；之后停止合成线程并关闭合成连接，
+        # 避免子进程继承被占用的锁或与其它进程共用同一个连接（子进程中的合成线程在 fork 后重新启动）
+        self.tts_manager.warm_up_alerts(timeout=WORKER_WARMUP_WAIT)
+        tts_executor.stop(timeout=WORKER_WARMUP_WAIT)
+        speech_pool.close()
+        
+        log_level = "debug" if debug else "info"
+        supervisor = PreforkSupervisor()
+        upstreams = []
+        for index in range(workers):
+            port = WORKER_BASE_PORT + index
+            upstreams.append(f"http://127.0.0.1:{port}")
+            supervisor.add(f"worker-{index}", functools.partial(_serve_worker, server_app, port, log_level),
+                           health_address=("127.0.0.1", port))
+        router = AffinityProxy(upstreams)
+        router_host = "127.0.0.1" if SERVER_NAME in ("0.0.0.0", "::") else SERVER_NAME
+        supervisor.add("router", functools.partial(router.serve, SERVER_NAME, SERVER_PORT, log_level),
+                       health_address=(router_host, SERVER_PORT))
+        
+        print(f"AI学习陪伴助手启动中（{workers} 个工作进程）...")
+        print(f"访问地址: http://{SERVER_NAME}:{SERVER_PORT}")
+        supervisor.run()
+
+
+def _serve_worker(server_app: FastAPI, port: int, log_level: str):
+    """
+    工作进程入口（fork 之后运行）：启动本进程的后台调度器，只在本机端口上接收路由进程转发的请求
+    """
+    run_scheduler()
+    uvicorn.run(server_app, host="127.0.0.1", port=port, log_level=log_level)
 
 
 def run_scheduler():
@@ -363,6 +509,12 @@ def run_scheduler():
                 # 每分钟检查一次（在学习活跃状态下）
                 time.sleep(60)
                 
+                # 定期导出运行指标（请求路径上也会触发，两者共用同一个间隔）
+                metrics.report_if_due(METRICS_LOG_INTERVAL)
+                
+                # 清理进程内状态后端中过期的条目（空闲会话由会话注册表自己的回收线程释放）
+                state_backend.reap_expired()
+                
                 # 注意：在实际实现中，我们需要一个全局的应用实例来访问状态
                 # 这里简化处理，实际应用中应有更好的设计
                 
@@ -378,12 +530,22 @@ def run_scheduler():
 
 
 if __name__ == "__main__":
-    # 启动后台调度器
-    run_scheduler()
+    parser = argparse.ArgumentParser(description="AI学习陪伴助手")
+    parser.add_argument('--workers', type=int, default=APP_WORKERS,
+                        help="工作进程数，大于 1 时以多进程生产模式运行（默认读取 APP_WORKERS）")
+    args = parser.parse_args()
     
-    # 创建并运行应用
-    app = StudyCompanionApp()
-    app.run(debug=True)
+    if args.workers > 1:
+        # 多进程生产模式：提醒语音在 fork 前同步预热，调度器在每个工作进程中各自启动
+        app = StudyCompanionApp(warm_up=False)
+        app.run_production(args.workers)
+    else:
+        # 启动后台调度器
+        run_scheduler()
+        
+        # 创建并运行应用
+        app = StudyCompanionApp()
+        app.run(debug=True)
 else:
     # 魔搭创空间部署模式：创建全局 demo 对象
     # 在这个模式下，Gradio 会自动调用 demo.launch()
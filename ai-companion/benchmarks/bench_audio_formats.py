@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+⏱️ 语音下发格式基准测试
+对每种合成格式（TTS_AUDIO_FORMAT 可选值）比较：
+    - 下发给浏览器的单条回复音频大小
+    - 服务端每条回复的 CPU 耗时：旧路径（gr.Audio(type="numpy")：解码为数组再编码为 WAV）
+      与新路径（合成结果原样透传）
+
+压缩格式需要本机有 ffmpeg 才能实际编码/解码；没有 ffmpeg 时按标称码率估算大小，并跳过其解码耗时
+
+用法:
+    python benchmarks/bench_audio_formats.py [--seconds S] [--rounds N]
+"""
+
+import argparse
+import io
+import os
+import shutil
+import subprocess
+import sys
+import time
+import wave
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.audio_format import parse_audio_format  # noqa: E402
+from utils.audio_processing import array_to_wav  # noqa: E402
+
+FORMATS = [
+    "WAV_22050HZ_MONO_16BIT",
+    "WAV_16000HZ_MONO_16BIT",
+    "MP3_22050HZ_MONO_256KBPS",
+    "MP3_16000HZ_MONO_128KBPS",
+    "OGG_OPUS_16KHZ_MONO_32KBPS",
+]
+
+_FFMPEG_CODECS = {"MP3": ["-f", "mp3", "-c:a", "libmp3lame"], "OGG_OPUS": ["-f", "ogg", "-c:a", "libopus"]}
+
+
+def synthetic_speech(seconds: float, sample_rate: int) -> np.ndarray:
+    """生成类似语音的测试信号：带音节包络的谐波 + 少量噪声（固定随机种子）"""
+    rng = np.random.default_rng(42)
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    pitch = 180 + 30 * np.sin(2 * np.pi * 0.7 * t)
+    phase = 2 * np.pi * np.cumsum(pitch) / sample_rate
+    voiced = sum(np.sin(k * phase) / k for k in range(1, 8))
+    envelope = np.clip(np.sin(2 * np.pi * 3.5 * t), 0, None) ** 0.5
+    signal = 0.3 * voiced * envelope + 0.01 * rng.standard_normal(len(t))
+    return (np.clip(signal, -1, 1) * 32767).astype('<i2')
+
+
+def ffmpeg_encode(wav_bytes: bytes, codec: str, bitrate_kbps: int):
+    """用 ffmpeg 把 WAV 编码为压缩格式，失败时返回 None"""
+    command = ["ffmpeg", "-loglevel", "error", "-i", "pipe:0", *_FFMPEG_CODECS[codec],
+               "-b:a", f"{bitrate_kbps}k", "pipe:1"]
+    result = subprocess.run(command, input=wav_bytes, capture_output=True)
+    return result.stdout if result.returncode == 0 and result.stdout else None
+
+
+def legacy_roundtrip(payload: bytes, spec) -> bytes:
+    """旧路径：解码为 NumPy 数组，再重新编码为 WAV 下发"""
+    if spec.codec == "WAV":
+        with wave.open(io.BytesIO(payload)) as wav_file:
+            rate = wav_file.getframerate()
+            samples = np.frombuffer(wav_file.readframes(wav_file.getnframes()), dtype='<i2')
+    else:
+        decoded = subprocess.run(["ffmpeg", "-loglevel", "error", "-i", "pipe:0", "-f", "s16le", "pipe:1"],
+                                 input=payload, capture_output=True).stdout
+        samples = np.frombuffer(decoded, dtype='<i2')
+        rate = spec.sample_rate
+    output = io.BytesIO()
+    with wave.open(output, 'wb') as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(rate)
+        wav_file.writeframes(samples.tobytes())
+    return output.getvalue()
+
+
+def passthrough(payload: bytes, spec) -> bytes:
+    """新路径：合成结果原样写出"""
+    output = io.BytesIO()
+    output.write(payload)
+    return output.getvalue()
+
+
+def cpu_time(func, payload: bytes, spec, rounds: int) -> float:
+    """每条回复的平均 CPU 时间（毫秒，含子进程）"""
+    start = time.process_time()
+    children_start = os.times().children_user + os.times().children_system
+    for _ in range(rounds):
+        func(payload, spec)
+    children = os.times().children_user + os.times().children_system - children_start
+    return (time.process_time() - start + children) / rounds * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="语音下发格式基准测试")
+    parser.add_argument('--seconds', type=float, default=6.0, help="单条回复的音频时长")
+    parser.add_argument('--rounds', type=int, default=50, help="每种格式的重复次数")
+    args = parser.parse_args()
+    has_ffmpeg = shutil.which("ffmpeg") is not None
+
+    print("=" * 78)
+    print("⏱️ 语音下发格式基准测试")
+    print("=" * 78)
+    print(f"\n📄 单条回复 {args.seconds:.1f}s, 每种格式 {args.rounds} 轮, ffmpeg: {'可用' if has_ffmpeg else '不可用'}")
+    print(f"\n   {'格式':<28} {'下发大小':>12} {'旧路径 CPU':>12} {'新路径 CPU':>12}")
+
+    for name in FORMATS:
+        spec = parse_audio_format(name)
+        wav_bytes = array_to_wav(synthetic_speech(args.seconds, spec.sample_rate), spec.sample_rate)
+        payload = wav_bytes if spec.codec == "WAV" else (
+            ffmpeg_encode(wav_bytes, spec.codec, spec.bitrate_kbps) if has_ffmpeg else None)
+
+        if payload is None:
+            estimated = int(args.seconds * spec.bitrate_kbps * 1000 / 8)
+            print(f"   {name:<28} {estimated / 1024:9.1f} KB* {'n/a':>12} {'~0':>12}")
+            continue
+        legacy_ms = cpu_time(legacy_roundtrip, payload, spec, args.rounds)
+        new_ms = cpu_time(passthrough, payload, spec, args.rounds)
+        print(f"   {name:<28} {len(payload) / 1024:9.1f} KB  {legacy_ms:9.3f} ms {new_ms:9.3f} ms")
+
+    if not has_ffmpeg:
+        print("\n   * 未安装 ffmpeg，压缩格式按标称码率估算大小")
+
+
+if __name__ == "__main__":
+    main()
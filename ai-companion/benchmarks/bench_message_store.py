@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+⏱️ 会话消息存储内存基准测试
+用 tracemalloc 统计一个会话进行 N 轮对话后，对话记录占用的 Python 内存：
+    旧结构：AIAgent.conversation_history（带 token 字段的 dict，deque 限长）
+            + ChatManager.chat_history（不限长的 dict 列表，语音帧字节内联保存）
+    新结构：core/message_store.py 的统一消息存储（__slots__ 记录、角色驻留、语音只保存音频存储中的文件名）
+结果换算为每 1000 轮对话的字节数；语音写入临时目录中的音频存储，磁盘占用不计入
+
+用法:
+    python benchmarks/bench_message_store.py [--turns N] [--audio-frames F] [--frame-bytes B]
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import tracemalloc
+from collections import deque
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 语音写入临时目录，避免污染正式的音频存储
+_AUDIO_DIR = tempfile.mkdtemp(prefix="bench-audio-")
+os.environ["AUDIO_STORE_DIR"] = _AUDIO_DIR
+
+from config.settings import HISTORY_LIMIT, SUMMARY_MAX_PENDING_MESSAGES  # noqa: E402
+from core.chat_manager import ChatManager  # noqa: E402
+from core.context_window import estimate_tokens, MESSAGE_OVERHEAD_TOKENS  # noqa: E402
+
+SENTENCES = [
+    "对称轴公式是 x = -b / 2a，我们一步一步来看。", "先把题目里的已知条件列出来。",
+    "这一步很多同学都会卡住，别着急。", "你可以先画个草图，看看开口方向。",
+    "把 a、b、c 分别代进去算一下。", "算完以后记得检查一下符号。",
+    "学累了就起来活动一下，喝口水再继续。", "今天的进度已经很不错了！",
+    "如果还不明白，我们换一道类似的题练习。", "顶点坐标也可以用配方法求出来。",
+]
+
+
+class LegacyHistory:
+    """旧结构的复刻：模型上下文和界面记录各存一份，语音帧内联保存"""
+
+    def __init__(self):
+        self.conversation_history = deque(maxlen=HISTORY_LIMIT)
+        self.pending = []  # 移出窗口、等待摘要的消息
+        self.chat_history = []
+
+    def add_message(self, role: str, content: str):
+        if len(self.conversation_history) == self.conversation_history.maxlen:
+            self.pending.append(self.conversation_history.popleft())
+            del self.pending[:-SUMMARY_MAX_PENDING_MESSAGES]
+        self.conversation_history.append({
+            "role": role,
+            "content": content,
+            "tokens": estimate_tokens(content) + MESSAGE_OVERHEAD_TOKENS
+        })
+
+    def turn(self, question: str, answer: str, frames):
+        self.add_message("user", question)
+        self.add_message("assistant", answer)
+        self.chat_history.append({"role": "user", "content": question})
+        self.chat_history.append({"role": "assistant", "content": answer, "audio": frames or None})
+
+
+def make_turn(rng: random.Random, index: int, audio_frames: int, frame_bytes: int):
+    question = f"第 {index} 个问题：" + "".join(rng.sample(SENTENCES, 2))
+    answer = f"第 {index} 个回答：" + "".join(rng.choices(SENTENCES, k=rng.randint(3, 8)))
+    frames = [rng.randbytes(frame_bytes) for _ in range(audio_frames)]
+    return question, answer, frames
+
+
+def measure(build) -> int:
+    """返回 build() 返回的对象在内存中保留的字节数"""
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    holder = build()
+    retained = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    del holder
+    return retained
+
+
+def run_legacy(turns: int, audio_frames: int, frame_bytes: int):
+    rng = random.Random(42)
+    history = LegacyHistory()
+    for i in range(turns):
+        history.turn(*make_turn(rng, i, audio_frames, frame_bytes))
+    return history
+
+
+def run_unified(turns: int, audio_frames: int, frame_bytes: int):
+    rng = random.Random(42)
+    manager = ChatManager()
+    manager.ai_agent.summarizer.schedule = lambda: None  # 不调用模型
+    for i in range(turns):
+        question, answer, frames = make_turn(rng, i, audio_frames, frame_bytes)
+        turn_start = len(manager.messages)
+        manager.ai_agent.add_message("user", question)
+        manager.ai_agent.add_message("assistant", answer)
+        manager._finish_turn(turn_start, answer, b"".join(frames))
+        del frames
+    return manager
+
+
+def report(title: str, turns: int, audio_frames: int, frame_bytes: int):
+    # ChatManager 自身的固定开销（HTTP 客户端、语音管理器等）不计入，只统计对话记录
+    empty = measure(lambda: run_unified(0, audio_frames, frame_bytes))
+    legacy = measure(lambda: run_legacy(turns, audio_frames, frame_bytes))
+    unified = measure(lambda: run_unified(turns, audio_frames, frame_bytes)) - empty
+    scale = 1000 / turns
+    print(f"\n{title}")
+    print(f"   旧结构（双份历史 + 内联语音）: {legacy * scale / 1024:10.1f} KB / 1000 轮")
+    print(f"   统一消息存储                 : {unified * scale / 1024:10.1f} KB / 1000 轮 "
+          f"({legacy / max(unified, 1):.1f}x 更小)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="会话消息存储内存基准测试")
+    parser.add_argument('--turns', type=int, default=1000, help="对话轮数")
+    parser.add_argument('--audio-frames', type=int, default=6, help="开启语音时每条回复的音频帧数")
+    parser.add_argument('--frame-bytes', type=int, default=8192, help="每帧音频的字节数")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("⏱️ 会话消息存储内存基准测试")
+    print("=" * 60)
+
+    try:
+        report(f"📝 纯文本（{args.turns} 轮对话）", args.turns, 0, 0)
+        report(f"🔊 开启语音（{args.turns} 轮对话，每条回复 {args.audio_frames} x {args.frame_bytes} bytes）",
+               args.turns, args.audio_frames, args.frame_bytes)
+    finally:
+        shutil.rmtree(_AUDIO_DIR, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
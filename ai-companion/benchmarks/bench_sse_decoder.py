@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+⏱️ SSE 解码器微基准测试
+回放录制的魔搭（ModelScope）流式响应，对比旧的逐行 json.loads 解析方式
+与 core/sse_decoder.py 中增量字节解码器的每 token 解析开销
+
+用法:
+    python benchmarks/bench_sse_decoder.py [录制文件.sse ...] [--rounds N]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.sse_decoder import SSEDecoder  # noqa: E402
+
+DEFAULT_RECORDING = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'modelscope_stream_sample.sse')
+
+
+def split_into_network_chunks(raw: bytes, seed: int = 42):
+    """按近似真实网络包的大小把录制数据切块（固定随机种子保证可复现）"""
+    rng = random.Random(seed)
+    chunks = []
+    pos = 0
+    while pos < len(raw):
+        size = rng.choice([64, 200, 512, 1024, 1400, 4096])
+        chunks.append(raw[pos:pos + size])
+        pos += size
+    return chunks
+
+
+def legacy_decode(chunks):
+    """旧实现：模拟 response.iter_lines() + 每行 decode + json.loads"""
+    deltas = []
+    pending = b''
+    for chunk in chunks:
+        pending += chunk
+        lines = pending.split(b'\n')
+        pending = lines.pop()
+        for line in lines:
+            if not line:
+                continue
+            line_text = line.decode('utf-8')
+            if line_text.startswith('data: '):
+                data_str = line_text[6:]
+                if data_str.strip() == '[DONE]':
+                    return deltas
+                try:
+                    data = json.loads(data_str)
+                    if 'choices' in data and len(data['choices']) > 0:
+                        content = data['choices'][0].get('delta', {}).get('content', '')
+                        if content:
+                            deltas.append(content)
+                except json.JSONDecodeError:
+                    continue
+    return deltas
+
+
+def decoder_decode(chunks):
+    """新实现：增量字节解码器"""
+    decoder = SSEDecoder()
+    deltas = []
+    for chunk in chunks:
+        deltas.extend(decoder.feed(chunk))
+        if decoder.done:
+            return deltas
+    deltas.extend(decoder.flush())
+    return deltas
+
+
+def bench(func, chunks, rounds):
+    """运行 rounds 次并返回 (每轮耗时秒, 结果)"""
+    result = func(chunks)
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func(chunks)
+    return (time.perf_counter() - start) / rounds, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SSE 解码器微基准测试")
+    parser.add_argument('recordings', nargs='*', default=[DEFAULT_RECORDING], help="录制的 SSE 流文件")
+    parser.add_argument('--rounds', type=int, default=2000, help="每个实现的回放轮数")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("⏱️ SSE 解码器基准测试")
+    print("=" * 60)
+
+    for path in args.recordings:
+        with open(path, 'rb') as f:
+            raw = f.read()
+        chunks = split_into_network_chunks(raw)
+
+        legacy_time, legacy_result = bench(legacy_decode, chunks, args.rounds)
+        decoder_time, decoder_result = bench(decoder_decode, chunks, args.rounds)
+        tokens = len(legacy_result)
+
+        print(f"\n📄 {os.path.basename(path)}: {len(raw)} bytes, {len(chunks)} 个数据块, {tokens} 个增量")
+        if ''.join(legacy_result) != ''.join(decoder_result):
+            print("❌ 两种实现的输出不一致！")
+            continue
+        print(f"   旧实现 (iter_lines + json.loads): {legacy_time * 1e6:9.1f} µs/流, "
+              f"{legacy_time / max(tokens, 1) * 1e9:7.0f} ns/token")
+        print(f"   新实现 (SSEDecoder 快路径):       {decoder_time * 1e6:9.1f} µs/流, "
+              f"{decoder_time / max(tokens, 1) * 1e9:7.0f} ns/token")
+        print(f"   加速比: {legacy_time / decoder_time:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
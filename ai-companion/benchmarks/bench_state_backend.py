@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+⏱️ 会话状态后端基准测试
+1. 序列化：对比普通 JSON 与 core/state_backend.py 紧凑编码（无空白 JSON + zlib）的大小和耗时
+2. 多进程共享：启动一个本地 Redis 协议替身服务器，模拟两个工作进程（各自的会话注册表和连接）
+   轮流处理同一用户的请求（无粘性会话），验证对话连续并统计每个请求的状态读写开销
+
+用法:
+    python benchmarks/bench_state_backend.py [--turns N] [--requests R]
+"""
+
+import argparse
+import json
+import os
+import random
+import socketserver
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.state_backend import encode_state, decode_state, RedisStateBackend  # noqa: E402
+from core.session_registry import SessionRegistry, UserSession  # noqa: E402
+
+
+class RespHandler(socketserver.StreamRequestHandler):
+    """最小的 Redis 协议替身：支持 PING / GET / SET [EX] / DEL / INCR[BY] / EXPIRE / MULTI / EXEC"""
+
+    disable_nagle_algorithm = True
+
+    def read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        count = int(line[1:])
+        args = []
+        for _ in range(count):
+            size = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(size + 2)[:-2])
+        return args
+
+    def execute(self, args):
+        store = self.server.store
+        command = args[0].upper()
+        with self.server.lock:
+            if command == b"PING":
+                return b"+PONG\r\n"
+            if command == b"GET":
+                value = store.get(args[1])
+                return b"$-1\r\n" if value is None else b"$%d\r\n%s\r\n" % (len(value), value)
+            if command == b"SET":
+                store[args[1]] = args[2]
+                return b"+OK\r\n"
+            if command == b"DEL":
+                return b":%d\r\n" % (store.pop(args[1], None) is not None)
+            if command in (b"INCR", b"INCRBY"):
+                value = int(store.get(args[1], b"0")) + (int(args[2]) if len(args) > 2 else 1)
+                store[args[1]] = str(value).encode()
+                return b":%d\r\n" % value
+            if command == b"EXPIRE":
+                return b":1\r\n"
+            if command in (b"CLIENT", b"SELECT"):
+                return b"+OK\r\n"
+        return b"-ERR unknown command\r\n"
+
+    def handle(self):
+        queued = None
+        while True:
+            args = self.read_command()
+            if args is None:
+                return
+            command = args[0].upper()
+            if command == b"MULTI":
+                queued = []
+                reply = b"+OK\r\n"
+            elif command == b"EXEC":
+                replies = [self.execute(a) for a in queued or []]
+                reply = b"*%d\r\n" % len(replies) + b"".join(replies)
+                queued = None
+            elif queued is not None:
+                queued.append(args)
+                reply = b"+QUEUED\r\n"
+            else:
+                reply = self.execute(args)
+            self.wfile.write(reply)
+            self.wfile.flush()
+
+
+class RespServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        self.store = {}
+        self.lock = threading.Lock()
+        super().__init__(("127.0.0.1", 0), RespHandler)
+
+
+SENTENCES = [
+    "对称轴公式是 x = -b / 2a，我们一步一步来看。", "先把题目里的已知条件列出来。",
+    "这一步很多同学都会卡住，别着急。", "你可以先画个草图，看看开口方向。",
+    "把 a、b、c 分别代进去算一下。", "算完以后记得检查一下符号。",
+    "学累了就起来活动一下，喝口水再继续。", "今天的进度已经很不错了！",
+    "如果还不明白，我们换一道类似的题练习。", "顶点坐标也可以用配方法求出来。",
+]
+
+
+def simulated_turn(session: UserSession, index: int, rng: random.Random = random.Random(42)):
+    """模拟一轮对话（不调用模型）：写入界面记录和模型上下文"""
+    question = f"第 {index} 个问题：" + "".join(rng.sample(SENTENCES, 2))
+    answer = f"第 {index} 个回答：" + "".join(rng.choices(SENTENCES, k=rng.randint(3, 8)))
+    session.chat_manager.ai_agent.add_message("user", question)
+    session.chat_manager.ai_agent.add_message("assistant", answer)
+
+
+def bench_serialization(turns: int, rounds: int = 200):
+    session = UserSession("bench-serialization", backend=None)
+    for i in range(turns):
+        simulated_turn(session, i)
+    state = session.chat_manager.export_state()
+    # 对照组：界面记录和模型上下文各存一份的普通 JSON
+    legacy = {"chat_history": session.chat_manager.get_transcript(),
+              "conversation_history": [m.to_dict() for m in session.chat_manager.ai_agent.conversation_history]}
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        plain = json.dumps(legacy).encode('utf-8')
+        json.loads(plain)
+    plain_ms = (time.perf_counter() - start) / rounds * 1000
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        compact = encode_state(state)
+        decode_state(compact)
+    compact_ms = (time.perf_counter() - start) / rounds * 1000
+
+    print(f"\n📦 序列化（{turns} 轮对话）")
+    print(f"   普通 JSON : {len(plain) / 1024:8.1f} KB, 编解码 {plain_ms:7.3f} ms")
+    print(f"   紧凑编码  : {len(compact) / 1024:8.1f} KB, 编解码 {compact_ms:7.3f} ms "
+          f"({len(plain) / len(compact):.1f}x 更小)")
+
+
+def bench_shared_workers(address, requests: int):
+    url = f"redis://{address[0]}:{address[1]}/0"
+    workers = [SessionRegistry(factory=lambda sid: UserSession(sid, RedisStateBackend(url))) for _ in range(2)]
+
+    overheads = []
+    for i in range(requests):
+        registry = workers[i % 2]  # 负载均衡轮询，没有粘性会话
+        start = time.perf_counter()
+        session = registry.get("user-1")
+        lookup = time.perf_counter() - start
+        simulated_turn(session, i)
+        start = time.perf_counter()
+        session.persist()
+        overheads.append((lookup + time.perf_counter() - start) * 1000)
+
+    final = workers[requests % 2].get("user-1")
+    transcript = final.chat_manager.get_transcript()
+    questions = [m["content"] for m in transcript if m["role"] == "user"]
+    continuous = len(questions) == requests and all(
+        question.startswith(f"第 {i} 个问题") for i, question in enumerate(questions))
+    overheads.sort()
+    print(f"\n🔀 两个工作进程轮流处理同一用户的 {requests} 个请求")
+    print(f"   对话连续: {'✅' if continuous else '❌'} ({len(transcript)} 条记录)")
+    print(f"   每个请求的状态开销: p50 {overheads[len(overheads) // 2]:6.2f} ms, "
+          f"p95 {overheads[int(len(overheads) * 0.95)]:6.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="会话状态后端基准测试")
+    parser.add_argument('--turns', type=int, default=100, help="序列化测试的对话轮数")
+    parser.add_argument('--requests', type=int, default=40, help="多进程测试的请求数")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("⏱️ 会话状态后端基准测试")
+    print("=" * 60)
+
+    bench_serialization(args.turns)
+
+    server = RespServer()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    bench_shared_workers(server.server_address, args.requests)
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+⏱️ 语音合成连接池基准测试
+启动一个本地模拟 TTS 服务器（实现 dashscope 语音合成的 WebSocket 协议：run-task / continue-task / finish-task，
+新连接需要模拟的握手耗时：TLS + WebSocket 升级 + 鉴权），用真实的 dashscope SDK 客户端对比
+“每句话新建 SpeechSynthesizer”（旧实现）与 core/synthesizer_pool.py 复用连接两种方式的首帧延迟和整句耗时，
+并统计服务器收到的连接数，确认连接确实被复用
+
+用法:
+    python benchmarks/bench_synthesizer_pool.py [--utterances N] [--concurrency C] [--handshake-ms MS]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import dashscope  # noqa: E402
+from aiohttp import web, WSMsgType  # noqa: E402
+from dashscope.audio.tts_v2 import SpeechSynthesizer, ResultCallback  # noqa: E402
+
+from config.constants import VOICE_MAPPING  # noqa: E402
+from config.settings import TTS_MODEL_ID  # noqa: E402
+from core.audio_format import resolve_sdk_format  # noqa: E402
+from core.synthesizer_pool import SynthesizerPool  # noqa: E402
+
+FRAME_BYTES = 4096
+
+
+class MockTTSServer:
+    """模拟 dashscope 语音合成服务：每个连接上可以依次执行多个合成任务"""
+
+    def __init__(self, handshake_ms: float, first_frame_ms: float):
+        self.handshake_ms = handshake_ms
+        self.first_frame_ms = first_frame_ms
+        self.connections = 0
+        self.tasks = 0
+        self.port = None
+        self._started = threading.Event()
+
+    @staticmethod
+    def _event(name: str, task_id: str) -> str:
+        return json.dumps({"header": {"event": name, "task_id": task_id}, "payload": {}})
+
+    async def handle(self, request: web.Request) -> web.WebSocketResponse:
+        self.connections += 1
+        await asyncio.sleep(self.handshake_ms / 1000)
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        async for message in ws:
+            if message.type != WSMsgType.TEXT:
+                continue
+            command = json.loads(message.data)
+            header = command["header"]
+            task_id = header["task_id"]
+            if header["action"] == "run-task":
+                self.tasks += 1
+                await ws.send_str(self._event("task-started", task_id))
+            elif header["action"] == "continue-task":
+                text = command["payload"]["input"]["text"]
+                await asyncio.sleep(self.first_frame_ms / 1000)
+                for _ in range(max(1, len(text) // 4)):
+                    await ws.send_bytes(b"\x00" * FRAME_BYTES)
+            elif header["action"] == "finish-task":
+                await ws.send_str(self._event("task-finished", task_id))
+        return ws
+
+    def _serve(self):
+        async def main():
+            app = web.Application()
+            app.router.add_get("/{path:.*}", self.handle)
+            runner = web.AppRunner(app, access_log=None)
+            await runner.setup()
+            site = web.TCPSite(runner, "127.0.0.1", 0)
+            await site.start()
+            self.port = site._server.sockets[0].getsockname()[1]
+            self._started.set()
+            await asyncio.Event().wait()
+
+        asyncio.run(main())
+
+    def start(self) -> str:
+        threading.Thread(target=self._serve, daemon=True).start()
+        self._started.wait()
+        return f"ws://127.0.0.1:{self.port}/api-ws/v1/inference"
+
+
+class TimingSink(ResultCallback):
+    """记录首帧时间"""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.first_frame = None
+        self.total_bytes = 0
+
+    def on_data(self, data: bytes) -> None:
+        if self.first_frame is None:
+            self.first_frame = time.perf_counter() - self.start
+        self.total_bytes += len(data)
+
+
+def run_one_shot(url: str, voice: str, text: str):
+    """旧实现：每句话新建 SpeechSynthesizer，合成结束后 SDK 关闭连接"""
+    sink = TimingSink()
+    synthesizer = SpeechSynthesizer(model=TTS_MODEL_ID, voice=voice, format=resolve_sdk_format(),
+                                    callback=sink, url=url)
+    synthesizer.streaming_call(text)
+    synthesizer.streaming_complete()
+    return sink.first_frame, time.perf_counter() - sink.start
+
+
+def run_pooled(pool: SynthesizerPool, voice: str, text: str):
+    """新实现：从连接池借出合成器"""
+    sink = TimingSink()
+    pool.run(text, sink, TTS_MODEL_ID, voice, resolve_sdk_format())
+    return sink.first_frame, time.perf_counter() - sink.start
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def bench(label, func, jobs, concurrency, server: MockTTSServer):
+    """并发执行所有任务并打印延迟统计和服务器收到的连接数"""
+    connections, tasks = server.connections, server.tasks
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(lambda job: func(*job), jobs))
+    wall = time.perf_counter() - start
+    first_frames = [r[0] * 1000 for r in results]
+    totals = [r[1] * 1000 for r in results]
+    print(f"   {label}: 首帧 avg {sum(first_frames) / len(first_frames):7.1f} ms, "
+          f"p95 {percentile(first_frames, 95):7.1f} ms | 整句 avg {sum(totals) / len(totals):7.1f} ms | "
+          f"总耗时 {wall:6.2f}s | {server.connections - connections} 个连接 / {server.tasks - tasks} 个任务")
+    return sum(first_frames) / len(first_frames)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="语音合成连接池基准测试")
+    parser.add_argument('--utterances', type=int, default=200, help="合成的句子数")
+    parser.add_argument('--concurrency', type=int, default=4, help="并发合成线程数（对应 TTS_WORKERS）")
+    parser.add_argument('--handshake-ms', type=float, default=80, help="模拟新建连接的握手耗时")
+    parser.add_argument('--first-frame-ms', type=float, default=40, help="模拟服务端首帧合成耗时")
+    args = parser.parse_args()
+
+    dashscope.api_key = dashscope.api_key or "bench"
+    server = MockTTSServer(args.handshake_ms, args.first_frame_ms)
+    url = server.start()
+
+    voices = list(VOICE_MAPPING.values())
+    sentences = ["你好呀同学，今天我们一起学习数学吧。", "先做第一题，好吗？", "做得很好，继续加油！"]
+    jobs = [(voices[i % len(voices)], sentences[i % len(sentences)]) for i in range(args.utterances)]
+
+    print("=" * 60)
+    print("⏱️ 语音合成连接池基准测试")
+    print("=" * 60)
+    print(f"\n📄 {args.utterances} 句, {len(voices)} 个音色, 并发 {args.concurrency}, "
+          f"握手 {args.handshake_ms:.0f} ms, 首帧 {args.first_frame_ms:.0f} ms")
+
+    one_shot = bench("每句新建合成器", lambda voice, text: run_one_shot(url, voice, text),
+                     jobs, args.concurrency, server)
+    pool = SynthesizerPool(size=args.concurrency, url=url)
+    if not pool.warm_up():
+        print("   ❌ 连接池创建失败")
+        return
+    pooled = bench("连接池复用    ", lambda voice, text: run_pooled(pool, voice, text), jobs, args.concurrency, server)
+    pool.close()
+
+    print(f"   首帧延迟节省: {one_shot - pooled:.1f} ms/句 ({one_shot / pooled:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -57,6 +57,13 @@ ENCOURAGE_REMINDERS = {
     "磁性霸道男总裁": "振作起来，我不允许我的陪伴者露出这种丧气的表情。休息五分钟，然后继续。"
 }
 
+# 快捷工具按钮提示词
+QUICK_TOOL_PROMPTS = {
+    "advice": "请给我一些学习建议",
+    "plan": "请帮我制定一个学习计划",
+    "encourage": "鼓励我坚持学习"
+}
+
 # 游戏化系统常量
 LEVEL_CONFIG = [
     {"level": 1, "name": "学习新手", "minPoints": 0, "icon": "🌱"},
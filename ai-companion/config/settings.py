@@ -11,20 +11,149 @@ if not MODELSCOPE_API_KEY:
 # 模型配置
 MODELSCOPE_API_URL = "https://api-inference.modelscope.cn/v1/chat/completions"
 CHAT_MODEL_ID = "Qwen/Qwen2.5-72B-Instruct"
+FAST_CHAT_MODEL_ID = os.environ.get("FAST_CHAT_MODEL_ID", "Qwen/Qwen2.5-7B-Instruct")
 CHAT_TEMPERATURE = 0.7
 CHAT_MAX_TOKENS = 1000
-HISTORY_LIMIT = 20
+
+# 模型档位配置（OpenAI 兼容接口，按从大到小排列，降级时依次切换到下一档）
+MODEL_TIERS = [
+    {"name": "primary", "model": CHAT_MODEL_ID, "api_url": MODELSCOPE_API_URL, "api_key": MODELSCOPE_API_KEY},
+    {"name": "fast", "model": FAST_CHAT_MODEL_ID, "api_url": MODELSCOPE_API_URL, "api_key": MODELSCOPE_API_KEY},
+]
+# 各类请求默认使用的档位：提醒、快捷工具、摘要等短请求走小模型
+ROUTE_KIND_TIERS = {
+    "chat": "primary",
+    "quick_tool": "fast",
+    "alert": "fast",
+    "summary": "fast",
+}
+ROUTER_WINDOW_SECONDS = 120        # 健康度统计的时间窗口 (秒)
+ROUTER_MIN_SAMPLES = 10            # 判断降级所需的最少样本数
+ROUTER_P95_THRESHOLD = 8.0         # p95 首字延迟超过该值 (秒) 视为降级
+ROUTER_ERROR_RATE_THRESHOLD = 0.3  # 错误率超过该值视为降级
+
+HISTORY_LIMIT = 200            # 模型上下文窗口最多保留的消息条数（更早的消息移出窗口交给摘要器）
+CONTEXT_TOKEN_BUDGET = 6000    # 每次请求的提示词 token 预算（含系统提示词）
+
+# 对话摘要配置
+SUMMARY_MAX_TOKENS = 300             # 滚动摘要的最大长度
+SUMMARY_MAX_PENDING_MESSAGES = 100   # 等待摘要的已移出消息上限
+SUMMARY_WORKERS = 2                  # 后台摘要线程数
 
 # API 超时配置 (秒)
 API_TIMEOUT = 60
-STREAM_TIMEOUT = 120
+STREAM_TIMEOUT = 120       # 流式请求单次读取的网络超时
+
+# 流式请求策略配置 (秒)
+STREAM_TTFT_TIMEOUT = 20   # 首字截止时间：超过仍无输出即放弃
+STREAM_IDLE_TIMEOUT = 15   # 字间空闲截止时间：两个增量间隔超过即放弃
+HEDGE_ENABLED = False      # 是否在首字迟迟未到时发送对冲请求（会增加上游调用量）
+HEDGE_PERCENTILE = 95      # 对冲延迟取最近首字延迟的分位数
+HEDGE_MIN_DELAY = 1.0      # 对冲延迟下限
+HEDGE_DEFAULT_DELAY = 3.0  # 尚无首字延迟样本时的对冲延迟
+
+# 上游模型调用准入控制（所有会话共享）
+LLM_MAX_INFLIGHT = 8        # 同时进行中的上游请求数上限
+LLM_MAX_QUEUE = 32          # 排队等待的请求数上限，超过后立即拒绝
+LLM_QUEUE_TIMEOUT = 10.0    # 单个请求最长排队时间（秒）
+
+# HTTP 连接池配置
+HTTP_POOL_CONNECTIONS = 4   # 缓存的主机连接池数量
+HTTP_POOL_MAXSIZE = 32      # 每个主机最大连接数
+HTTP_POOL_BLOCK = True      # 连接数达到上限时阻塞等待，而不是临时新建连接
+HTTP_KEEPALIVE_EXPIRY = 60  # 异步客户端空闲连接保活时间 (秒)
+
+# 回复缓存配置
+RESPONSE_CACHE_ENABLED = True
+RESPONSE_CACHE_MAX_ENTRIES = 512            # 最大缓存条数
+RESPONSE_CACHE_MAX_BYTES = 8 * 1024 * 1024  # 缓存总字节数上限
+RESPONSE_CACHE_TTL = 6 * 3600               # 缓存有效期 (秒)
+RESPONSE_CACHE_REPLAY_CHUNK_CHARS = 4       # 回放缓存回复时每次输出的字符数
+RESPONSE_CACHE_REPLAY_INTERVAL_MS = 20      # 回放间隔 (毫秒)，0 表示一次性输出
+
+# UI 流式输出合并配置
+UI_FLUSH_MODE = "time"        # 刷新策略: time / size / sentence / none
+UI_FLUSH_INTERVAL_MS = 50     # time 策略的刷新间隔 (毫秒)
+UI_FLUSH_MIN_CHARS = 24       # size 策略的最小刷新字符数
+UI_FLUSH_MAX_DELAY_MS = 300   # sentence 策略的最长等待时间 (毫秒)
 
 # TTS 配置
 TTS_MODEL_ID = 'cosyvoice-v2'
+# 合成音频格式（dashscope AudioFormat 枚举名，决定编码、采样率和码率），合成结果原样下发给浏览器，
+# 不在服务端解码再编码。例如 MP3_22050HZ_MONO_256KBPS、MP3_16000HZ_MONO_128KBPS、
+# OGG_OPUS_16KHZ_MONO_32KBPS（带宽最省）、WAV_22050HZ_MONO_16BIT（可做静音裁剪与响度归一化）
+TTS_AUDIO_FORMAT = os.environ.get("TTS_AUDIO_FORMAT", "MP3_22050HZ_MONO_256KBPS")
+TTS_SEGMENT_MIN_CHARS = 6    # 分句合成：短于此长度的句子与下一句合并，避免过碎的合成请求
+TTS_SEGMENT_MAX_CHARS = 80   # 分句合成：长句在逗号处（或强制）切分，保证首段音频尽早开始
+TTS_STREAMING_ENABLED = True    # 使用流式合成接口边合成边返回音频；失败时回退到阻塞的一次性合成
+TTS_STREAM_CHUNK_BYTES = 8192   # 流式合成时累积到该大小再发送一帧，避免过碎的前端音频片段
+TTS_STREAM_FRAME_TIMEOUT = 15   # 流式合成两帧音频之间的最长等待时间（秒）
+TTS_WORKERS = 4                 # 语音合成工作线程数（同时进行的合成请求上限）
+TTS_MAX_QUEUE = 64              # 等待合成的任务数上限，超过后拒绝新任务
+TTS_POOL_SIZE = TTS_WORKERS     # 预先建立的合成连接数（每个进程），0 表示每句话新建连接
+TTS_POOL_RETRY_INTERVAL = 60    # 合成连接池创建失败后，每句话新建连接这么久（秒）再重试
+
+# 合成音频后处理（仅对 WAV/PCM 生效，MP3 等压缩格式原样透传）
+AUDIO_TRIM_SILENCE = True           # 裁剪首尾静音
+AUDIO_SILENCE_THRESHOLD_DB = -45.0  # 低于该电平（dBFS）视为静音
+AUDIO_SILENCE_KEEP_MS = 60          # 裁剪后首尾保留的静音时长（毫秒），避免听感突兀
+AUDIO_NORMALIZE = True              # 响度归一化，使四种音色音量一致
+AUDIO_TARGET_DBFS = -20.0           # 目标 RMS 响度（dBFS）
+AUDIO_MAX_GAIN_DB = 12.0            # 最大增益，避免把底噪放大
+
+# TTS 缓存配置（相同文本+音色只合成一次）
+TTS_CACHE_ENABLED = True
+TTS_CACHE_DIR = os.environ.get(
+    "TTS_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "tts")
+)
+TTS_CACHE_MEMORY_BYTES = 16 * 1024 * 1024   # 内存热缓存字节数上限
+TTS_CACHE_DISK_BYTES = 256 * 1024 * 1024    # 磁盘缓存字节数上限
+
+# 合成音频静态存储（按内容哈希命名，通过 URL 下发：浏览器可长期缓存、按 Range 渐进加载）
+AUDIO_STORE_DIR = os.environ.get(
+    "AUDIO_STORE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "audio")
+)
+AUDIO_STORE_MAX_BYTES = 128 * 1024 * 1024   # 存储目录字节数上限，超出后按最近访问时间淘汰
+AUDIO_URL_PATH = "/audio"                   # 音频文件的访问路径前缀
+AUDIO_URL_MAX_AGE = 365 * 24 * 3600         # Cache-Control max-age（秒），文件名即内容哈希，内容永不变化
+AUDIO_PUBLIC_BASE_URL = os.environ.get("AUDIO_PUBLIC_BASE_URL", "")  # 反向代理部署时的对外访问地址，留空则按请求头推断
+
+# 会话配置（每个浏览器会话独立的对话、统计状态）
+SESSION_MAX_COUNT = 5000                 # 同时保留的会话数上限，超出后淘汰最久未活动的会话
+SESSION_IDLE_TTL = 30 * 60               # 会话空闲超过该时间（秒）后释放
+SESSION_REAP_INTERVAL = 60               # 回收空闲会话的检查间隔（秒）
+SESSION_MAX_BYTES = 512 * 1024 * 1024    # 所有会话状态的估算内存上限
+
+# 会话状态后端（学习统计与对话记录）：memory 为进程内存储；redis 为网络键值存储，
+# 多个工作进程共享同一份状态，负载均衡无需粘性会话
+STATE_BACKEND = os.environ.get("STATE_BACKEND", "memory")
+STATE_REDIS_URL = os.environ.get("STATE_REDIS_URL", "redis://127.0.0.1:6379/0")
+STATE_KEY_PREFIX = "ai-companion:"    # 键名前缀
+STATE_TTL = 30 * 24 * 3600            # 会话状态保留时间（秒），每次写入后重新计时
+STATE_COMPRESS_MIN_BYTES = 256        # 序列化结果超过该大小才压缩
+STATE_SOCKET_TIMEOUT = 2.0            # 网络后端单次操作超时（秒）
+STATE_MEMORY_MAX_ENTRIES = 50000      # 进程内后端最多保存的条目数（每个会话 2 条：统计数据和修订号）
 
 # 服务器配置
 SERVER_NAME = "0.0.0.0"
 SERVER_PORT = 7860
+CHAT_CONCURRENCY_LIMIT = 200  # 聊天事件并发上限（异步回调不占用线程池）
+METRICS_LOG_INTERVAL = 60     # 运行指标写入日志的间隔（秒），由调度器和请求路径共同触发
+
+# 多进程生产模式（python app.py --workers N）：主进程构建好界面后 fork 出 N 个工作进程，
+# 前置的路由进程监听 SERVER_PORT，按会话把请求固定转发到同一个工作进程
+APP_WORKERS = int(os.environ.get("APP_WORKERS", "1"))
+WORKER_BASE_PORT = int(os.environ.get("WORKER_BASE_PORT", "7870"))  # 工作进程监听 127.0.0.1:WORKER_BASE_PORT+i
+WORKER_HEALTH_PATH = "/healthz"    # 工作进程健康检查路径
+WORKER_HEALTH_INTERVAL = 5         # 健康检查间隔（秒）
+WORKER_HEALTH_TIMEOUT = 3          # 单次健康检查超时（秒）
+WORKER_HEALTH_MAX_FAILURES = 3     # 连续失败该次数后强制重启
+WORKER_STARTUP_GRACE = 30          # 进程启动后经过该时间（秒）才开始健康检查
+WORKER_RESTART_BACKOFF_MAX = 30    # 连续崩溃时重启等待时间的上限（秒）
+WORKER_GRACEFUL_TIMEOUT = 10       # 停止时等待子进程退出的时间（秒），超时后强制结束
+WORKER_WARMUP_WAIT = 60            # fork 前等待提醒语音预热完成的最长时间（秒），结果由所有工作进程共享
 
 # 初始消息
 INITIAL_MESSAGE = "你好呀！我是小伴，你的学习陪伴AI助手~\n\n有什么问题都可以问我，学习累了也可以和我聊聊天。\n\n点击左侧的\"开启摄像头\"按钮，我还能通过人脸识别实时关注你的学习状态哦！"
\ No newline at end of file
@@ -0,0 +1,200 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, asynccontextmanager
+from typing import Dict, Any, Optional
+
+from config.settings import LLM_MAX_INFLIGHT, LLM_MAX_QUEUE, LLM_QUEUE_TIMEOUT
+from utils.logger import logger
+from utils.metrics import metrics
+
+# 准入被拒绝时展示给用户的提示
+ADMISSION_REJECTED_MESSAGE = "当前使用人数较多，请稍后再试。"
+
+
+class AdmissionRejected(Exception):
+    """请求未获准入：排队已满或排队超时"""
+
+    def __init__(self, reason: str):
+        self.reason = reason      # "queue_full" 排队已满 / "timeout" 排队超时
+        super().__init__(f"admission rejected: {reason}")
+
+
+class _Waiter:
+    """一个排队中的请求，可以是线程（Event）或协程（Future）"""
+
+    __slots__ = ("granted", "event", "loop", "future")
+
+    def __init__(self, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.granted = False
+        self.loop = loop
+        if loop is None:
+            self.event = threading.Event()
+            self.future = None
+        else:
+            self.event = None
+            self.future = loop.create_future()
+
+    def wake(self):
+        """通知等待方已获得名额（调用方不持有锁）"""
+        if self.event is not None:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(self._resolve)
+
+    def _resolve(self):
+        if not self.future.done():
+            self.future.set_result(True)
+
+
+class AdmissionController:
+    """
+    上游请求准入控制器（线程安全）
+    限制同时进行中的上游请求数，超出的请求按先来后到排队；
+    队列已满时立即拒绝，排队超过截止时间也会被拒绝，避免突发流量把所有请求拖到超时。
+    同时支持工作线程（同步调用）和事件循环中的协程（流式调用）
+    """
+
+    def __init__(self,
+                 max_inflight: int = LLM_MAX_INFLIGHT,
+                 max_queue: int = LLM_MAX_QUEUE,
+                 queue_timeout: float = LLM_QUEUE_TIMEOUT,
+                 metric_prefix: str = "admission"):
+        self.max_inflight = max_inflight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.metric_prefix = metric_prefix
+        self._lock = threading.Lock()
+        self._inflight = 0
+        self._waiters: "deque[_Waiter]" = deque()
+
+    def _try_enter(self, waiter_loop: Optional[asyncio.AbstractEventLoop]) -> Optional[_Waiter]:
+        """
+        尝试直接获得名额；无空闲名额时加入队列并返回等待对象
+        获得名额返回 None，队列已满抛出 AdmissionRejected
+        """
+        with self._lock:
+            if self._inflight < self.max_inflight and not self._waiters:
+                self._inflight += 1
+                self._update_gauges()
+                return None
+            if len(self._waiters) >= self.max_queue:
+                metrics.inc(f"{self.metric_prefix}.rejected.queue_full")
+                logger.warning(f"[ADMISSION] 排队已满（{len(self._waiters)}），拒绝请求")
+                raise AdmissionRejected("queue_full")
+            waiter = _Waiter(waiter_loop)
+            self._waiters.append(waiter)
+            self._update_gauges()
+            return waiter
+
+    def _abandon(self, waiter: _Waiter) -> bool:
+        """
+        放弃排队；若等待期间已被分配名额，则归还名额
+        返回等待方是否已获得名额
+        """
+        with self._lock:
+            if waiter.granted:
+                return True
+            try:
+                self._waiters.remove(waiter)
+            except ValueError:
+                pass
+            self._update_gauges()
+            return False
+
+    def _admitted(self, start_time: float):
+        """记录一次成功准入"""
+        metrics.observe(f"{self.metric_prefix}.wait", time.monotonic() - start_time)
+        metrics.inc(f"{self.metric_prefix}.admitted")
+
+    def _rejected_timeout(self):
+        metrics.inc(f"{self.metric_prefix}.rejected.timeout")
+        logger.warning(f"[ADMISSION] 排队超过 {self.queue_timeout:.1f}s，拒绝请求")
+        raise AdmissionRejected("timeout")
+
+    def acquire(self, timeout: Optional[float] = None):
+        """在工作线程中获取一个名额，失败时抛出 AdmissionRejected"""
+        start_time = time.monotonic()
+        waiter = self._try_enter(None)
+        if waiter is not None:
+            waiter.event.wait(self.queue_timeout if timeout is None else timeout)
+            if not self._abandon(waiter):
+                self._rejected_timeout()
+        self._admitted(start_time)
+
+    async def acquire_async(self, timeout: Optional[float] = None):
+        """在事件循环中获取一个名额，失败时抛出 AdmissionRejected"""
+        start_time = time.monotonic()
+        waiter = self._try_enter(asyncio.get_running_loop())
+        if waiter is not None:
+            try:
+                await asyncio.wait({waiter.future}, timeout=self.queue_timeout if timeout is None else timeout)
+            except asyncio.CancelledError:
+                if self._abandon(waiter):
+                    self.release()
+                raise
+            if not self._abandon(waiter):
+                self._rejected_timeout()
+        self._admitted(start_time)
+
+    def try_acquire(self) -> bool:
+        """不等待地获取一个名额：有空闲名额且无人排队时占用并返回 True，否则返回 False"""
+        with self._lock:
+            if self._inflight >= self.max_inflight or self._waiters:
+                return False
+            self._inflight += 1
+            self._update_gauges()
+        metrics.inc(f"{self.metric_prefix}.admitted")
+        return True
+
+    def release(self):
+        """归还名额，并按先来后到把名额直接转交给下一个排队者"""
+        with self._lock:
+            if self._waiters:
+                # 名额直接转交，进行中的请求数不变
+                waiter = self._waiters.popleft()
+                waiter.granted = True
+            else:
+                waiter = None
+                self._inflight = max(0, self._inflight - 1)
+            self._update_gauges()
+        if waiter is not None:
+            waiter.wake()
+
+    @contextmanager
+    def slot(self, timeout: Optional[float] = None):
+        """同步上下文管理器：占用一个名额直到退出"""
+        self.acquire(timeout)
+        try:
+            yield
+        finally:
+            self.release()
+
+    @asynccontextmanager
+    async def async_slot(self, timeout: Optional[float] = None):
+        """异步上下文管理器：占用一个名额直到退出"""
+        await self.acquire_async(timeout)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def _update_gauges(self):
+        """更新进行中与排队数量（调用方需持有锁）"""
+        metrics.set_gauge(f"{self.metric_prefix}.inflight", self._inflight)
+        metrics.set_gauge(f"{self.metric_prefix}.queue_depth", len(self._waiters))
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取当前准入状态"""
+        with self._lock:
+            return {
+                "inflight": self._inflight,
+                "queued": len(self._waiters),
+                "max_inflight": self.max_inflight,
+                "max_queue": self.max_queue
+            }
+
+
+# 全局共享的准入控制器：所有会话的上游模型调用共用同一组名额
+llm_admission = AdmissionController()
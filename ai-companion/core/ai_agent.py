@@ -1,20 +1,31 @@
-import os
-import json
+import httpx
 import requests
+import asyncio
 import time
-from typing import List, Dict, Optional, Generator
+from typing import List, Dict, Optional, Generator, AsyncGenerator
 from config.settings import (
-    MODELSCOPE_API_KEY, 
-    MODELSCOPE_API_URL, 
-    CHAT_MODEL_ID, 
     CHAT_TEMPERATURE, 
     CHAT_MAX_TOKENS, 
     API_TIMEOUT,
     HISTORY_LIMIT,
-    STREAM_TIMEOUT
+    CONTEXT_TOKEN_BUDGET,
+    STREAM_TIMEOUT,
+    RESPONSE_CACHE_ENABLED,
+    RESPONSE_CACHE_REPLAY_CHUNK_CHARS,
+    RESPONSE_CACHE_REPLAY_INTERVAL_MS
 )
 from config.constants import STYLE_PROMPTS
 from utils.logger import logger
+from utils.async_utils import run_async_generator
+from .http_client import get_http_client, get_async_http_client
+from .sse_decoder import SSEDecoder
+from .context_window import build_context_messages, STYLE_PROMPT_TOKENS
+from .message_store import MessageStore, Message
+from .conversation_summarizer import ConversationSummarizer
+from .response_cache import response_cache, make_cache_key
+from .request_policy import RequestPolicy, StreamDeadlineExceeded, UpstreamStatusError
+from .model_router import model_router
+from .admission_control import llm_admission, AdmissionRejected, ADMISSION_REJECTED_MESSAGE
 
 
 class AIAgent:
@@ -22,9 +33,13 @@ class AIAgent:
     AI代理类，负责与AI模型通信和管理对话历史
     """
     
-    def __init__(self):
-        self.conversation_history = []
+    def __init__(self, messages: Optional[MessageStore] = None):
+        # 对话消息与界面对话记录共用同一个消息存储（由 ChatManager 传入），这里只维护模型上下文窗口
+        self.messages = messages if messages is not None else MessageStore()
+        # 移出窗口的旧消息交给后台摘要器压缩，而不是直接丢弃
+        self.summarizer = ConversationSummarizer()
         self.current_style = "默认"
+        self.http_client = get_http_client()
         
     def set_style(self, style: str):
         """设置AI角色风格"""
@@ -34,39 +49,97 @@ class AIAgent:
         """获取当前角色的系统提示词"""
         return STYLE_PROMPTS.get(self.current_style, STYLE_PROMPTS["默认"])
     
-    def add_message(self, role: str, content: str):
-        """向对话历史添加消息"""
-        self.conversation_history.append({
-            "role": role,
-            "content": content
-        })
-        # 限制对话历史长度
-        if len(self.conversation_history) > HISTORY_LIMIT:
-            self.conversation_history = self.conversation_history[-HISTORY_LIMIT:]
+    def get_system_prompt_tokens(self) -> int:
+        """获取当前角色系统提示词的 token 数（预先计算）"""
+        return STYLE_PROMPT_TOKENS.get(self.current_style, STYLE_PROMPT_TOKENS["默认"])
+    
+    @property
+    def conversation_history(self) -> List[Message]:
+        """模型上下文窗口内的对话消息（消息存储的视图）"""
+        return self.messages.context()
+    
+    @property
+    def history_tokens(self) -> int:
+        """上下文窗口内消息的 token 估算总数"""
+        return self.messages.context_tokens
+    
+    def add_message(self, role: str, content: str) -> Message:
+        """向对话历史添加消息，并把超出条数上限或 token 预算的最旧消息移出上下文窗口"""
+        message = self.messages.append(role, content)
+        while self.messages.context_count > HISTORY_LIMIT:
+            self._evict_oldest()
+        
+        # 超出 token 预算的最旧消息移出窗口，交给摘要器
+        token_limit = CONTEXT_TOKEN_BUDGET - self.get_system_prompt_tokens() - self.summarizer.summary_tokens
+        while self.messages.context_count > 1 and self.messages.context_tokens > token_limit:
+            self._evict_oldest()
+        return message
+    
+    def _evict_oldest(self):
+        """移出上下文窗口中最旧的一条消息（仍保留在界面对话记录中）"""
+        message = self.messages.evict_oldest()
+        if message is not None:
+            self.summarizer.add_evicted(message)
+    
+    def build_messages(self) -> List[Dict]:
+        """
+        构建请求消息列表：系统提示词 + 在 token 预算内尽可能多的最近对话
+        """
+        return build_context_messages(
+            self.get_system_prompt(),
+            self.get_system_prompt_tokens(),
+            self.conversation_history,
+            CONTEXT_TOKEN_BUDGET,
+            summary=self.summarizer.summary,
+            summary_tokens=self.summarizer.summary_tokens
+        )
+    
+    def get_cache_key(self, messages: List[Dict]) -> Optional[str]:
+        """
+        计算回复缓存键（风格 + 发送给模型的完整消息列表的指纹），messages 为 build_messages() 的结果
+        缓存关闭时返回 None
+        """
+        if not RESPONSE_CACHE_ENABLED:
+            return None
+        return make_cache_key(self.current_style, messages)
+    
+    async def _replay_cached_reply(self, reply: str) -> AsyncGenerator[str, None]:
+        """按配置的块大小和间隔回放缓存的回复"""
+        chunk_size = max(1, RESPONSE_CACHE_REPLAY_CHUNK_CHARS)
+        interval = RESPONSE_CACHE_REPLAY_INTERVAL_MS / 1000
+        for start in range(0, len(reply), chunk_size):
+            if start and interval > 0:
+                await asyncio.sleep(interval)
+            yield reply[start:start + chunk_size]
     
     def get_chat_response(self, user_input: str) -> str:
         """
         获取AI聊天响应
         """
-        logger.debug(f"Requesting AI response for model: {CHAT_MODEL_ID}")
+        tier = model_router.route(model_router.classify(user_input))
+        logger.debug(f"Requesting AI response for model: {tier.model}")
         # 添加用户输入到对话历史
         self.add_message("user", user_input)
+        # 构建请求消息列表（系统提示词 + 历史摘要 + token 预算内的历史对话），缓存键按它计算
+        messages = self.build_messages()
+        cache_key = self.get_cache_key(messages)
         
-        # 构建请求消息列表
-        messages = []
-        # 添加系统提示词作为第一条消息
-        messages.append({"role": "system", "content": self.get_system_prompt()})
-        # 添加历史对话
-        messages.extend(self.conversation_history)
+        # 命中回复缓存时直接返回，省去一次完整的模型调用
+        cached_reply = response_cache.get(cache_key) if cache_key else None
+        if cached_reply is not None:
+            logger.debug("[RESPONSE_CACHE] 命中回复缓存")
+            self.add_message("assistant", cached_reply)
+            self.summarizer.schedule()
+            return cached_reply
         
         # 发送请求到模型
         headers = {
-            "Authorization": f"Bearer {MODELSCOPE_API_KEY}",
+            "Authorization": f"Bearer {tier.api_key}",
             "Content-Type": "application/json"
         }
         
         payload = {
-            "model": CHAT_MODEL_ID,
+            "model": tier.model,
             "messages": messages,
             "temperature": CHAT_TEMPERATURE,
             "max_tokens": CHAT_MAX_TOKENS
@@ -74,14 +147,19 @@ class AIAgent:
         
         start_time = time.time()
         try:
-            response = requests.post(
-                MODELSCOPE_API_URL,
-                headers=headers,
-                json=payload,
-                timeout=API_TIMEOUT
-            )
+            # 先获得上游调用名额，排队时间不计入模型延迟
+            with llm_admission.slot():
+                start_time = time.time()
+                response = self.http_client.post(
+                    tier.api_url,
+                    headers=headers,
+                    json=payload,
+                    timeout=API_TIMEOUT
+                )
             elapsed_time = time.time() - start_time
             logger.debug(f"AI Response received in {elapsed_time:.2f}s")
+            logger.debug(f"[HTTP_POOL] 连接池统计: {self.http_client.get_stats()}")
+            model_router.record(tier, elapsed_time, response.status_code == 200, first_token=False)
             
             if response.status_code == 200:
                 result = response.json()
@@ -89,6 +167,10 @@ class AIAgent:
                 
                 # 添加AI回复到对话历史
                 self.add_message("assistant", assistant_reply)
+                if cache_key:
+                    response_cache.put(cache_key, assistant_reply)
+                # 回复完成后在后台压缩移出窗口的旧消息
+                self.summarizer.schedule()
                 
                 return assistant_reply
             else:
@@ -96,11 +178,15 @@ class AIAgent:
                 print(error_msg)
                 return f"抱歉，我现在遇到了一些技术问题，请稍后再试。错误详情: {error_msg}"
                 
+        except AdmissionRejected:
+            return ADMISSION_REJECTED_MESSAGE
         except requests.exceptions.Timeout:
+            model_router.record(tier, time.time() - start_time, False, first_token=False)
             error_msg = "请求超时，请稍后再试"
             print(error_msg)
             return error_msg
         except requests.exceptions.RequestException as e:
+            model_router.record(tier, time.time() - start_time, False, first_token=False)
             error_msg = f"网络请求错误: {str(e)}"
             print(error_msg)
             return f"抱歉，网络连接出现问题，请检查网络后重试。错误详情: {error_msg}"
@@ -128,25 +214,31 @@ class AIAgent:
             {"role": "user", "content": reminder_context}
         ]
         
+        # 提醒语很短，默认路由到更快的小模型
+        tier = model_router.route("alert")
         headers = {
-            "Authorization": f"Bearer {MODELSCOPE_API_KEY}",
+            "Authorization": f"Bearer {tier.api_key}",
             "Content-Type": "application/json"
         }
         
         payload = {
-            "model": CHAT_MODEL_ID,
+            "model": tier.model,
             "messages": messages,
             "temperature": CHAT_TEMPERATURE,
             "max_tokens": 100  # 提醒语通常较短
         }
         
+        start_time = time.time()
         try:
-            response = requests.post(
-                MODELSCOPE_API_URL,
-                headers=headers,
-                json=payload,
-                timeout=API_TIMEOUT
-            )
+            with llm_admission.slot():
+                start_time = time.time()
+                response = self.http_client.post(
+                    tier.api_url,
+                    headers=headers,
+                    json=payload,
+                    timeout=API_TIMEOUT
+                )
+            model_router.record(tier, time.time() - start_time, response.status_code == 200, first_token=False)
             
             if response.status_code == 200:
                 result = response.json()
@@ -155,34 +247,52 @@ class AIAgent:
                 print(f"提醒API请求失败: {response.status_code}")
                 return ""
                 
+        except AdmissionRejected:
+            # 上游繁忙时放弃本次提醒
+            return ""
         except Exception as e:
+            model_router.record(tier, time.time() - start_time, False, first_token=False)
             print(f"获取提醒响应时发生错误: {e}")
             return ""
     
     def get_chat_response_stream(self, user_input: str) -> Generator[str, None, None]:
         """
         获取AI聊天响应（流式版本）
-        使用生成器实现逐字输出
+        同步包装：在后台事件循环中驱动 get_chat_response_stream_async
+        """
+        yield from run_async_generator(self.get_chat_response_stream_async(user_input))
+    
+    async def get_chat_response_stream_async(self, user_input: str) -> AsyncGenerator[str, None]:
+        """
+        获取AI聊天响应（异步流式版本）
+        基于非阻塞 HTTP 客户端逐字输出，等待上游时不占用工作线程
         """
-        logger.debug(f"Requesting streaming AI response for model: {CHAT_MODEL_ID}")
+        tier = model_router.route(model_router.classify(user_input))
+        logger.debug(f"Requesting streaming AI response for model: {tier.model}")
         # 添加用户输入到对话历史
         self.add_message("user", user_input)
+        # 构建请求消息列表（系统提示词 + 历史摘要 + token 预算内的历史对话），缓存键按它计算
+        messages = self.build_messages()
+        cache_key = self.get_cache_key(messages)
         
-        # 构建请求消息列表
-        messages = []
-        # 添加系统提示词作为第一条消息
-        messages.append({"role": "system", "content": self.get_system_prompt()})
-        # 添加历史对话
-        messages.extend(self.conversation_history)
+        # 命中回复缓存时按配置的节奏回放，前端仍然保持打字机效果
+        cached_reply = response_cache.get(cache_key) if cache_key else None
+        if cached_reply is not None:
+            logger.debug("[RESPONSE_CACHE] 命中回复缓存，开始回放")
+            async for content in self._replay_cached_reply(cached_reply):
+                yield content
+            self.add_message("assistant", cached_reply)
+            self.summarizer.schedule()
+            return
         
         # 发送请求到模型
         headers = {
-            "Authorization": f"Bearer {MODELSCOPE_API_KEY}",
+            "Authorization": f"Bearer {tier.api_key}",
             "Content-Type": "application/json"
         }
         
         payload = {
-            "model": CHAT_MODEL_ID,
+            "model": tier.model,
             "messages": messages,
             "temperature": CHAT_TEMPERATURE,
             "max_tokens": CHAT_MAX_TOKENS,
@@ -190,53 +300,56 @@ class AIAgent:
         }
         
         start_time = time.time()
+        first_token_latency = None  # 首字延迟，用于模型路由的健康度统计
         full_response = ""  # 用于累积完整回复
+        # 首字延迟样本按档位分开统计，对冲延迟也按档位计算
+        request_policy = RequestPolicy(admission=llm_admission, metric_prefix=f"llm.{tier.name}")
         
         try:
-            response = requests.post(
-                MODELSCOPE_API_URL,
-                headers=headers,
-                json=payload,
-                timeout=STREAM_TIMEOUT,
-                stream=True  # requests 库的流式响应
-            )
+            # 先获得上游调用名额（排队有上限和截止时间），整个流式输出期间占用
+            async with llm_admission.async_slot():
+                start_time = time.time()
+                # 按请求策略执行：首字/字间截止时间，必要时发送对冲请求
+                async for content in request_policy.stream(lambda: self._stream_attempt(tier.api_url, payload, headers)):
+                    if first_token_latency is None:
+                        first_token_latency = time.time() - start_time
+                    full_response += content
+                    yield content  # 逐字返回
+            model_router.record(tier, first_token_latency or (time.time() - start_time), True)
             
-            if response.status_code == 200:
-                # 逐行处理流式响应
-                for line in response.iter_lines():
-                    if line:
-                        line_text = line.decode('utf-8')
-                        # SSE 格式: data: {...}
-                        if line_text.startswith('data: '):
-                            data_str = line_text[6:]  # 去掉 "data: " 前缀
-                            if data_str.strip() == '[DONE]':
-                                break
-                            try:
-                                data = json.loads(data_str)
-                                if 'choices' in data and len(data['choices']) > 0:
-                                    delta = data['choices'][0].get('delta', {})
-                                    content = delta.get('content', '')
-                                    if content:
-                                        full_response += content
-                                        yield content  # 逐字返回
-                            except json.JSONDecodeError:
-                                continue
+            # 流式输出完成后，添加完整回复到对话历史
+            if full_response:
+                self.add_message("assistant", full_response)
+                if cache_key:
+                    response_cache.put(cache_key, full_response)
+                # 回复已完整输出，在后台压缩移出窗口的旧消息
+                self.summarizer.schedule()
+                elapsed_time = time.time() - start_time
+                logger.debug(f"Streaming AI Response completed in {elapsed_time:.2f}s, total length: {len(full_response)}")
                 
-                # 流式输出完成后，添加完整回复到对话历史
-                if full_response:
-                    self.add_message("assistant", full_response)
-                    elapsed_time = time.time() - start_time
-                    logger.debug(f"Streaming AI Response completed in {elapsed_time:.2f}s, total length: {len(full_response)}")
+        except AdmissionRejected:
+            yield ADMISSION_REJECTED_MESSAGE
+        except StreamDeadlineExceeded as e:
+            model_router.record(tier, time.time() - start_time, False)
+            logger.error(f"[REQUEST_POLICY] 流式请求超时: {str(e)}")
+            if full_response:
+                # 已输出的部分回复仍保留在对话历史中
+                self.add_message("assistant", full_response)
+                yield "\n\n（回复中断：模型响应超时）"
             else:
-                error_msg = f"API请求失败: {response.status_code}"
-                logger.error(error_msg)
-                yield error_msg
-                
-        except requests.exceptions.Timeout:
+                yield "抱歉，模型响应超时，请稍后再试。"
+        except UpstreamStatusError as e:
+            model_router.record(tier, time.time() - start_time, False)
+            error_msg = f"API请求失败: {e.status_code}"
+            logger.error(error_msg)
+            yield error_msg
+        except httpx.TimeoutException:
+            model_router.record(tier, time.time() - start_time, False)
             error_msg = "请求超时，请稍后再试"
             logger.error(error_msg)
             yield error_msg
-        except requests.exceptions.RequestException as e:
+        except httpx.HTTPError as e:
+            model_router.record(tier, time.time() - start_time, False)
             error_msg = f"网络请求错误: {str(e)}"
             logger.error(error_msg)
             yield f"抱歉，网络连接出现问题，请检查网络后重试。"
@@ -245,6 +358,32 @@ class AIAgent:
             logger.error(error_msg)
             yield f"抱歉，发生了意外错误。"
     
+    async def _stream_attempt(self, api_url: str, payload: Dict, headers: Dict) -> AsyncGenerator[str, None]:
+        """
+        发起一次流式请求，逐个产出文本增量
+        非 200 状态码抛出 UpstreamStatusError，生成器关闭时连接随之释放
+        """
+        client = get_async_http_client()
+        async with client.stream(
+            "POST",
+            api_url,
+            headers=headers,
+            json=payload,
+            timeout=STREAM_TIMEOUT
+        ) as response:
+            if response.status_code != 200:
+                raise UpstreamStatusError(response.status_code)
+            # 增量解码 SSE 字节流：按网络数据块读取，只提取 delta.content
+            decoder = SSEDecoder()
+            async for raw_chunk in response.aiter_bytes():
+                for content in decoder.feed(raw_chunk):
+                    yield content
+                if decoder.done:
+                    return
+            for content in decoder.flush():
+                yield content
+    
     def reset_conversation(self):
         """重置对话历史"""
-        self.conversation_history = []
\ No newline at end of file
+        self.messages.clear()
+        self.summarizer.reset()
\ No newline at end of file
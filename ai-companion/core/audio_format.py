@@ -0,0 +1,59 @@
+import re
+from typing import Any, NamedTuple, Optional
+
+from config.settings import TTS_AUDIO_FORMAT
+from utils.logger import logger
+
+_FORMAT_RE = re.compile(r"^(WAV|MP3|OGG_OPUS)_(\d+)(K?)HZ_(MONO|STEREO)_(\d+)(BIT|KBPS)$")
+
+# 编码 -> (下发给浏览器的文件扩展名, MIME 类型)
+_DELIVERY = {
+    "WAV": ("wav", "audio/wav"),
+    "MP3": ("mp3", "audio/mpeg"),
+    "OGG_OPUS": ("ogg", "audio/ogg"),
+}
+
+
+class AudioFormatSpec(NamedTuple):
+    """合成音频格式说明"""
+    name: str            # dashscope AudioFormat 枚举名
+    codec: str           # WAV / MP3 / OGG_OPUS（裸 PCM 浏览器无法直接播放，不支持）
+    sample_rate: int
+    extension: str       # 下发格式的文件扩展名（gr.Audio 的 format）
+    mime_type: str
+    bitrate_kbps: Optional[int]  # 压缩格式的码率，WAV 为 None
+
+
+def parse_audio_format(name: str) -> AudioFormatSpec:
+    """解析 AudioFormat 枚举名，例如 MP3_22050HZ_MONO_256KBPS；无法识别时抛出 ValueError"""
+    match = _FORMAT_RE.match(name)
+    if not match:
+        raise ValueError(f"unrecognized audio format: {name}")
+    codec, rate, kilo, _, size, unit = match.groups()
+    sample_rate = int(rate) * (1000 if kilo else 1)
+    extension, mime_type = _DELIVERY[codec]
+    return AudioFormatSpec(name, codec, sample_rate, extension, mime_type,
+                           int(size) if unit == "KBPS" else None)
+
+
+def resolve_sdk_format(name: Optional[str] = None) -> Any:
+    """取 dashscope SDK 中对应的 AudioFormat 枚举值（默认取当前配置），当前 SDK 不支持时退回默认格式"""
+    from dashscope.audio.tts_v2 import AudioFormat
+    name = name or AUDIO_FORMAT.name
+    sdk_format = getattr(AudioFormat, name, None)
+    if sdk_format is None:
+        logger.warning(f"[TTS_FORMAT] 当前 dashscope 版本不支持音频格式 {name}，使用默认格式")
+        return AudioFormat.DEFAULT
+    return sdk_format
+
+
+def _load_configured() -> AudioFormatSpec:
+    try:
+        return parse_audio_format(TTS_AUDIO_FORMAT)
+    except ValueError:
+        logger.warning(f"[TTS_FORMAT] 无法识别的 TTS_AUDIO_FORMAT={TTS_AUDIO_FORMAT}，使用 MP3")
+        return parse_audio_format("MP3_22050HZ_MONO_256KBPS")
+
+
+# 当前配置的合成/下发格式
+AUDIO_FORMAT = _load_configured()
@@ -0,0 +1,85 @@
+import hashlib
+import re
+from typing import Dict, Any, NamedTuple, Optional
+
+from config.settings import AUDIO_STORE_DIR, AUDIO_STORE_MAX_BYTES
+from core.audio_format import AUDIO_FORMAT
+from core.disk_store import DiskStore
+from utils.audio_processing import is_wav, is_mp3
+
+# 文件名：sha256 十六进制摘要 + 扩展名
+_NAME_RE = re.compile(r"^([0-9a-f]{64})\.(wav|mp3|ogg)$")
+
+_MIME_TYPES = {
+    "wav": "audio/wav",
+    "mp3": "audio/mpeg",
+    "ogg": "audio/ogg",
+}
+
+
+class StoredAudio(NamedTuple):
+    """存储中的一个音频文件"""
+    digest: str      # 内容 sha256，同时作为 ETag
+    name: str        # 文件名（digest.扩展名），即 URL 的最后一段
+    path: str        # 磁盘路径
+    size: int
+    mime_type: str
+
+
+def _detect_extension(data: bytes) -> str:
+    """按文件头识别编码，无法识别时按当前配置的合成格式处理"""
+    if is_wav(data):
+        return "wav"
+    if data[:4] == b'OggS':
+        return "ogg"
+    if is_mp3(data):
+        return "mp3"
+    return AUDIO_FORMAT.extension
+
+
+class AudioStore:
+    """
+    按内容寻址的合成音频存储（线程安全）
+    同一段音频只写一次磁盘，文件名即内容哈希，因此 URL 对应的内容永不变化，可以放心长期缓存；
+    超出容量时按最近访问时间（mtime）淘汰
+    """
+
+    def __init__(self, root: str = AUDIO_STORE_DIR, max_bytes: int = AUDIO_STORE_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._disk = DiskStore(root, max_bytes, _NAME_RE, "AUDIO_STORE", "audio_store")
+
+    def put(self, data: bytes) -> Optional[StoredAudio]:
+        """保存音频并返回其存储信息，写入失败时返回 None"""
+        if not data:
+            return None
+        digest = hashlib.sha256(data).hexdigest()
+        extension = _detect_extension(data)
+        name = f"{digest}.{extension}"
+        if not self._disk.write(name, data):
+            return None
+        return StoredAudio(digest, name, self._disk.path(name), len(data), _MIME_TYPES[extension])
+
+    def lookup(self, name: str) -> Optional[StoredAudio]:
+        """按文件名查找音频，文件名不合法或文件不存在时返回 None"""
+        match = _NAME_RE.match(name or "")
+        if not match:
+            return None
+        size = self._disk.size(name)
+        if size is None:
+            return None
+        return StoredAudio(match.group(1), name, self._disk.path(name), size, _MIME_TYPES[match.group(2)])
+
+    def read(self, name: str) -> Optional[bytes]:
+        """按文件名读取音频数据，文件名不合法或文件不存在（已被淘汰）时返回 None"""
+        if not _NAME_RE.match(name or ""):
+            return None
+        return self._disk.read(name)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取存储统计"""
+        return self._disk.get_stats()
+
+
+# 所有会话共享的音频存储（提醒语、重复播放的消息只存一份）
+audio_store = AudioStore()
@@ -1,7 +1,14 @@
-from typing import List, Dict, Optional, Generator
+import asyncio
+from typing import List, Dict, Optional, Generator, AsyncGenerator
 from .ai_agent import AIAgent
 from .tts_manager import TTSManager
+from .sentence_segmenter import SentenceSegmenter
+from .tts_executor import tts_executor, PRIORITY_ALERT, PRIORITY_ON_DEMAND
+from .message_store import MessageStore, Message, ROLE_ASSISTANT
+from .audio_store import audio_store
+from utils.async_utils import run_async_generator
 from utils.logger import logger
+from utils.audio_processing import concat_audio
 
 
 class ChatManager:
@@ -10,95 +17,230 @@ class ChatManager:
     """
     
     def __init__(self):
-        self.ai_agent = AIAgent()
+        # 界面对话记录和模型上下文共用同一个消息存储
+        self.messages = MessageStore()
+        self.ai_agent = AIAgent(self.messages)
         self.tts_manager = TTSManager()
-        self.chat_history = []
+        # 本会话语音合成任务的分组，发送新消息时取消上一条回复尚未开始的合成
+        self._tts_group = f"chat-{id(self)}"
         
     def set_character_style(self, style: str):
         """设置角色风格"""
         self.ai_agent.set_style(style)
         self.tts_manager.set_voice(style)
         
-    def send_message(self, user_input: str) -> Dict[str, str]:
+    def send_message(self, user_input: str, voice_enabled: bool = True) -> Dict[str, str]:
         """
         处理用户消息并返回响应
-        返回包含文本回复和音频数据的字典
+        返回包含文本回复和音频数据的字典（未开启语音时不合成，audio 为 None）
         """
-        # 获取AI回复
+        # 获取AI回复（用户消息和回复由 AI 代理写入消息存储）
+        turn_start = len(self.messages)
         ai_response = self.ai_agent.get_chat_response(user_input)
         
         # 生成语音回复
-        audio_bytes = self.tts_manager.synthesize_speech(ai_response)
-        
-        # 添加到聊天历史
-        self.chat_history.append({
-            "role": "user",
-            "content": user_input
-        })
-        self.chat_history.append({
-            "role": "assistant",
-            "content": ai_response,
-            "audio": audio_bytes if audio_bytes else None
-        })
+        audio_bytes = self.tts_manager.synthesize_speech_queued(ai_response) if voice_enabled else None
+        self._finish_turn(turn_start, ai_response, audio_bytes)
         
         return {
             "text": ai_response,
             "audio": audio_bytes
         }
     
-    def send_message_stream(self, user_input: str) -> Generator[Dict[str, any], None, None]:
+    def send_message_stream(self, user_input: str, voice_enabled: bool = True) -> Generator[Dict[str, any], None, None]:
         """
         处理用户消息并以流式方式返回响应
-        使用生成器逐字返回 AI 回复文本
-        最后一次 yield 包含完整的音频数据
+        同步包装：在后台事件循环中驱动 send_message_stream_async
+        """
+        yield from run_async_generator(self.send_message_stream_async(user_input, voice_enabled))
+    
+    async def send_message_stream_async(self, user_input: str, voice_enabled: bool = True) -> AsyncGenerator[Dict[str, any], None]:
+        """
+        处理用户消息并以异步流式方式返回响应
+        文本逐块返回（is_streaming=True, audio=None）；
+        同时按句切分回复，每句完整后立即交给语音合成，音频帧按句子顺序流式返回
+        （is_streaming=True, audio=音频帧），文本生成与语音合成并行进行；
+        开启语音时，文本全部生成后先返回一次 text_done=True，之后只剩语音帧；
+        最后一次 yield 为 is_streaming=False，表示全部完成
+        未开启语音时只输出文本，完全跳过语音合成（之后可通过 synthesize_message 按需合成）
         """
         logger.debug(f"[CHAT_MANAGER] 开始流式处理消息, 指前文本: {user_input[:50]}...")
+        # 上一条回复的语音已经过期
+        tts_executor.cancel_group(self._tts_group)
+        turn_start = len(self.messages)
+        events: asyncio.Queue = asyncio.Queue()
+        segments: Optional[asyncio.Queue] = asyncio.Queue() if voice_enabled else None
+        producer = asyncio.ensure_future(self._produce_text(user_input, events, segments))
+        synthesizer = asyncio.ensure_future(self._synthesize_segments(segments, events)) if voice_enabled else None
         full_response = ""
+        frame_count = 0
+        sentence_chunks: List[bytes] = []  # 当前句子已到达的语音帧
+        sentence_audio: List[bytes] = []   # 每句一段完整的音频，用于保存回复语音
+        pending_stages = 2 if voice_enabled else 1  # 所有阶段都结束后才算完成
             
         try:
-            # 流式获取 AI 回复，逐字返回
-            logger.debug("[CHAT_MANAGER] 调用 ai_agent.get_chat_response_stream()...")
-            chunk_count = 0
-            for chunk in self.ai_agent.get_chat_response_stream(user_input):
-                full_response += chunk
-                chunk_count += 1
-                logger.debug(f"[CHAT_MANAGER] 接收文本块 #{chunk_count}: {len(chunk)} 字符")
-                # 每获得一个文本块，就返回一次（为前端打字机效果）
-                yield {
-                    "text": chunk,
-                    "audio": None,
-                    "is_streaming": True
-                }
+            while pending_stages:
+                kind, value = await events.get()
+                if kind == "text":
+                    full_response += value
+                    # 每获得一个文本块，就返回一次（为前端打字机效果）
+                    yield {
+                        "text": value,
+                        "audio": None,
+                        "is_streaming": True
+                    }
+                elif kind == "audio":
+                    frame_count += 1
+                    sentence_chunks.append(value)
+                    logger.debug(f"[CHAT_MANAGER] 第 {frame_count} 帧语音就绪: {len(value)} bytes")
+                    yield {
+                        "text": "",
+                        "audio": value,
+                        "is_streaming": True
+                    }
+                elif kind == "audio_end":
+                    # 一句话的语音帧按顺序拼起来才是一个完整的音频流（WAV 只有首帧带头部）
+                    if sentence_chunks:
+                        sentence_audio.append(b"".join(sentence_chunks))
+                        sentence_chunks = []
+                elif kind == "error":
+                    raise value
+                elif kind == "text_done":
+                    pending_stages -= 1
+                    if pending_stages:
+                        # 文本已全部生成、语音仍在合成：通知调用方立即显示尚未刷新的文本
+                        yield {
+                            "text": "",
+                            "audio": None,
+                            "is_streaming": True,
+                            "text_done": True
+                        }
+                else:
+                    pending_stages -= 1
                 
-            logger.info(f"[CHAT_MANAGER] ✅ 流式文本输出完成, 共 {len(full_response)} 字符")
+            logger.info(f"[CHAT_MANAGER] ✅ 流式输出完成, 共 {len(full_response)} 字符, {frame_count} 帧语音")
                 
-            # 流式输出完成后，生成完整的语音回复
-            logger.debug("[CHAT_MANAGER] 开始语音合成...")
-            audio_bytes = self.tts_manager.synthesize_speech(full_response)
-            logger.debug(f"[CHAT_MANAGER] 语音合成完成: {type(audio_bytes).__name__} {f'({len(audio_bytes)} bytes)' if isinstance(audio_bytes, bytes) else ''}")
+            reply_message = self._record_reply(turn_start, full_response)
+            if reply_message is not None and sentence_audio:
+                # 拼接、计算摘要和写文件都是阻塞操作，放到线程中执行
+                await asyncio.to_thread(self._store_reply_audio, reply_message, sentence_audio)
                 
-            # 添加到聊天历史
-            self.chat_history.append({
-                "role": "user",
-                "content": user_input
-            })
-            self.chat_history.append({
-                "role": "assistant",
-                "content": full_response,
-                "audio": audio_bytes if audio_bytes else None
-            })
-                
-            # 最后一次返回，包含语音数据
-            logger.debug(f"[CHAT_MANAGER] 最后一次 yield 包含语音数据")
             yield {
                 "text": "",
-                "audio": audio_bytes if audio_bytes else None,
+                "audio": None,
                 "is_streaming": False
             }
                 
         except Exception as e:
             logger.error(f"[CHAT_MANAGER] ❌ 流式处理错误: {str(e)}", exc_info=True)
             raise
+        finally:
+            # 客户端断开或出错时停止两个阶段
+            for task in (producer, synthesizer):
+                if task is not None:
+                    task.cancel()
+    
+    def _finish_turn(self, turn_start: int, reply: str, audio: Optional[bytes]):
+        """一轮对话结束（同步调用）：记录回复，回复语音保存到音频存储"""
+        reply_message = self._record_reply(turn_start, reply)
+        if reply_message is not None and audio:
+            self._attach_audio(reply_message, audio)
+    
+    def _record_reply(self, turn_start: int, reply: str) -> Optional[Message]:
+        """
+        取出本轮的回复消息：AI 代理没有记录回复时（出错、限流等提示），
+        把显示给用户的文字记为只在界面显示的消息
+        """
+        reply_message = None
+        for message in self.messages.since(turn_start):
+            if message.role == ROLE_ASSISTANT:
+                reply_message = message
+        if reply_message is None and reply:
+            reply_message = self.messages.append(ROLE_ASSISTANT, reply, in_context=False)
+        return reply_message
+    
+    def _store_reply_audio(self, message: Message, sentence_audio: List[bytes]):
+        """把逐句合成的语音拼接为一段（WAV 合并为一个 RIFF 文件）并保存"""
+        try:
+            audio = concat_audio(sentence_audio)
+        except ValueError as e:
+            logger.warning(f"[CHAT_MANAGER] 回复语音无法拼接，不保存: {str(e)}")
+            return
+        self._attach_audio(message, audio)
+    
+    @staticmethod
+    def _attach_audio(message: Message, audio: bytes):
+        """语音保存到音频存储，消息只记录文件名（阻塞的文件操作）"""
+        stored = audio_store.put(audio)
+        if stored is not None:
+            message.audio = stored.name
+    
+    async def _produce_text(self, user_input: str, events: asyncio.Queue, segments: Optional[asyncio.Queue]):
+        """文本阶段：转发模型输出，并把切好的句子交给语音阶段（segments 为 None 时不分句）"""
+        segmenter = SentenceSegmenter() if segments is not None else None
+        try:
+            async for chunk in self.ai_agent.get_chat_response_stream_async(user_input):
+                events.put_nowait(("text", chunk))
+                if segmenter is not None:
+                    for segment in segmenter.feed(chunk):
+                        segments.put_nowait(segment)
+            tail = segmenter.flush() if segmenter is not None else None
+            if tail:
+                segments.put_nowait(tail)
+        except Exception as e:
+            events.put_nowait(("error", e))
+        finally:
+            if segments is not None:
+                segments.put_nowait(None)
+            events.put_nowait(("text_done", None))
+    
+    async def _synthesize_segments(self, segments: asyncio.Queue, events: asyncio.Queue):
+        """语音阶段：逐句合成，保证音频顺序与文本一致"""
+        try:
+            while True:
+                segment = await segments.get()
+                if segment is None:
+                    break
+                # 流式合成：每句的音频帧到达即转发，不必等整句合成完毕
+                async for audio_chunk in self.tts_manager.synthesize_speech_stream(segment, group=self._tts_group):
+                    events.put_nowait(("audio", audio_chunk))
+                events.put_nowait(("audio_end", None))
+        finally:
+            events.put_nowait(("audio_done", None))
+    
+    async def synthesize_message(self, text: str) -> Optional[bytes]:
+        """
+        按需为一条已有消息合成语音（用户点击消息时播放）
+        优先复用该消息已合成的音频；否则按句合成，与流式播报时的分句一致，可以命中语音缓存
+        """
+        if not text or not text.strip():
+            return None
+        message = next((m for m in reversed(self.messages) if m.role == ROLE_ASSISTANT and m.content == text), None)
+        if message is not None and message.audio:
+            audio_bytes = await asyncio.to_thread(audio_store.read, message.audio)
+            if audio_bytes:
+                logger.debug("[CHAT_MANAGER] 复用已合成的消息语音")
+                return audio_bytes
+
+        segmenter = SentenceSegmenter()
+        sentences = segmenter.feed(text)
+        tail = segmenter.flush()
+        if tail:
+            sentences.append(tail)
+        audio_parts = []
+        for sentence in sentences:
+            audio_bytes = await self.tts_manager.synthesize_speech_async(sentence, priority=PRIORITY_ON_DEMAND)
+            if audio_bytes:
+                audio_parts.append(audio_bytes)
+        try:
+            audio_bytes = await asyncio.to_thread(concat_audio, audio_parts) or None
+        except ValueError as e:
+            # 各句语音格式不一致（如部分来自旧格式的语音缓存）时，整段文本重新合成为一段
+            logger.warning(f"[CHAT_MANAGER] 逐句语音无法拼接，整段重新合成: {str(e)}")
+            audio_bytes = await self.tts_manager.synthesize_speech_async(text, priority=PRIORITY_ON_DEMAND)
+        if message is not None and audio_bytes:
+            await asyncio.to_thread(self._attach_audio, message, audio_bytes)
+        return audio_bytes
     
     def get_alert_response(self, trigger_type: str) -> Dict[str, str]:
         """
@@ -107,8 +249,8 @@ class ChatManager:
         # 获取AI提醒响应
         ai_response = self.ai_agent.get_alert_response(trigger_type)
         
-        # 生成语音提醒
-        audio_bytes = self.tts_manager.synthesize_speech(ai_response)
+        # 生成语音提醒（提醒优先于聊天回复合成）
+        audio_bytes = self.tts_manager.synthesize_speech_queued(ai_response, priority=PRIORITY_ALERT)
         
         return {
             "text": ai_response,
@@ -117,9 +259,32 @@ class ChatManager:
     
     def reset_chat(self):
         """重置聊天"""
-        self.chat_history = []
         self.ai_agent.reset_conversation()
         
-    def get_chat_history(self) -> List[Dict]:
-        """获取聊天历史"""
-        return self.chat_history
\ No newline at end of file
+    def add_greeting(self, text: str):
+        """添加一条助手问候消息（新会话或重置对话后）"""
+        self.ai_agent.add_message(ROLE_ASSISTANT, text)
+        
+    def get_chat_history(self) -> MessageStore:
+        """获取聊天历史（界面对话记录与模型上下文共用的消息存储）"""
+        return self.messages
+    
+    def get_transcript(self) -> List[Dict[str, str]]:
+        """获取界面对话记录（Chatbot 消息格式的新列表，不含语音），服务端保存的记录为准"""
+        return self.messages.transcript()
+    
+    def export_state(self) -> Dict:
+        """导出会话状态（消息存储 + 滚动摘要，语音只保存引用），用于保存到状态后端"""
+        return {
+            "messages": self.messages.export_state(),
+            "summarizer": self.ai_agent.summarizer.export_state()
+        }
+    
+    def restore_state(self, state: Dict):
+        """从 export_state 的结果恢复会话状态"""
+        self.messages.restore_state(state.get("messages") or {})
+        self.ai_agent.summarizer.restore_state(state.get("summarizer") or {})
+    
+    def close(self):
+        """释放会话资源：取消本会话尚未开始的语音合成任务"""
+        tts_executor.cancel_group(self._tts_group)
\ No newline at end of file
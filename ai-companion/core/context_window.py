@@ -0,0 +1,59 @@
+from typing import TYPE_CHECKING, Dict, List, Sequence
+
+from config.constants import STYLE_PROMPTS
+
+if TYPE_CHECKING:
+    from .message_store import Message
+
+# 每条消息的格式开销（角色标记、分隔符等）
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    估算文本的 token 数
+    Qwen 系列分词器中一个汉字约占 1 个 token，英文等 ASCII 字符约 4 个字符占 1 个 token，
+    这里按此规则保守估算，无需加载分词器
+    """
+    if not text:
+        return 0
+    ascii_count = len(text.encode('ascii', 'ignore'))
+    non_ascii_count = len(text) - ascii_count
+    return non_ascii_count + (ascii_count + 3) // 4
+
+
+# 预先计算每个角色系统提示词的 token 数
+STYLE_PROMPT_TOKENS = {
+    style: estimate_tokens(prompt) + MESSAGE_OVERHEAD_TOKENS
+    for style, prompt in STYLE_PROMPTS.items()
+}
+
+
+SUMMARY_PREFIX = "以下是你和用户之前对话的摘要，请在回复时参考：\n"
+
+
+def build_context_messages(system_prompt: str,
+                           system_tokens: int,
+                           history: Sequence["Message"],
+                           token_budget: int,
+                           summary: str = "",
+                           summary_tokens: int = 0) -> List[Dict]:
+    """
+    构建发送给模型的消息列表
+    系统提示词之后注入历史摘要（如有），然后从最新的消息开始向前填充，
+    直到用完 token 预算；最新一条消息总会被保留
+    """
+    remaining = token_budget - system_tokens - summary_tokens
+    selected = []
+    for message in reversed(history):
+        if selected and message.tokens > remaining:
+            break
+        remaining -= message.tokens
+        # 只发送 API 需要的字段
+        selected.append(message.to_dict())
+
+    selected.reverse()
+    messages = [{"role": "system", "content": system_prompt}]
+    if summary:
+        messages.append({"role": "system", "content": SUMMARY_PREFIX + summary})
+    return messages + selected
@@ -0,0 +1,164 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+from config.settings import (
+    API_TIMEOUT,
+    SUMMARY_MAX_TOKENS,
+    SUMMARY_MAX_PENDING_MESSAGES,
+    SUMMARY_WORKERS
+)
+from utils.logger import logger
+from .context_window import estimate_tokens, MESSAGE_OVERHEAD_TOKENS, SUMMARY_PREFIX
+from .message_store import Message
+from .http_client import get_http_client
+from .model_router import model_router
+from .admission_control import llm_admission, AdmissionRejected
+
+# 所有会话共享的摘要工作线程池，摘要任务不在请求路径上执行
+_summary_executor = ThreadPoolExecutor(max_workers=SUMMARY_WORKERS, thread_name_prefix="summarizer")
+
+SUMMARY_PROMPT = """请把下面的“已有摘要”和“新的对话片段”合并为一段新的对话摘要。
+要求：
+1. 保留用户的学习目标、学习计划、个人偏好、情绪状态和尚未解决的问题；
+2. 省略寒暄和重复内容，使用第三人称客观叙述；
+3. 不超过 {max_chars} 个字，只输出摘要本身。
+
+【已有摘要】
+{summary}
+
+【新的对话片段】
+{transcript}"""
+
+ROLE_NAMES = {"user": "用户", "assistant": "助手"}
+
+
+class ConversationSummarizer:
+    """
+    滚动对话摘要器
+    接收被移出上下文窗口的旧消息，在后台线程中把它们压缩进一段持续更新的摘要，
+    摘要会在系统提示词之后注入，使长时间对话的提示词长度保持稳定
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending: List[Message] = []  # 等待压缩的已移出消息
+        self._running = False              # 是否有摘要任务在执行
+        self._generation = 0               # 重置计数，用于丢弃过期的摘要结果
+        self.summary = ""
+        self.summary_tokens = 0
+
+    def add_evicted(self, message: Message):
+        """记录一条被移出上下文窗口的消息"""
+        with self._lock:
+            self._pending.append(message)
+            # 摘要持续失败时也不能无限堆积
+            if len(self._pending) > SUMMARY_MAX_PENDING_MESSAGES:
+                dropped = len(self._pending) - SUMMARY_MAX_PENDING_MESSAGES
+                del self._pending[:dropped]
+                logger.warning(f"[SUMMARY] 待摘要消息过多，丢弃最旧的 {dropped} 条")
+
+    def schedule(self):
+        """
+        若有待压缩的消息，则提交后台摘要任务（非阻塞，应在回复完成后调用）
+        """
+        with self._lock:
+            if self._running or not self._pending:
+                return
+            self._running = True
+            batch = list(self._pending)
+            generation = self._generation
+        _summary_executor.submit(self._run, batch, generation)
+
+    def reset(self):
+        """清空摘要与待处理消息"""
+        with self._lock:
+            self._pending = []
+            self._generation += 1
+            self.summary = ""
+            self.summary_tokens = 0
+
+    def export_state(self) -> Dict:
+        """导出摘要与待处理消息（紧凑格式），用于保存到状态后端"""
+        with self._lock:
+            return {
+                "summary": self.summary,
+                "pending": [[m.role, m.content] for m in self._pending]
+            }
+
+    def restore_state(self, state: Dict):
+        """从 export_state 的结果恢复；正在执行的摘要任务结果会被丢弃"""
+        summary = state.get("summary") or ""
+        with self._lock:
+            self._generation += 1
+            self._pending = [Message(role, content) for role, content in state.get("pending", [])]
+            self.summary = summary
+            self.summary_tokens = (estimate_tokens(SUMMARY_PREFIX + summary) + MESSAGE_OVERHEAD_TOKENS) if summary else 0
+
+    def _run(self, batch: List[Message], generation: int):
+        """后台执行一次摘要"""
+        succeeded = False
+        try:
+            new_summary = self._summarize(self.summary, batch)
+            with self._lock:
+                if generation == self._generation and new_summary:
+                    self.summary = new_summary
+                    self.summary_tokens = estimate_tokens(SUMMARY_PREFIX + new_summary) + MESSAGE_OVERHEAD_TOKENS
+                    # 只移除已经压缩进摘要的消息，期间新移出的消息留到下一轮
+                    batch_ids = {id(m) for m in batch}
+                    self._pending = [m for m in self._pending if id(m) not in batch_ids]
+                    succeeded = True
+                    logger.debug(f"[SUMMARY] 摘要已更新: 压缩 {len(batch)} 条消息, 摘要约 {self.summary_tokens} tokens")
+        except Exception as e:
+            logger.error(f"[SUMMARY] 摘要任务失败: {str(e)}", exc_info=True)
+        finally:
+            with self._lock:
+                self._running = False
+            # 执行期间又有新消息被移出时继续压缩；失败则等下一轮回复结束再重试
+            if succeeded:
+                self.schedule()
+
+    def _summarize(self, summary: str, batch: List[Message]) -> str:
+        """调用模型生成新的摘要，失败时返回空字符串"""
+        transcript = "\n".join(
+            f"{ROLE_NAMES.get(m.role, m.role)}：{m.content}" for m in batch
+        )
+        prompt = SUMMARY_PROMPT.format(
+            max_chars=SUMMARY_MAX_TOKENS,
+            summary=summary or "（无）",
+            transcript=transcript
+        )
+        tier = model_router.route("summary")
+        payload = {
+            "model": tier.model,
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": 0.3,
+            "max_tokens": SUMMARY_MAX_TOKENS
+        }
+        headers = {
+            "Authorization": f"Bearer {tier.api_key}",
+            "Content-Type": "application/json"
+        }
+        start_time = time.time()
+        try:
+            # 摘要与用户请求共用上游名额，繁忙时放弃本轮，等下一轮回复结束再重试
+            with llm_admission.slot():
+                start_time = time.time()
+                response = get_http_client().post(
+                    tier.api_url,
+                    headers=headers,
+                    json=payload,
+                    timeout=API_TIMEOUT
+                )
+        except AdmissionRejected:
+            logger.warning("[SUMMARY] 上游繁忙，推迟本轮摘要")
+            return ""
+        except Exception:
+            model_router.record(tier, time.time() - start_time, False, first_token=False)
+            raise
+        model_router.record(tier, time.time() - start_time, response.status_code == 200, first_token=False)
+        if response.status_code != 200:
+            logger.warning(f"[SUMMARY] 摘要请求失败: {response.status_code}")
+            return ""
+        return response.json()['choices'][0]['message']['content'].strip()
@@ -0,0 +1,153 @@
+import os
+import re
+import tempfile
+import threading
+from typing import Dict, Any, Optional
+
+from utils.logger import logger
+from utils.metrics import metrics
+
+
+class DiskStore:
+    """
+    按内容寻址的磁盘文件存储（线程安全），语音缓存和音频存储共用
+        - 文件名由调用方按内容哈希生成，按前两个字符分子目录存放
+        - 原子写入：先写临时文件再 os.replace，读方不会看到半个文件
+        - 超出容量时按最近访问时间（mtime）淘汰，读取和重复写入都会刷新 mtime
+        - 启动时扫描目录恢复索引，进程重启后仍可复用
+    """
+
+    def __init__(self, root: str, max_bytes: int, name_pattern: re.Pattern, tag: str, metric_prefix: str):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.name_pattern = name_pattern  # 只索引匹配的文件名，忽略临时文件和其它文件
+        self.tag = tag
+        self.metric_prefix = metric_prefix
+        self._lock = threading.Lock()
+        self._index: Dict[str, int] = {}  # 文件名 -> 字节数
+        self._total = 0
+        self._load_index()
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.root, name[:2], name)
+
+    def _load_index(self):
+        """启动时扫描存储目录，恢复索引"""
+        if not self.root or not os.path.isdir(self.root):
+            return
+        for root, _, files in os.walk(self.root):
+            for name in files:
+                if not self.name_pattern.match(name):
+                    continue
+                try:
+                    size = os.path.getsize(os.path.join(root, name))
+                except OSError:
+                    continue
+                self._index[name] = size
+                self._total += size
+        logger.debug(f"[{self.tag}] 已有文件: {len(self._index)} 个, {self._total} bytes")
+
+    def contains(self, name: str) -> bool:
+        with self._lock:
+            return name in self._index
+
+    def write(self, name: str, data: bytes) -> bool:
+        """写入文件（已存在时只刷新最近访问时间），返回文件是否在存储中"""
+        if not data or not self.root or len(data) > self.max_bytes:
+            return False
+        path = self.path(name)
+        if self.contains(name):
+            try:
+                os.utime(path, None)
+                metrics.inc(f"{self.metric_prefix}.dedup")
+                return True
+            except OSError:
+                self._forget(name)
+
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        except OSError as e:
+            logger.warning(f"[{self.tag}] 写入文件失败: {str(e)}")
+            return False
+
+        with self._lock:
+            if name not in self._index:
+                self._index[name] = len(data)
+                self._total += len(data)
+            over_limit = self._total > self.max_bytes
+        metrics.inc(f"{self.metric_prefix}.writes")
+        if over_limit:
+            self._evict()
+        metrics.set_gauge(f"{self.metric_prefix}.bytes", self._total)
+        return True
+
+    def size(self, name: str) -> Optional[int]:
+        """文件字节数，文件不存在（已被淘汰或外部删除）时返回 None"""
+        try:
+            return os.path.getsize(self.path(name))
+        except OSError:
+            self._forget(name)
+            return None
+
+    def read(self, name: str) -> Optional[bytes]:
+        """读取文件并刷新最近访问时间，文件不存在时返回 None"""
+        path = self.path(name)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path, None)
+            return data
+        except OSError:
+            self._forget(name)
+            return None
+
+    def _forget(self, name: str):
+        """文件已被外部删除，同步索引"""
+        with self._lock:
+            size = self._index.pop(name, None)
+            if size is not None:
+                self._total -= size
+
+    def _evict(self):
+        """超出容量时删除最久未访问的文件，直到降到上限的 90%"""
+        entries = []
+        with self._lock:
+            names = list(self._index)
+        for name in names:
+            try:
+                entries.append((os.path.getmtime(self.path(name)), name))
+            except OSError:
+                entries.append((0.0, name))
+        entries.sort()
+
+        target = self.max_bytes * 0.9
+        removed = 0
+        for _, name in entries:
+            with self._lock:
+                if self._total <= target:
+                    break
+                size = self._index.pop(name, None)
+                if size is None:
+                    continue
+                self._total -= size
+            try:
+                os.unlink(self.path(name))
+            except OSError:
+                pass
+            removed += 1
+        if removed:
+            metrics.inc(f"{self.metric_prefix}.evictions", removed)
+            logger.debug(f"[{self.tag}] 淘汰 {removed} 个文件")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取存储统计"""
+        with self._lock:
+            return {"files": len(self._index), "bytes": self._total}
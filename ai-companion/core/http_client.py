@@ -0,0 +1,189 @@
+import asyncio
+import threading
+import time
+import weakref
+from typing import Dict, Any, Optional
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from config.settings import (
+    HTTP_POOL_CONNECTIONS,
+    HTTP_POOL_MAXSIZE,
+    HTTP_POOL_BLOCK,
+    HTTP_KEEPALIVE_EXPIRY
+)
+from utils.logger import logger
+
+
+class PoolStats:
+    """
+    连接池统计数据（线程安全）
+    记录连接借出次数、复用次数、新建连接数以及借出等待时间
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0          # 连接借出次数
+        self.reused = 0             # 复用已有 keep-alive 连接的次数
+        self.new_connections = 0    # 新建连接对象次数
+        self.wait_total = 0.0       # 借出连接累计等待时间（秒）
+        self.wait_max = 0.0         # 借出连接最长等待时间（秒）
+
+    def record_checkout(self, wait_time: float, reused: bool):
+        """记录一次连接借出"""
+        with self._lock:
+            self.checkouts += 1
+            if reused:
+                self.reused += 1
+            self.wait_total += wait_time
+            if wait_time > self.wait_max:
+                self.wait_max = wait_time
+
+    def record_new_connection(self):
+        """记录一次新建连接"""
+        with self._lock:
+            self.new_connections += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """获取统计快照"""
+        with self._lock:
+            checkouts = self.checkouts
+            return {
+                "checkouts": checkouts,
+                "reused": self.reused,
+                "new_connections": self.new_connections,
+                "reuse_ratio": round(self.reused / checkouts, 4) if checkouts else 0.0,
+                "wait_avg_ms": round(self.wait_total / checkouts * 1000, 3) if checkouts else 0.0,
+                "wait_max_ms": round(self.wait_max * 1000, 3)
+            }
+
+
+def _make_pool_class(base_class, stats: PoolStats):
+    """
+    创建带统计功能的 urllib3 连接池类
+    """
+
+    class InstrumentedPool(base_class):
+        def _new_conn(self):
+            stats.record_new_connection()
+            return super()._new_conn()
+
+        def _get_conn(self, timeout=None):
+            start_time = time.perf_counter()
+            conn = super()._get_conn(timeout=timeout)
+            wait_time = time.perf_counter() - start_time
+            # 已建立 socket 的连接说明是复用的 keep-alive 连接
+            stats.record_checkout(wait_time, getattr(conn, "sock", None) is not None)
+            return conn
+
+    InstrumentedPool.__name__ = f"Instrumented{base_class.__name__}"
+    return InstrumentedPool
+
+
+class _PooledAdapter(HTTPAdapter):
+    """
+    使用带统计功能连接池的 HTTPAdapter
+    """
+
+    def __init__(self, stats: PoolStats, **kwargs):
+        # HTTPAdapter.__init__ 内部会调用 init_poolmanager，需提前设置
+        self._stats = stats
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        super().init_poolmanager(connections, maxsize, block=block, **pool_kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _make_pool_class(HTTPConnectionPool, self._stats),
+            "https": _make_pool_class(HTTPSConnectionPool, self._stats)
+        }
+
+
+class HTTPClient:
+    """
+    共享的 HTTP 客户端，基于 requests.Session 提供连接池与 keep-alive
+    所有 AI 请求复用同一组 TCP/TLS 连接，避免每轮对话重新握手
+    """
+
+    def __init__(self,
+                 pool_connections: int = HTTP_POOL_CONNECTIONS,
+                 pool_maxsize: int = HTTP_POOL_MAXSIZE,
+                 pool_block: bool = HTTP_POOL_BLOCK):
+        """
+        Args:
+            pool_connections: 缓存的主机连接池数量
+            pool_maxsize: 每个主机允许的最大连接数
+            pool_block: 连接数达到上限时是否阻塞等待（否则临时新建连接）
+        """
+        self.stats = PoolStats()
+        self.session = requests.Session()
+        self.session.headers.update({"Connection": "keep-alive"})
+
+        adapter = _PooledAdapter(
+            self.stats,
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            pool_block=pool_block
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        logger.debug(f"[HTTP_POOL] 初始化连接池: connections={pool_connections}, "
+                     f"maxsize={pool_maxsize}, block={pool_block}")
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        """发送 POST 请求（复用连接池）"""
+        return self.session.post(url, **kwargs)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        """发送 GET 请求（复用连接池）"""
+        return self.session.get(url, **kwargs)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取连接池统计信息（复用率、借出等待时间等）"""
+        return self.stats.snapshot()
+
+    def close(self):
+        """关闭所有连接"""
+        self.session.close()
+
+
+_http_client: Optional[HTTPClient] = None
+_http_client_lock = threading.Lock()
+
+
+def get_http_client() -> HTTPClient:
+    """
+    获取全局共享的 HTTP 客户端（懒加载，线程安全）
+    """
+    global _http_client
+    if _http_client is None:
+        with _http_client_lock:
+            if _http_client is None:
+                _http_client = HTTPClient()
+    return _http_client
+
+
+# 异步客户端按事件循环缓存：httpx.AsyncClient 的连接绑定在创建它的事件循环上
+_async_http_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """
+    获取当前事件循环共享的非阻塞 HTTP 客户端（须在协程内调用）
+    连接池上限与同步客户端使用相同的配置
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_http_clients.get(loop)
+    if client is None:
+        client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=HTTP_POOL_MAXSIZE,
+                max_keepalive_connections=HTTP_POOL_MAXSIZE,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY
+            )
+        )
+        _async_http_clients[loop] = client
+        logger.debug(f"[HTTP_POOL] 初始化异步连接池: maxsize={HTTP_POOL_MAXSIZE}")
+    return client
@@ -0,0 +1,115 @@
+import sys
+from typing import Any, Dict, List, Optional
+
+from .context_window import estimate_tokens, MESSAGE_OVERHEAD_TOKENS
+
+# 角色字符串驻留：所有消息（包括从状态后端恢复的）共用同一个字符串对象
+ROLE_USER = sys.intern("user")
+ROLE_ASSISTANT = sys.intern("assistant")
+
+
+class Message:
+    """
+    一条对话消息的紧凑记录（__slots__，没有实例字典）
+    token 估算值在创建时缓存；语音只保存音频存储中的文件名（引用），音频数据留在磁盘上
+    """
+
+    __slots__ = ("role", "content", "tokens", "audio", "in_context")
+
+    def __init__(self, role: str, content: str, audio: Optional[str] = None, in_context: bool = True):
+        self.role = sys.intern(role)
+        self.content = content
+        self.tokens = estimate_tokens(content) + MESSAGE_OVERHEAD_TOKENS
+        self.audio = audio
+        self.in_context = in_context  # False 表示只在界面显示（如出错提示），不发送给模型
+
+    def to_dict(self) -> Dict[str, str]:
+        """转换为 Chatbot / 模型接口使用的消息格式"""
+        return {"role": self.role, "content": self.content}
+
+
+class MessageStore:
+    """
+    单个会话的统一消息存储：界面对话记录和模型上下文共用同一份消息，不再各存一份
+        - transcript(): 界面对话记录视图（全部消息）
+        - context(): 模型上下文视图（窗口起点之后、需要发送给模型的消息）
+    窗口起点只向后移动：移出窗口的消息仍保留在界面记录中，由 AIAgent 交给摘要器压缩
+    """
+
+    def __init__(self):
+        self._messages: List[Message] = []
+        self._context_start = 0   # 模型上下文窗口起点
+        self.context_count = 0    # 窗口内发送给模型的消息数
+        self.context_tokens = 0   # 窗口内消息的 token 估算总数
+
+    def __len__(self) -> int:
+        return len(self._messages)
+
+    def __getitem__(self, index: int) -> Message:
+        return self._messages[index]
+
+    def append(self, role: str, content: str, audio: Optional[str] = None, in_context: bool = True) -> Message:
+        """追加一条消息并返回它"""
+        message = Message(role, content, audio, in_context)
+        self._messages.append(message)
+        if in_context:
+            self.context_count += 1
+            self.context_tokens += message.tokens
+        return message
+
+    def evict_oldest(self) -> Optional[Message]:
+        """把模型上下文中最旧的一条消息移出窗口并返回，窗口为空时返回 None"""
+        while self._context_start < len(self._messages):
+            message = self._messages[self._context_start]
+            self._context_start += 1
+            if message.in_context:
+                self.context_count -= 1
+                self.context_tokens -= message.tokens
+                return message
+        return None
+
+    def since(self, index: int) -> List[Message]:
+        """第 index 条之后（含）的消息"""
+        return self._messages[index:]
+
+    def context(self) -> List[Message]:
+        """模型上下文视图"""
+        return [m for m in self._messages[self._context_start:] if m.in_context]
+
+    def transcript(self) -> List[Dict[str, str]]:
+        """界面对话记录视图（Chatbot 消息格式的新列表）"""
+        return [m.to_dict() for m in self._messages]
+
+    def clear(self):
+        self._messages = []
+        self._context_start = 0
+        self.context_count = 0
+        self.context_tokens = 0
+
+    def estimate_bytes(self) -> int:
+        """估算占用的内存：消息记录、文本和语音引用（音频数据在磁盘上，不计入）"""
+        size = sys.getsizeof(self._messages)
+        for message in self._messages:
+            size += sys.getsizeof(message) + sys.getsizeof(message.content)
+            if message.audio:
+                size += sys.getsizeof(message.audio)
+        return size
+
+    def export_state(self) -> Dict[str, Any]:
+        """导出为紧凑格式（[角色, 内容, 语音引用, 是否发送给模型] 列表 + 窗口起点），用于保存到状态后端"""
+        return {
+            "messages": [[m.role, m.content, m.audio, int(m.in_context)] for m in self._messages],
+            "context_start": self._context_start
+        }
+
+    def restore_state(self, state: Dict[str, Any]):
+        """从 export_state 的结果恢复（token 估算值重新计算）"""
+        self.clear()
+        for role, content, audio, in_context in state.get("messages", []):
+            self.append(role, content, audio, bool(in_context))
+        start = min(int(state.get("context_start") or 0), len(self._messages))
+        for message in self._messages[:start]:
+            if message.in_context:
+                self.context_count -= 1
+                self.context_tokens -= message.tokens
+        self._context_start = start
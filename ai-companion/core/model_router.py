@@ -0,0 +1,114 @@
+import threading
+import time
+from collections import deque
+from typing import Dict, Any, List, Optional
+
+from config.settings import (
+    MODEL_TIERS,
+    ROUTE_KIND_TIERS,
+    ROUTER_WINDOW_SECONDS,
+    ROUTER_MIN_SAMPLES,
+    ROUTER_P95_THRESHOLD,
+    ROUTER_ERROR_RATE_THRESHOLD
+)
+from config.constants import QUICK_TOOL_PROMPTS
+from utils.logger import logger
+from utils.metrics import metrics
+
+# 快捷工具的固定提示词（规范化后）用于识别模板化请求
+_QUICK_TOOL_TEXTS = frozenset(p.strip() for p in QUICK_TOOL_PROMPTS.values())
+
+
+class ModelTier:
+    """
+    一个 OpenAI 兼容的模型档位，记录最近一段时间的延迟与错误情况
+    """
+
+    def __init__(self, name: str, model: str, api_url: str, api_key: Optional[str]):
+        self.name = name
+        self.model = model
+        self.api_url = api_url
+        self.api_key = api_key
+        self._lock = threading.Lock()
+        self._samples = deque(maxlen=200)  # (记录时间, 首字延迟秒数或 None, 是否成功)
+
+    def record(self, latency: Optional[float], ok: bool):
+        """记录一次请求结果（latency 为 None 时只计入错误率）"""
+        with self._lock:
+            self._samples.append((time.monotonic(), latency, ok))
+
+    def health(self) -> Dict[str, Any]:
+        """统计时间窗口内的 p95 延迟与错误率"""
+        cutoff = time.monotonic() - ROUTER_WINDOW_SECONDS
+        with self._lock:
+            recent = [s for s in self._samples if s[0] >= cutoff]
+        if not recent:
+            return {"samples": 0, "p95": None, "error_rate": 0.0}
+        latencies = sorted(s[1] for s in recent if s[2] and s[1] is not None)
+        p95 = latencies[min(len(latencies) - 1, int(round(0.95 * (len(latencies) - 1))))] if latencies else None
+        errors = sum(1 for s in recent if not s[2])
+        return {"samples": len(recent), "p95": p95, "error_rate": errors / len(recent)}
+
+    def is_degraded(self) -> bool:
+        """样本足够且 p95 延迟或错误率超过阈值时视为降级"""
+        health = self.health()
+        if health["samples"] < ROUTER_MIN_SAMPLES:
+            return False
+        if health["error_rate"] > ROUTER_ERROR_RATE_THRESHOLD:
+            return True
+        return health["p95"] is not None and health["p95"] > ROUTER_P95_THRESHOLD
+
+
+class ModelRouter:
+    """
+    模型路由器
+    按请求类型选择模型档位（提醒、快捷工具、摘要等短请求走小模型），
+    并在目标档位延迟或错误率超标时自动切换到下一个（更小、更快的）档位。
+    降级状态只看最近 ROUTER_WINDOW_SECONDS 秒的样本，过期后自动恢复到原档位。
+    """
+
+    def __init__(self, tiers: List[Dict] = MODEL_TIERS, kind_tiers: Dict[str, str] = ROUTE_KIND_TIERS):
+        self.tiers = [ModelTier(t["name"], t["model"], t["api_url"], t.get("api_key")) for t in tiers]
+        self._tier_index = {tier.name: i for i, tier in enumerate(self.tiers)}
+        self.kind_tiers = kind_tiers
+
+    @staticmethod
+    def classify(user_input: str) -> str:
+        """判断用户输入的请求类型：快捷工具的固定提示词或普通聊天"""
+        return "quick_tool" if user_input.strip() in _QUICK_TOOL_TEXTS else "chat"
+
+    def route(self, kind: str) -> ModelTier:
+        """为指定类型的请求选择模型档位"""
+        start = self._tier_index.get(self.kind_tiers.get(kind, ""), 0)
+        chosen = self.tiers[start]
+        for tier in self.tiers[start:]:
+            chosen = tier
+            if not tier.is_degraded():
+                break
+        if chosen is not self.tiers[start]:
+            metrics.inc(f"router.failover.{self.tiers[start].name}")
+            logger.warning(f"[MODEL_ROUTER] 档位 {self.tiers[start].name} 已降级，{kind} 请求切换到 {chosen.name}")
+        metrics.inc(f"router.route.{kind}.{chosen.name}")
+        return chosen
+
+    def record(self, tier: ModelTier, latency: float, ok: bool, first_token: bool = True):
+        """
+        记录请求结果
+        first_token=True 表示流式请求的首字延迟，参与 p95 降级判断；
+        first_token=False 表示非流式请求（提醒、摘要等）的总耗时，与首字延迟不可比，
+        只计入错误率和单独的 router.total_latency 指标，不影响 p95
+        """
+        tier.record(latency if first_token else None, ok)
+        if ok:
+            series = "latency" if first_token else "total_latency"
+            metrics.observe(f"router.{series}.{tier.name}", latency)
+        else:
+            metrics.inc(f"router.errors.{tier.name}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取各档位健康状况"""
+        return {tier.name: dict(tier.health(), model=tier.model, degraded=tier.is_degraded()) for tier in self.tiers}
+
+
+# 全局共享的模型路由器，所有会话的延迟样本汇总在一起判断上游健康度
+model_router = ModelRouter()
@@ -0,0 +1,175 @@
+import asyncio
+import time
+from typing import AsyncGenerator, Callable, List, Optional
+
+from config.settings import (
+    STREAM_TTFT_TIMEOUT,
+    STREAM_IDLE_TIMEOUT,
+    HEDGE_ENABLED,
+    HEDGE_PERCENTILE,
+    HEDGE_MIN_DELAY,
+    HEDGE_DEFAULT_DELAY
+)
+from utils.logger import logger
+from utils.metrics import metrics
+from .admission_control import AdmissionController
+
+# 一次流式请求：调用后返回逐个产出文本增量的异步生成器
+StreamFactory = Callable[[], AsyncGenerator[str, None]]
+
+
+class StreamDeadlineExceeded(Exception):
+    """流式请求超过首字或字间截止时间"""
+
+    def __init__(self, kind: str, timeout: float):
+        self.kind = kind          # "ttft" 首字超时 / "idle" 字间空闲超时
+        self.timeout = timeout
+        super().__init__(f"{kind} deadline of {timeout:.1f}s exceeded")
+
+
+class UpstreamStatusError(Exception):
+    """上游返回了非 200 状态码"""
+
+    def __init__(self, status_code: int):
+        self.status_code = status_code
+        super().__init__(f"upstream returned HTTP {status_code}")
+
+
+class _Attempt:
+    """一路流式请求及其正在等待的首个增量"""
+
+    def __init__(self, stream: AsyncGenerator[str, None], hedged: bool):
+        self.stream = stream
+        self.hedged = hedged
+        self.first = asyncio.ensure_future(stream.__anext__())
+
+    async def cancel(self):
+        """取消该路请求并关闭其连接"""
+        self.first.cancel()
+        try:
+            await self.first
+        except BaseException:
+            pass
+        try:
+            await self.stream.aclose()
+        except Exception:
+            pass
+
+
+class RequestPolicy:
+    """
+    流式请求策略
+        - 首字截止时间（TTFT）：超过仍未收到首个增量即放弃
+        - 字间空闲截止时间：两个增量之间间隔过长即放弃，避免卡住的上游长期占用会话
+        - 对冲请求（可选）：首字迟迟未到时再发一路相同请求，保留先出字的一路并取消另一路；
+          对冲延迟取最近首字延迟的分位数。对冲请求是一路额外的上游连接，需要不等待地从 admission
+          再取得一个名额，没有空闲名额时不发送（两路并存期间占用两个名额）
+    """
+
+    def __init__(self,
+                 ttft_timeout: float = STREAM_TTFT_TIMEOUT,
+                 idle_timeout: float = STREAM_IDLE_TIMEOUT,
+                 hedge_enabled: bool = HEDGE_ENABLED,
+                 hedge_percentile: float = HEDGE_PERCENTILE,
+                 admission: Optional[AdmissionController] = None,
+                 metric_prefix: str = "llm"):
+        self.ttft_timeout = ttft_timeout
+        self.idle_timeout = idle_timeout
+        self.hedge_enabled = hedge_enabled
+        self.hedge_percentile = hedge_percentile
+        self.admission = admission  # 对冲请求额外占用名额的准入控制器，None 时不限制
+        self.metric_prefix = metric_prefix
+
+    def hedge_delay(self) -> float:
+        """根据历史首字延迟分位数计算对冲请求的发送延迟"""
+        observed = metrics.percentile(f"{self.metric_prefix}.ttft", self.hedge_percentile)
+        delay = observed if observed is not None else HEDGE_DEFAULT_DELAY
+        return min(max(delay, HEDGE_MIN_DELAY), self.ttft_timeout)
+
+    async def stream(self, factory: StreamFactory) -> AsyncGenerator[str, None]:
+        """
+        按策略执行流式请求，产出文本增量
+        超过截止时间时抛出 StreamDeadlineExceeded
+        """
+        start_time = time.monotonic()
+        deadline = start_time + self.ttft_timeout
+        attempts: List[_Attempt] = [_Attempt(factory(), hedged=False)]
+        hedge_at: Optional[float] = start_time + self.hedge_delay() if self.hedge_enabled else None
+        winner: Optional[_Attempt] = None
+        last_error: Optional[BaseException] = None
+        extra_slot = False  # 是否为对冲请求占用了额外的准入名额
+
+        try:
+            # 阶段一：等待首个增量（可能发出对冲请求）
+            while winner is None:
+                now = time.monotonic()
+                pending = [a for a in attempts if not a.first.done()]
+                # 到达对冲时间，或主请求已提前失败时，发出对冲请求
+                if hedge_at is not None and (now >= hedge_at or not pending):
+                    hedge_at = None
+                    if self.admission is not None and not self.admission.try_acquire():
+                        metrics.inc(f"{self.metric_prefix}.hedge.skipped")
+                        logger.info("[REQUEST_POLICY] 没有空闲的上游名额，不发送对冲请求")
+                    else:
+                        extra_slot = self.admission is not None
+                        attempts.append(_Attempt(factory(), hedged=True))
+                        pending = [a for a in attempts if not a.first.done()]
+                        metrics.inc(f"{self.metric_prefix}.hedge.sent")
+                        logger.info("[REQUEST_POLICY] 首字延迟过长，发送对冲请求")
+                if not pending or now >= deadline:
+                    break
+
+                wake_at = deadline if hedge_at is None else min(deadline, hedge_at)
+                done, _ = await asyncio.wait(
+                    [a.first for a in pending],
+                    timeout=max(0.0, wake_at - now),
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                for attempt in attempts:
+                    if attempt.first not in done:
+                        continue
+                    error = attempt.first.exception()
+                    if error is None or isinstance(error, StopAsyncIteration):
+                        winner = attempt
+                        break
+                    last_error = error
+                    logger.warning(f"[REQUEST_POLICY] {'对冲' if attempt.hedged else '主'}请求失败: {error}")
+
+            if winner is None:
+                if last_error is not None and all(a.first.done() for a in attempts):
+                    raise last_error
+                metrics.inc(f"{self.metric_prefix}.deadline.ttft")
+                raise StreamDeadlineExceeded("ttft", self.ttft_timeout)
+
+            # 取消落后的一路，只剩一路上游连接，归还对冲占用的名额
+            for attempt in attempts:
+                if attempt is not winner:
+                    await attempt.cancel()
+            attempts = [winner]
+            if extra_slot:
+                extra_slot = False
+                self.admission.release()
+
+            if winner.first.exception() is not None:
+                # 上游正常结束但没有任何输出
+                return
+            metrics.observe(f"{self.metric_prefix}.ttft", time.monotonic() - start_time)
+            if winner.hedged:
+                metrics.inc(f"{self.metric_prefix}.hedge.won")
+            yield winner.first.result()
+
+            # 阶段二：逐个读取后续增量，受字间空闲截止时间约束
+            while True:
+                try:
+                    item = await asyncio.wait_for(winner.stream.__anext__(), self.idle_timeout)
+                except StopAsyncIteration:
+                    break
+                except asyncio.TimeoutError:
+                    metrics.inc(f"{self.metric_prefix}.deadline.idle")
+                    raise StreamDeadlineExceeded("idle", self.idle_timeout)
+                yield item
+        finally:
+            for attempt in attempts:
+                await attempt.cancel()
+            if extra_slot:
+                self.admission.release()
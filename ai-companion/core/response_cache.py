@@ -0,0 +1,120 @@
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Iterable, Optional
+
+from config.settings import (
+    RESPONSE_CACHE_MAX_ENTRIES,
+    RESPONSE_CACHE_MAX_BYTES,
+    RESPONSE_CACHE_TTL
+)
+from utils.logger import logger
+from utils.metrics import metrics
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_prompt(prompt: str) -> str:
+    """规范化提示词：去除首尾空白、合并连续空白、英文转小写"""
+    return _WHITESPACE_RE.sub(" ", prompt.strip()).lower()
+
+
+def context_fingerprint(messages: Iterable[Dict[str, str]]) -> str:
+    """
+    计算发送给模型的完整消息列表（系统提示词、历史摘要、窗口内的对话和本次提示词）的指纹
+    缓存由所有会话共享，只有上游请求完全相同时才能复用回复，
+    否则会把其它上下文（可能是别的用户的对话）生成的回复交给当前用户
+    """
+    hasher = hashlib.sha256()
+    for message in messages:
+        hasher.update(message["role"].encode('utf-8'))
+        hasher.update(b'\x00')
+        hasher.update(normalize_prompt(message["content"]).encode('utf-8'))
+        hasher.update(b'\x01')
+    return hasher.hexdigest()
+
+
+def make_cache_key(style: str, messages: Iterable[Dict[str, str]]) -> str:
+    """由角色风格和上游消息列表的指纹组成缓存键"""
+    return f"{style}\x00{context_fingerprint(messages)}"
+
+
+class ResponseCache:
+    """
+    AI 回复缓存（线程安全）
+    LRU 淘汰，同时受条目数、总字节数和 TTL 限制
+    """
+
+    def __init__(self,
+                 max_entries: int = RESPONSE_CACHE_MAX_ENTRIES,
+                 max_bytes: int = RESPONSE_CACHE_MAX_BYTES,
+                 ttl: float = RESPONSE_CACHE_TTL):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (回复, 过期时间, 字节数)
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[str]:
+        """查询缓存，命中时返回回复文本"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] < time.monotonic():
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                metrics.inc("response_cache.misses")
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            metrics.inc("response_cache.hits")
+            return entry[0]
+
+    def put(self, key: str, response: str):
+        """写入缓存，超出容量时按 LRU 淘汰"""
+        size = len(key.encode('utf-8')) + len(response.encode('utf-8'))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (response, time.monotonic() + self.ttl, size)
+            self.total_bytes += size
+            while self._entries and (len(self._entries) > self.max_entries or self.total_bytes > self.max_bytes):
+                self._remove(next(iter(self._entries)))
+            metrics.set_gauge("response_cache.bytes", self.total_bytes)
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+
+    def _remove(self, key: str):
+        """移除一条缓存（调用方需持有锁）"""
+        _, _, size = self._entries.pop(key)
+        self.total_bytes -= size
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.total_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+
+# 所有会话共享的回复缓存（快捷工具按钮等固定提示词可以跨会话复用）
+response_cache = ResponseCache()
+logger.debug(f"[RESPONSE_CACHE] 初始化回复缓存: entries={RESPONSE_CACHE_MAX_ENTRIES}, "
+             f"bytes={RESPONSE_CACHE_MAX_BYTES}, ttl={RESPONSE_CACHE_TTL}s")
@@ -0,0 +1,82 @@
+from typing import List, Optional
+
+from config.settings import TTS_SEGMENT_MIN_CHARS, TTS_SEGMENT_MAX_CHARS
+
+# 中文句末标点，出现即可断句
+_CJK_TERMINATORS = "。！？；…\n"
+# 英文句末标点，后面跟空白才断句（避免切开 3.14、e.g. 等）
+_LATIN_TERMINATORS = ".!?;"
+# 紧跟在句末标点后的收尾符号，归入当前句
+_CLOSERS = "”’」』）》】)]\"'"
+# 长句的次级切分点
+_SOFT_BREAKS = "，、,：:"
+
+
+class SentenceSegmenter:
+    """
+    流式分句器
+    接收模型逐块输出的文本，在中文/英文句子边界处切出完整的句子，
+    供语音合成逐句处理；过短的句子与下一句合并，过长的句子在逗号处切分
+    """
+
+    def __init__(self, min_chars: int = TTS_SEGMENT_MIN_CHARS, max_chars: int = TTS_SEGMENT_MAX_CHARS):
+        self.min_chars = min_chars
+        self.max_chars = max_chars
+        self._buffer = ""
+        self._scan_from = 0  # 已扫描过、确认没有断句点的位置
+
+    def feed(self, text: str) -> List[str]:
+        """追加一段文本，返回其中已完整的句子"""
+        self._buffer += text
+        segments = []
+        while True:
+            end = self._find_boundary()
+            if end is None:
+                break
+            segment = self._buffer[:end].strip()
+            self._buffer = self._buffer[end:]
+            self._scan_from = 0
+            if segment:
+                segments.append(segment)
+        return segments
+
+    def flush(self) -> Optional[str]:
+        """输出缓冲区中剩余的文本（流结束时调用）"""
+        segment = self._buffer.strip()
+        self._buffer = ""
+        self._scan_from = 0
+        return segment or None
+
+    def _find_boundary(self) -> Optional[int]:
+        """查找第一个可以断句的位置（返回句子结束的下标），没有则返回 None"""
+        buffer = self._buffer
+        i = self._scan_from
+        while i < len(buffer):
+            ch = buffer[i]
+            end = None
+            if ch in _CJK_TERMINATORS:
+                end = i + 1
+            elif ch in _LATIN_TERMINATORS:
+                if i + 1 >= len(buffer):
+                    # 还不知道后面是不是空白，等待更多文本
+                    break
+                if buffer[i + 1].isspace() or buffer[i + 1] in _CLOSERS:
+                    end = i + 1
+            if end is not None:
+                # 连续的标点和收尾符号归入当前句
+                while end < len(buffer) and (buffer[end] in _CJK_TERMINATORS or buffer[end] in _LATIN_TERMINATORS
+                                             or buffer[end] in _CLOSERS):
+                    end += 1
+                if end >= len(buffer) and buffer[end - 1] not in _CLOSERS and buffer[end - 1] != "\n":
+                    # 标点可能尚未输出完整（如“……”、“？！”），等待更多文本
+                    break
+                if len(buffer[:end].strip()) >= self.min_chars:
+                    return end
+            i += 1
+
+        self._scan_from = min(i, len(buffer))
+        if len(buffer) >= self.max_chars:
+            # 长句：优先在最后一个逗号处切分，否则强制切分
+            cut = max(buffer.rfind(ch, 0, self.max_chars) for ch in _SOFT_BREAKS)
+            return cut + 1 if cut >= self.min_chars else self.max_chars
+        return None
@@ -0,0 +1,286 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+from config.settings import (
+    SESSION_MAX_COUNT,
+    SESSION_IDLE_TTL,
+    SESSION_REAP_INTERVAL,
+    SESSION_MAX_BYTES,
+    INITIAL_MESSAGE
+)
+from config.constants import STORAGE_KEY
+from game.stats_tracker import StatsTracker
+from game.achievements import AchievementManager
+from utils.logger import logger
+from utils.metrics import metrics
+from .chat_manager import ChatManager
+from .state_backend import SessionState, StateBackend
+
+# 没有 Gradio 会话 ID 时（例如直接调用 API）使用的会话
+DEFAULT_SESSION_ID = "default"
+
+# 对话状态在状态后端中的命名空间
+CONVERSATION_NAMESPACE = "conversation"
+
+# 每个会话固定开销的估算值（各管理器对象、字典等）
+_SESSION_OVERHEAD_BYTES = 16 * 1024
+
+
+class UserSession:
+    """
+    单个用户（浏览器会话）的全部状态：对话、学习统计、成就和界面开关
+    统计数据保存在状态后端中，在第一次访问时加载；
+    对话只保存在共享状态后端中（多进程部署），在创建会话时加载
+    """
+
+    def __init__(self, session_id: str, backend: Optional[StateBackend] = None):
+        self.session_id = session_id
+        self.state = SessionState(session_id, backend)
+        self.chat_manager = ChatManager()
+        self.stats_tracker = StatsTracker(self.state)
+        self.achievement_manager = AchievementManager(self.stats_tracker)
+
+        # 界面状态
+        self.learning_active = False
+        self.rest_active = False
+        self.webcam_active = False
+
+        self.created_at = time.monotonic()
+        self.last_seen = self.created_at
+        self.size_bytes = 0  # 最近一次估算的内存占用
+
+        self._restore_conversation()
+        # 【修复 UX-3】默认开启学习模式
+        self.start_learning()
+
+    def start_learning(self):
+        """开始学习：初始化统计数据、签到，并添加初始消息"""
+        self.learning_active = True
+        tracker = self.stats_tracker
+        if not tracker.user_data["firstStudyDate"]:
+            tracker.user_data["firstStudyDate"] = tracker.get_today_str()
+        tracker.user_data["lastStudyDate"] = tracker.get_today_str()
+
+        # 检查签到
+        tracker.handle_check_in()
+
+        # 添加初始消息（从状态后端恢复的会话已经有了）
+        if not len(self.chat_manager.get_chat_history()):
+            self.chat_manager.add_greeting(INITIAL_MESSAGE)
+
+    def stop_learning(self):
+        """结束学习"""
+        self.learning_active = False
+        self.rest_active = False
+
+    def _restore_conversation(self):
+        if not self.state.backend.shared:
+            return
+        saved = self.state.load(CONVERSATION_NAMESPACE)
+        if isinstance(saved, dict):
+            self.chat_manager.restore_state(saved)
+
+    def persist(self):
+        """
+        把对话状态保存到共享状态后端（每轮对话结束、重置对话后调用）
+        进程内后端不保存对话：对话本来就在会话对象中，再存一份压缩副本只会让内存占用不再受 SESSION_MAX_BYTES 约束
+        """
+        if not self.state.backend.shared:
+            return
+        self.state.save(CONVERSATION_NAMESPACE, self.chat_manager.export_state())
+
+    def refresh(self) -> bool:
+        """共享状态后端上其它进程更新过该会话时，重新加载对话与统计数据；返回是否重新加载"""
+        if not self.state.is_stale():
+            return False
+        self.state.revision = None
+        self._restore_conversation()
+        self.stats_tracker.reload()
+        metrics.inc("sessions.reloaded")
+        return True
+
+    def estimate_bytes(self) -> int:
+        """估算会话占用的内存：消息存储（语音只保存引用）和统计数据"""
+        size = _SESSION_OVERHEAD_BYTES
+        size += self.chat_manager.get_chat_history().estimate_bytes()
+        try:
+            size += len(json.dumps(self.stats_tracker.user_data, ensure_ascii=False, default=str).encode('utf-8'))
+        except (TypeError, ValueError):
+            pass
+        return size
+
+    def close(self, release_state: bool = True):
+        """
+        会话被释放：取消尚未开始的语音合成，并处理该会话在状态后端中的数据
+            - 共享后端：保存统计数据，用户的后续请求可能由其它进程处理
+            - 进程内后端：release_state 时删除该会话的全部状态，否则会在内存中一直保留到 STATE_TTL 过期
+        """
+        if self.state.backend.shared:
+            try:
+                self.stats_tracker.save_user_data()
+            except Exception as e:
+                logger.warning(f"[SESSION] 保存会话 {self.session_id[:8]} 的统计数据失败: {str(e)}")
+        elif release_state:
+            self.state.discard(STORAGE_KEY, CONVERSATION_NAMESPACE)
+        self.chat_manager.close()
+
+
+class SessionRegistry:
+    """
+    会话注册表（线程安全）
+    按 Gradio 会话 ID 保存每个用户独立的状态，并限制总占用：
+        - 会话数超过上限时淘汰最久未活动的会话（LRU）
+        - 空闲超过 idle_ttl 的会话由 reap_idle() 定期释放：第一次取会话时在本进程启动回收线程，
+          不依赖应用的启动方式（托管部署时不会运行 app.py 中的调度器）
+        - 按会话估算内存，总量超过 max_bytes 时从最久未活动的会话开始淘汰
+    """
+
+    def __init__(self,
+                 factory: Callable[[str], UserSession] = UserSession,
+                 max_sessions: int = SESSION_MAX_COUNT,
+                 idle_ttl: float = SESSION_IDLE_TTL,
+                 max_bytes: int = SESSION_MAX_BYTES,
+                 reap_interval: float = SESSION_REAP_INTERVAL):
+        self.factory = factory
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.max_bytes = max_bytes
+        self.reap_interval = reap_interval
+        self._lock = threading.Lock()
+        self._sessions: "OrderedDict[str, UserSession]" = OrderedDict()
+        self._total_bytes = 0
+        self._reaper_pid: Optional[int] = None  # 回收线程所在的进程（fork 出的子进程中需要重新启动）
+
+    def get(self, session_id: Optional[str]) -> UserSession:
+        """取出会话（不存在则新建），并记为最近活动"""
+        self._ensure_reaper()
+        session_id = session_id or DEFAULT_SESSION_ID
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None:
+                self._sessions.move_to_end(session_id)
+                session.last_seen = time.monotonic()
+        if session is not None:
+            # 多进程部署时，上一个请求可能由其它进程处理
+            session.refresh()
+            return session
+
+        # 新建会话放在锁外，避免阻塞其它会话
+        created = self.factory(session_id)
+        created.size_bytes = created.estimate_bytes()
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = created
+                self._sessions[session_id] = session
+                self._total_bytes += session.size_bytes
+                metrics.inc("sessions.created")
+            session.last_seen = time.monotonic()
+            evicted = self._evict_over_capacity_locked(keep=session_id)
+        if session is not created:
+            # 其它线程已抢先创建同一会话，状态后端中的数据属于保留下来的会话
+            created.close(release_state=False)
+        self._close_evicted(evicted)
+        return session
+
+    def account(self, session: UserSession):
+        """重新估算会话的内存占用（在对话等会增长状态的操作后调用），总量超限时淘汰其它会话"""
+        size = session.estimate_bytes()
+        with self._lock:
+            if self._sessions.get(session.session_id) is not session:
+                return
+            self._total_bytes += size - session.size_bytes
+            session.size_bytes = size
+            evicted = self._evict_over_capacity_locked(keep=session.session_id)
+        self._close_evicted(evicted)
+
+    def remove(self, session_id: Optional[str]):
+        """释放会话（浏览器页面关闭时调用）"""
+        with self._lock:
+            session = self._sessions.pop(session_id or DEFAULT_SESSION_ID, None)
+            if session is not None:
+                self._total_bytes -= session.size_bytes
+        if session is not None:
+            self._close_evicted([(session, "closed")])
+
+    def reap_idle(self) -> int:
+        """释放空闲过久的会话，并重新估算其余会话的内存占用；返回释放的数量"""
+        now = time.monotonic()
+        with self._lock:
+            expired = [(s, "idle") for s in self._sessions.values() if now - s.last_seen > self.idle_ttl]
+            for session, _ in expired:
+                del self._sessions[session.session_id]
+                self._total_bytes -= session.size_bytes
+            alive = list(self._sessions.values())
+
+        for session in alive:
+            self.account(session)
+        self._close_evicted(expired)
+        return len(expired)
+
+    def _ensure_reaper(self):
+        """启动本进程的空闲会话回收线程（每个进程只启动一次）"""
+        pid = os.getpid()
+        if self.reap_interval <= 0 or self._reaper_pid == pid:
+            return
+        with self._lock:
+            if self._reaper_pid == pid:
+                return
+            self._reaper_pid = pid
+        threading.Thread(target=self._reap_loop, name="session-reaper", daemon=True).start()
+
+    def _reap_loop(self):
+        while True:
+            time.sleep(self.reap_interval)
+            try:
+                released = self.reap_idle()
+                if released:
+                    logger.debug(f"[SESSION] 释放 {released} 个空闲会话")
+            except Exception as e:
+                logger.warning(f"[SESSION] 回收空闲会话出错: {str(e)}")
+
+    def _evict_over_capacity_locked(self, keep: str) -> List:
+        """按 LRU 淘汰超出数量或内存上限的会话（调用方需持有锁），返回被淘汰的会话"""
+        evicted = []
+        for session_id in list(self._sessions):
+            over_count = len(self._sessions) > self.max_sessions
+            over_bytes = self._total_bytes > self.max_bytes
+            if not (over_count or over_bytes):
+                break
+            if session_id == keep:
+                continue
+            session = self._sessions.pop(session_id)
+            self._total_bytes -= session.size_bytes
+            evicted.append((session, "lru" if over_count else "memory"))
+        return evicted
+
+    def _close_evicted(self, evicted: List):
+        """在锁外关闭被淘汰的会话"""
+        for session, reason in evicted:
+            metrics.inc(f"sessions.evicted.{reason}")
+            logger.debug(f"[SESSION] 释放会话 {session.session_id[:8]} ({reason}), 约 {session.size_bytes} bytes")
+            try:
+                session.close()
+            except Exception as e:
+                logger.warning(f"[SESSION] 关闭会话出错: {str(e)}")
+        with self._lock:
+            metrics.set_gauge("sessions.active", len(self._sessions))
+            metrics.set_gauge("sessions.bytes", self._total_bytes)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取会话统计"""
+        with self._lock:
+            count = len(self._sessions)
+            return {
+                "sessions": count,
+                "bytes": self._total_bytes,
+                "avg_bytes": self._total_bytes // count if count else 0
+            }
+
+
+# 进程内的会话注册表
+session_registry = SessionRegistry()
@@ -0,0 +1,164 @@
+import json
+from json.decoder import scanstring
+from typing import List, Optional
+
+# 常用字节常量（避免在热路径中重复构造）
+_NEWLINE = b'\n'
+_CR = 13
+_COLON = 58
+_SPACE = 32
+_DATA_FIELD = b'data:'
+_DONE_MARKER = b'[DONE]'
+_DELTA_KEY = b'"delta"'
+_CONTENT_KEY = b'"content"'
+_WHITESPACE = b' \t\r\n'
+
+
+def _parse_delta_content(payload: bytes) -> Optional[str]:
+    """
+    完整解析 JSON，提取 choices[0].delta.content（慢路径）
+    """
+    try:
+        data = json.loads(payload)
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return None
+    if not isinstance(data, dict):
+        return None
+    choices = data.get('choices')
+    if not choices:
+        return None
+    delta = choices[0].get('delta') or {}
+    return delta.get('content') or None
+
+
+def extract_delta_content(payload: bytes) -> Optional[str]:
+    """
+    从一条 chat.completion.chunk 的 JSON 字节中提取 choices[0].delta.content
+
+    快路径直接在字节上定位 "delta" 对象内的 "content" 字段，只解码这一个字符串，
+    不构建整个字典；遇到多个 choice、字段不在 delta 顶层、非字符串值等
+    无法确定的情况时退回完整的 json.loads，保证结果与慢路径一致。
+    """
+    delta_pos = payload.find(_DELTA_KEY)
+    if delta_pos == -1 or payload.find(_DELTA_KEY, delta_pos + 7) != -1:
+        return _parse_delta_content(payload)
+
+    key_pos = payload.find(_CONTENT_KEY, delta_pos)
+    # content 键必须出现在 delta 对象的第一个 '}' 之前，否则无法确认其归属
+    if key_pos == -1 or key_pos > payload.find(b'}', delta_pos):
+        return _parse_delta_content(payload)
+
+    # 跳过键名、冒号和空白，定位值的起始位置
+    pos = key_pos + len(_CONTENT_KEY)
+    length = len(payload)
+    while pos < length and payload[pos] in _WHITESPACE:
+        pos += 1
+    if pos >= length or payload[pos] != _COLON:
+        return _parse_delta_content(payload)
+    pos += 1
+    while pos < length and payload[pos] in _WHITESPACE:
+        pos += 1
+
+    if payload.startswith(b'null', pos):
+        return None
+    if pos >= length or payload[pos] != 34:  # '"'
+        return _parse_delta_content(payload)
+
+    value_start = pos + 1
+    value_end = payload.find(b'"', value_start)
+    if value_end == -1:
+        return _parse_delta_content(payload)
+
+    if payload.find(b'\\', value_start, value_end) == -1:
+        # 无转义字符：直接解码字节切片
+        content = payload[value_start:value_end].decode('utf-8', errors='replace')
+    else:
+        # 含转义字符：交给标准库的 JSON 字符串扫描器处理
+        try:
+            content, _ = scanstring(payload[value_start:].decode('utf-8', errors='replace'), 0)
+        except (json.JSONDecodeError, ValueError):
+            return _parse_delta_content(payload)
+    return content or None
+
+
+class SSEDecoder:
+    """
+    增量式 SSE（Server-Sent Events）解码器
+
+    直接在字节缓冲区中查找行与事件边界，按需读取任意大小的网络数据块；
+    支持多行 data 字段（按规范以换行拼接）、注释行（以 ':' 开头的 keep-alive）
+    以及 CRLF 行尾。每个事件只提取 choices[0].delta.content 文本增量。
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._data_lines: List[bytes] = []
+        self.done = False           # 是否已收到 [DONE] 结束标记
+        self.event_count = 0        # 已分发的事件数量
+
+    def feed(self, chunk: bytes) -> List[str]:
+        """
+        输入一个网络数据块，返回其中完整事件包含的文本增量列表
+        """
+        if self.done or not chunk:
+            return []
+
+        buffer = self._buffer
+        buffer += chunk
+        deltas: List[str] = []
+        pos = 0
+
+        while not self.done:
+            newline = buffer.find(_NEWLINE, pos)
+            if newline == -1:
+                break
+            line_end = newline
+            if line_end > pos and buffer[line_end - 1] == _CR:
+                line_end -= 1
+
+            if line_end == pos:
+                # 空行：事件边界
+                self._dispatch(deltas)
+            elif buffer[pos] == _COLON:
+                # 注释行（keep-alive），忽略
+                pass
+            elif buffer.startswith(_DATA_FIELD, pos):
+                value_start = pos + 5
+                if value_start < line_end and buffer[value_start] == _SPACE:
+                    value_start += 1
+                self._data_lines.append(bytes(buffer[value_start:line_end]))
+            # 其他字段（event/id/retry）对聊天增量无意义，直接忽略
+
+            pos = newline + 1
+
+        del buffer[:pos]
+        return deltas
+
+    def flush(self) -> List[str]:
+        """
+        流结束时调用，分发最后一个没有以空行结尾的事件
+        """
+        deltas: List[str] = []
+        if self._buffer and not self.done:
+            # 剩余的不完整行视为最后一行
+            deltas.extend(self.feed(b'\n'))
+        if not self.done:
+            self._dispatch(deltas)
+        self._buffer.clear()
+        return deltas
+
+    def _dispatch(self, deltas: List[str]):
+        """分发当前累积的事件"""
+        data_lines = self._data_lines
+        if not data_lines:
+            return
+        payload = data_lines[0] if len(data_lines) == 1 else b'\n'.join(data_lines)
+        data_lines.clear()
+        self.event_count += 1
+
+        if payload.strip() == _DONE_MARKER:
+            self.done = True
+            return
+        content = extract_delta_content(payload)
+        if content:
+            deltas.append(content)
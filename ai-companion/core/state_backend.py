@@ -0,0 +1,296 @@
+import json
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, Iterable, Optional, Tuple
+
+from config.settings import (
+    STATE_BACKEND,
+    STATE_REDIS_URL,
+    STATE_KEY_PREFIX,
+    STATE_TTL,
+    STATE_COMPRESS_MIN_BYTES,
+    STATE_MEMORY_MAX_ENTRIES,
+    STATE_SOCKET_TIMEOUT
+)
+from utils.logger import logger
+from utils.metrics import metrics
+
+# 序列化格式标记（首字节）
+_RAW_JSON = b'J'
+_ZLIB_JSON = b'Z'
+
+# 会话修订号所在的命名空间，任何一次保存都会递增
+_REVISION_NAMESPACE = "rev"
+
+
+def encode_state(value: Any) -> bytes:
+    """紧凑序列化：无空白的 UTF-8 JSON，超过一定大小再做 zlib 压缩"""
+    raw = json.dumps(value, ensure_ascii=False, separators=(',', ':'), default=str).encode('utf-8')
+    if len(raw) < STATE_COMPRESS_MIN_BYTES:
+        return _RAW_JSON + raw
+    compressed = zlib.compress(raw, 6)
+    if len(compressed) >= len(raw):
+        return _RAW_JSON + raw
+    return _ZLIB_JSON + compressed
+
+
+def decode_state(data: bytes) -> Any:
+    """反序列化 encode_state 的结果，格式不正确时抛出 ValueError"""
+    marker, body = data[:1], data[1:]
+    if marker == _ZLIB_JSON:
+        try:
+            body = zlib.decompress(body)
+        except zlib.error as e:
+            raise ValueError(f"corrupted state: {e}")
+    elif marker != _RAW_JSON:
+        raise ValueError("unknown state encoding")
+    return json.loads(body.decode('utf-8'))
+
+
+class StateBackend:
+    """
+    会话状态后端接口：按键存取字节串
+    子类实现 get / set / delete / incr，序列化与键名由 load / save 统一处理
+    """
+
+    name = "base"
+    shared = False  # 是否被多个进程共享（共享时需要按修订号检查本地副本是否过期）
+
+    def __init__(self, prefix: str = STATE_KEY_PREFIX, ttl: int = STATE_TTL):
+        self.prefix = prefix
+        self.ttl = ttl
+
+    def get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: bytes):
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        raise NotImplementedError
+
+    def incr(self, key: str) -> int:
+        """原子递增计数器并返回新值"""
+        raise NotImplementedError
+
+    def reap_expired(self) -> int:
+        """清理过期条目（网络后端由服务端按 TTL 过期，无需清理）"""
+        return 0
+
+    def make_key(self, namespace: str, session_id: str) -> str:
+        return f"{self.prefix}{namespace}:{session_id}"
+
+    def load(self, namespace: str, session_id: str) -> Optional[Any]:
+        """读取并反序列化，不存在或读取失败时返回 None"""
+        try:
+            data = self.get(self.make_key(namespace, session_id))
+        except Exception as e:
+            metrics.inc("state.errors")
+            logger.warning(f"[STATE] 读取 {namespace} 失败 ({self.name}): {str(e)}")
+            return None
+        if data is None:
+            metrics.inc("state.misses")
+            return None
+        try:
+            value = decode_state(data)
+        except ValueError as e:
+            metrics.inc("state.errors")
+            logger.warning(f"[STATE] {namespace} 数据无法解析，忽略: {str(e)}")
+            return None
+        metrics.inc("state.loads")
+        metrics.observe("state.load_bytes", len(data))
+        return value
+
+    def save(self, namespace: str, session_id: str, value: Any) -> Optional[int]:
+        """序列化并保存，返回保存后的会话修订号；保存失败时返回 None"""
+        data = encode_state(value)
+        try:
+            self.set(self.make_key(namespace, session_id), data)
+            revision = self.incr(self.make_key(_REVISION_NAMESPACE, session_id))
+        except Exception as e:
+            metrics.inc("state.errors")
+            logger.warning(f"[STATE] 保存 {namespace} 失败 ({self.name}): {str(e)}")
+            return None
+        metrics.inc("state.saves")
+        metrics.observe("state.save_bytes", len(data))
+        return revision
+
+    def discard(self, session_id: str, namespaces: Iterable[str]):
+        """删除会话在各命名空间中的数据及其修订号，删除失败时只记录日志"""
+        keys = [self.make_key(namespace, session_id) for namespace in namespaces]
+        keys.append(self.make_key(_REVISION_NAMESPACE, session_id))
+        try:
+            for key in keys:
+                self.delete(key)
+        except Exception as e:
+            metrics.inc("state.errors")
+            logger.warning(f"[STATE] 删除会话状态失败 ({self.name}): {str(e)}")
+            return
+        metrics.inc("state.discards")
+
+    def revision(self, session_id: str) -> Optional[int]:
+        """会话当前的修订号，没有记录或读取失败时返回 None"""
+        try:
+            data = self.get(self.make_key(_REVISION_NAMESPACE, session_id))
+        except Exception as e:
+            metrics.inc("state.errors")
+            logger.warning(f"[STATE] 读取修订号失败 ({self.name}): {str(e)}")
+            return None
+        return int(data) if data else None
+
+
+class InProcessStateBackend(StateBackend):
+    """
+    进程内状态后端（线程安全），单进程部署时使用；条目数超过上限时淘汰最久未写入的条目
+    只保存体积有限的学习统计数据，对话不写入这里（见 UserSession.persist）
+    """
+
+    name = "memory"
+
+    def __init__(self, prefix: str = STATE_KEY_PREFIX, ttl: int = STATE_TTL,
+                 max_entries: int = STATE_MEMORY_MAX_ENTRIES):
+        super().__init__(prefix, ttl)
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._data: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()  # key -> (过期时间, 值)
+
+    def _put_locked(self, key: str, value: bytes):
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._data[key]
+                return None
+            return entry[1]
+
+    def set(self, key: str, value: bytes):
+        with self._lock:
+            self._put_locked(key, value)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            entry = self._data.get(key)
+            value = int(entry[1]) + 1 if entry and entry[0] >= time.monotonic() else 1
+            self._put_locked(key, str(value).encode())
+            return value
+
+    def reap_expired(self) -> int:
+        """清理过期条目，返回清理的数量"""
+        now = time.monotonic()
+        with self._lock:
+            expired = [key for key, (expires_at, _) in self._data.items() if expires_at < now]
+            for key in expired:
+                del self._data[key]
+        return len(expired)
+
+
+class RedisStateBackend(StateBackend):
+    """
+    网络键值状态后端（Redis 协议，兼容 Redis / Valkey / KeyDB 等）
+    多个工作进程共享同一份状态，任何进程都能处理任何用户的请求
+    """
+
+    name = "redis"
+    shared = True
+
+    def __init__(self, url: str = STATE_REDIS_URL, prefix: str = STATE_KEY_PREFIX, ttl: int = STATE_TTL,
+                 socket_timeout: float = STATE_SOCKET_TIMEOUT):
+        super().__init__(prefix, ttl)
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("STATE_BACKEND=redis 需要安装 redis 包: pip install redis")
+        # redis-py 客户端自带线程安全的连接池；使用 RESP2 协议，兼容不支持 HELLO 的 Redis 兼容服务
+        self._client = redis.Redis.from_url(url, protocol=2, socket_timeout=socket_timeout,
+                                            socket_connect_timeout=socket_timeout)
+        self.url = url
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self._client.get(key)
+
+    def set(self, key: str, value: bytes):
+        self._client.set(key, value, ex=self.ttl)
+
+    def delete(self, key: str):
+        self._client.delete(key)
+
+    def incr(self, key: str) -> int:
+        pipeline = self._client.pipeline(transaction=True)
+        pipeline.incr(key)
+        pipeline.expire(key, self.ttl)
+        value, _ = pipeline.execute()
+        return int(value)
+
+    def ping(self) -> bool:
+        try:
+            return bool(self._client.ping())
+        except Exception:
+            return False
+
+
+def create_state_backend(kind: str = STATE_BACKEND) -> StateBackend:
+    """按配置创建状态后端，网络后端不可用时退回进程内存储"""
+    if kind == "redis":
+        try:
+            backend = RedisStateBackend()
+        except RuntimeError as e:
+            logger.error(f"[STATE] {str(e)}，使用进程内存储")
+            return InProcessStateBackend()
+        if not backend.ping():
+            logger.warning(f"[STATE] 暂时无法连接 {backend.url}，读写失败时按无状态处理")
+        logger.info(f"[STATE] 使用网络状态后端: {backend.url}")
+        return backend
+    if kind != "memory":
+        logger.warning(f"[STATE] 未知的 STATE_BACKEND={kind}，使用进程内存储")
+    return InProcessStateBackend()
+
+
+class SessionState:
+    """
+    单个会话在状态后端中的存取入口
+    记录本进程最近一次读写时的修订号；共享后端上其它进程保存过该会话后，is_stale() 返回 True
+    """
+
+    def __init__(self, session_id: str, backend: Optional[StateBackend] = None):
+        self.session_id = session_id
+        self.backend = backend or state_backend
+        self.revision: Optional[int] = None
+
+    def load(self, namespace: str) -> Optional[Any]:
+        if self.backend.shared and self.revision is None:
+            self.revision = self.backend.revision(self.session_id)
+        return self.backend.load(namespace, self.session_id)
+
+    def save(self, namespace: str, value: Any):
+        previous = self.revision
+        revision = self.backend.save(namespace, self.session_id, value)
+        if revision is None:
+            return
+        # 修订号不连续说明期间有其它进程写入过，本地的其它数据可能已过期
+        self.revision = revision if previous is None or revision == previous + 1 else -1
+
+    def discard(self, *namespaces: str):
+        self.backend.discard(self.session_id, namespaces)
+        self.revision = None
+
+    def is_stale(self) -> bool:
+        if not self.backend.shared:
+            return False
+        return self.backend.revision(self.session_id) != self.revision
+
+
+# 进程内共享的状态后端
+state_backend = create_state_backend()
@@ -0,0 +1,131 @@
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from dashscope.audio.tts_v2 import SpeechSynthesizer, SpeechSynthesizerObjectPool, ResultCallback, AudioFormat
+
+from config.settings import TTS_POOL_SIZE, TTS_POOL_RETRY_INTERVAL
+from utils.logger import logger
+from utils.metrics import metrics
+
+
+class SynthesizerPool:
+    """
+    语音合成连接池，基于 dashscope SDK 的 SpeechSynthesizerObjectPool（线程安全）
+    复用已建立的 WebSocket 连接，省去每句话重新建立连接的开销：
+        - 借出时 SDK 重置合成器的任务状态，并更新模型、音色、格式和回调；合成结束后不关闭连接，归还后供下一句话使用
+        - 借出时检查连接是否仍然有效，断开或使用过久的连接由 SDK 的后台线程自动重连
+        - 合成出错的合成器先关闭连接再归还，由 SDK 重建
+        - 连接池在第一次使用时创建（多进程模式下在各工作进程中分别创建）；
+          创建失败时退化为每句话新建合成器，retry_interval 秒后重试
+    """
+
+    def __init__(self,
+                 size: int = TTS_POOL_SIZE,
+                 url: Optional[str] = None,
+                 retry_interval: float = TTS_POOL_RETRY_INTERVAL,
+                 metric_prefix: str = "tts_pool"):
+        self.size = size
+        self.url = url
+        self.retry_interval = retry_interval
+        self.metric_prefix = metric_prefix
+        self._lock = threading.Lock()
+        self._pool: Optional[SpeechSynthesizerObjectPool] = None
+        self._retry_at = 0.0
+
+    def _get_pool(self) -> Optional[SpeechSynthesizerObjectPool]:
+        """取得 SDK 连接池，尚未创建时创建；创建失败（或在重试等待期内）返回 None"""
+        with self._lock:
+            if self._pool is None and self.size > 0 and time.monotonic() >= self._retry_at:
+                try:
+                    self._pool = self._create_pool()
+                    logger.info(f"[TTS_POOL] 已建立 {self.size} 个合成连接")
+                except Exception as e:
+                    self._retry_at = time.monotonic() + self.retry_interval
+                    metrics.inc(f"{self.metric_prefix}.create_failed")
+                    logger.warning(f"[TTS_POOL] 创建合成连接池失败，{self.retry_interval}s 内每句话新建连接: {str(e)}")
+            return self._pool
+
+    def _create_pool(self) -> SpeechSynthesizerObjectPool:
+        # SDK 的重连线程不是守护线程，会让进程无法退出；线程的守护属性继承自创建它的线程，因此在守护线程中创建
+        result: Dict[str, Any] = {}
+
+        def create():
+            try:
+                result["pool"] = SpeechSynthesizerObjectPool(max_size=self.size, url=self.url)
+            except Exception as e:
+                result["error"] = e
+
+        creator = threading.Thread(target=create, name="tts-pool-init", daemon=True)
+        creator.start()
+        creator.join()
+        if "error" in result:
+            raise result["error"]
+        return result["pool"]
+
+    def warm_up(self) -> bool:
+        """预先建立连接，返回连接池是否可用"""
+        return self._get_pool() is not None
+
+    def run(self, text: str, callback: ResultCallback, model: str, voice: str, audio_format: AudioFormat):
+        """合成一段文本，阻塞到合成结束，音频帧通过 callback 返回"""
+        pool = self._get_pool()
+        if pool is None:
+            metrics.inc(f"{self.metric_prefix}.fallback")
+            synthesizer = SpeechSynthesizer(model=model, voice=voice, format=audio_format,
+                                            callback=callback, url=self.url)
+            try:
+                synthesizer.streaming_call(text)
+                synthesizer.streaming_complete()  # 一次性合成器，结束后 SDK 自动关闭连接
+            finally:
+                synthesizer.close()
+            return
+
+        synthesizer = pool.borrow_synthesizer(model=model, voice=voice, format=audio_format, callback=callback)
+        metrics.inc(f"{self.metric_prefix}.borrowed")
+        try:
+            synthesizer.streaming_call(text)
+            synthesizer.streaming_complete()
+        except Exception:
+            # 连接状态未知（超时、断开），关闭后归还，SDK 检测到连接断开会重建
+            metrics.inc(f"{self.metric_prefix}.discarded")
+            synthesizer.close()
+            raise
+        finally:
+            # 池已满（借出时池已耗尽、临时新建的合成器）时 SDK 不收回（返回 False，收回时返回 None），需要自己关闭连接
+            if pool.return_synthesizer(synthesizer) is False:
+                synthesizer.close()
+
+    def close(self):
+        """关闭连接池及其空闲连接；之后再次使用时重新创建"""
+        with self._lock:
+            pool, self._pool = self._pool, None
+            self._retry_at = 0.0
+        if pool is None:
+            return
+        # SDK 的 shutdown 只停止重连线程、清空池，不关闭已建立的连接
+        idle = self._idle_synthesizers(pool)
+        pool.shutdown()
+        for synthesizer in idle:
+            try:
+                synthesizer.close()
+            except Exception as e:
+                logger.debug(f"[TTS_POOL] 关闭合成连接出错: {str(e)}")
+
+    @staticmethod
+    def _idle_synthesizers(pool: SpeechSynthesizerObjectPool) -> List[SpeechSynthesizer]:
+        """
+        取出池中的空闲合成器以便关闭连接；SDK 没有公开这个列表，只能读取内部属性，
+        内部结构不符合预期时返回空列表，只调用 shutdown（空闲连接随进程退出关闭）
+        """
+        lock, pool_objects = getattr(pool, "_lock", None), getattr(pool, "_pool", None)
+        if lock is None or not isinstance(pool_objects, list):
+            logger.debug("[TTS_POOL] 无法取得空闲合成连接，只停止连接池")
+            return []
+        with lock:
+            return [o.synthesizer for o in pool_objects if getattr(o, "synthesizer", None) is not None]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取连接池状态"""
+        with self._lock:
+            return {"size": self.size, "active": self._pool is not None}
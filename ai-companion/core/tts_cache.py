@@ -0,0 +1,116 @@
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+
+from config.settings import (
+    TTS_CACHE_DIR,
+    TTS_CACHE_MEMORY_BYTES,
+    TTS_CACHE_DISK_BYTES
+)
+from core.disk_store import DiskStore
+from utils.metrics import metrics
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_AUDIO_SUFFIX = ".audio"
+_DISK_NAME_RE = re.compile(r"^[0-9a-f]{64}\.audio$")
+
+
+def make_tts_cache_key(model: str, voice: str, text: str, audio_format: str = "default") -> str:
+    """由模型、音色、规范化文本和音频格式计算内容哈希，作为缓存键和磁盘文件名"""
+    normalized = _WHITESPACE_RE.sub(" ", text.strip())
+    hasher = hashlib.sha256()
+    for part in (model, voice, audio_format, normalized):
+        hasher.update(part.encode('utf-8'))
+        hasher.update(b'\x00')
+    return hasher.hexdigest()
+
+
+class TTSCache:
+    """
+    语音合成结果缓存（线程安全）
+        - 内存热缓存：LRU，按总字节数淘汰
+        - 磁盘缓存：按内容哈希命名的 DiskStore，原子写入，超出容量时按最近访问时间（mtime）淘汰，进程重启后仍可复用
+    """
+
+    def __init__(self,
+                 cache_dir: str = TTS_CACHE_DIR,
+                 memory_bytes: int = TTS_CACHE_MEMORY_BYTES,
+                 disk_bytes: int = TTS_CACHE_DISK_BYTES):
+        self.cache_dir = cache_dir
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._memory_total = 0
+        self._disk = DiskStore(cache_dir, disk_bytes, _DISK_NAME_RE, "TTS_CACHE", "tts_cache.disk")
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _disk_name(key: str) -> str:
+        return key + _AUDIO_SUFFIX
+
+    def get(self, key: str) -> Optional[bytes]:
+        """查询缓存，先查内存再查磁盘"""
+        with self._lock:
+            audio = self._memory.get(key)
+            if audio is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                metrics.inc("tts_cache.hits.memory")
+                return audio
+
+        name = self._disk_name(key)
+        audio = self._disk.read(name) if self._disk.contains(name) else None
+        with self._lock:
+            if audio is None:
+                self.misses += 1
+                metrics.inc("tts_cache.misses")
+                return None
+            self.hits += 1
+            metrics.inc("tts_cache.hits.disk")
+            self._put_memory(key, audio)
+            return audio
+
+    def put(self, key: str, audio: bytes):
+        """写入内存和磁盘缓存"""
+        if not audio:
+            return
+        with self._lock:
+            self._put_memory(key, audio)
+        self._disk.write(self._disk_name(key), audio)
+
+    def _put_memory(self, key: str, audio: bytes):
+        """写入内存热缓存（调用方需持有锁）"""
+        if len(audio) > self.memory_bytes:
+            return
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_total -= len(old)
+        self._memory[key] = audio
+        self._memory_total += len(audio)
+        while self._memory_total > self.memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_total -= len(evicted)
+        metrics.set_gauge("tts_cache.memory_bytes", self._memory_total)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计"""
+        disk = self._disk.get_stats()
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_total,
+                "disk_entries": disk["files"],
+                "disk_bytes": disk["bytes"],
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+
+# 所有会话共享的语音缓存（问候语、提醒语、快捷工具回复等会被反复合成）
+tts_cache = TTSCache()
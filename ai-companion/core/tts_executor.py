@@ -0,0 +1,152 @@
+import itertools
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, Any, Optional, Set
+
+from config.settings import TTS_WORKERS, TTS_MAX_QUEUE
+from utils.logger import logger
+from utils.metrics import metrics
+
+# 任务优先级：数值越小越先执行
+PRIORITY_ALERT = 0        # 分神/鼓励提醒，晚到就没有意义
+PRIORITY_ON_DEMAND = 5    # 用户点击消息按需播放
+PRIORITY_CHAT = 10        # 聊天回复的逐句合成
+PRIORITY_WARMUP = 20      # 启动预热，空闲时再做
+
+
+class TTSQueueFull(Exception):
+    """语音合成队列已满"""
+
+
+class _Job:
+    """一个排队中的合成任务"""
+
+    __slots__ = ("fn", "args", "future", "voice", "group", "enqueued_at")
+
+    def __init__(self, fn: Callable, args: tuple, voice: str, group: Optional[str]):
+        self.fn = fn
+        self.args = args
+        self.future: Future = Future()
+        self.voice = voice
+        self.group = group
+        self.enqueued_at = time.monotonic()
+
+
+class TTSExecutor:
+    """
+    语音合成专用执行器
+        - 固定数量的工作线程，限制同时进行的合成请求
+        - 有界优先级队列：提醒优先于聊天回复，同优先级先来先服务
+        - 任务可按分组取消：用户发出下一条消息后，上一条回复尚未开始的合成任务直接丢弃
+    """
+
+    def __init__(self, workers: int = TTS_WORKERS, max_queue: int = TTS_MAX_QUEUE):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._sequence = itertools.count()
+        self._start()
+
+    def _start(self):
+        """创建队列并启动工作线程（fork 出的子进程中没有父进程的线程，需要重新启动）"""
+        self._queue: "queue.PriorityQueue" = queue.PriorityQueue()
+        self._lock = threading.Lock()
+        self._groups: Dict[str, Set[Future]] = {}
+        self._threads = [
+            threading.Thread(target=self._worker, name=f"tts-worker-{i}", daemon=True)
+            for i in range(self.workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> int:
+        """
+        停止所有工作线程：等待正在执行的任务结束，取消仍在排队的任务，返回取消的数量
+        多进程模式在 fork 前调用，保证子进程不会继承被其它线程占用的锁
+        """
+        for _ in self._threads:
+            # 停止标记的优先级高于所有任务
+            self._queue.put((-1, next(self._sequence), None))
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        cancelled = 0
+        while True:
+            try:
+                _, _, job = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if job is not None and job.future.cancel():
+                cancelled += 1
+        return cancelled
+
+    def submit(self, fn: Callable, *args, priority: int = PRIORITY_CHAT,
+               voice: str = "default", group: Optional[str] = None) -> Future:
+        """
+        提交一个合成任务，返回 Future；队列已满时抛出 TTSQueueFull
+        voice 用于按音色统计延迟，group 用于批量取消
+        """
+        if self._queue.qsize() >= self.max_queue:
+            metrics.inc("tts.jobs.rejected")
+            logger.warning(f"[TTS_EXECUTOR] 合成队列已满（{self.max_queue}），拒绝任务")
+            raise TTSQueueFull()
+        job = _Job(fn, args, voice, group)
+        if group is not None:
+            with self._lock:
+                self._groups.setdefault(group, set()).add(job.future)
+            job.future.add_done_callback(lambda f: self._forget(group, f))
+        self._queue.put((priority, next(self._sequence), job))
+        metrics.set_gauge("tts.queue_depth", self._queue.qsize())
+        return job.future
+
+    def cancel_group(self, group: str) -> int:
+        """取消分组内所有尚未开始的任务，返回取消的数量"""
+        with self._lock:
+            futures = list(self._groups.get(group, ()))
+        cancelled = sum(1 for future in futures if future.cancel())
+        if cancelled:
+            metrics.inc("tts.jobs.cancelled", cancelled)
+            logger.debug(f"[TTS_EXECUTOR] 取消分组 {group} 中 {cancelled} 个过期任务")
+        return cancelled
+
+    def _forget(self, group: str, future: Future):
+        with self._lock:
+            futures = self._groups.get(group)
+            if futures is not None:
+                futures.discard(future)
+                if not futures:
+                    del self._groups[group]
+
+    def _worker(self):
+        while True:
+            _, _, job = self._queue.get()
+            if job is None:
+                return
+            metrics.set_gauge("tts.queue_depth", self._queue.qsize())
+            # 已被取消的过期任务直接丢弃
+            if not job.future.set_running_or_notify_cancel():
+                continue
+            metrics.observe("tts.queue_wait", time.monotonic() - job.enqueued_at)
+            start_time = time.monotonic()
+            try:
+                result = job.fn(*job.args)
+            except BaseException as e:
+                job.future.set_exception(e)
+            else:
+                job.future.set_result(result)
+            metrics.observe(f"tts.latency.{job.voice}", time.monotonic() - start_time)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取执行器状态"""
+        with self._lock:
+            groups = len(self._groups)
+        return {"queued": self._queue.qsize(), "workers": len(self._threads), "groups": groups}
+
+
+# 全局共享的语音合成执行器
+tts_executor = TTSExecutor()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=tts_executor._start)
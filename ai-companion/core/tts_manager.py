@@ -1,12 +1,68 @@
+import asyncio
 import dashscope
-from dashscope.audio.tts_v2 import SpeechSynthesizer
-import os
+from dashscope.audio.tts_v2 import ResultCallback
+import threading
 import time
-import wave
-from typing import Optional
-from config.settings import DASHSCOPE_API_KEY, TTS_MODEL_ID
-from config.constants import VOICE_MAPPING
+from concurrent.futures import Future, CancelledError, wait
+from typing import Dict, Optional, AsyncGenerator, Tuple
+from config.settings import (
+    DASHSCOPE_API_KEY,
+    TTS_MODEL_ID,
+    TTS_STREAMING_ENABLED,
+    TTS_STREAM_CHUNK_BYTES,
+    TTS_STREAM_FRAME_TIMEOUT,
+    TTS_CACHE_ENABLED
+)
+from config.constants import VOICE_MAPPING, DISTRACTION_REMINDERS, ENCOURAGE_REMINDERS
 from utils.logger import logger
+from utils.audio_processing import process_clip, validate_audio as validate_audio_bytes
+from .tts_cache import tts_cache, make_tts_cache_key
+from .tts_executor import tts_executor, TTSQueueFull, PRIORITY_ALERT, PRIORITY_CHAT, PRIORITY_WARMUP
+from .synthesizer_pool import SynthesizerPool
+from .audio_format import AUDIO_FORMAT, resolve_sdk_format
+
+
+class _StreamingCallback(ResultCallback):
+    """
+    流式合成回调：SDK 在自己的线程中回调，这里把音频帧转交给事件循环中的队列
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, queue: asyncio.Queue):
+        self._loop = loop
+        self._queue = queue
+
+    def _put(self, kind: str, value=None):
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, (kind, value))
+
+    def on_data(self, data: bytes) -> None:
+        self._put("data", data)
+
+    def on_complete(self):
+        self._put("done")
+
+    def on_error(self, message):
+        self._put("error", message)
+
+
+class _CollectingSink(ResultCallback):
+    """收集一整句音频（阻塞合成使用）"""
+
+    def __init__(self):
+        self.audio = bytearray()
+        self.error = None
+
+    def on_data(self, data: bytes):
+        self.audio.extend(data)
+
+    def on_complete(self):
+        pass
+
+    def on_error(self, message):
+        self.error = message
+
+
+# 所有会话共享的合成连接池
+speech_pool = SynthesizerPool()
 
 
 class TTSManager:
@@ -25,6 +81,10 @@ class TTSManager:
             print("[WARNING] 未找DASHSCOPE_API_KEY，语音合成功能将不可用")
             
         self.current_voice = "默认"
+        # 预先合成的提醒语音：(提醒类型, 风格) -> 音频
+        self._alert_clips: Dict[Tuple[str, str], bytes] = {}
+        self._alert_lock = threading.Lock()
+        self._warm_up_started = False
         logger.debug("[TTS_INIT] TTSManager 初始化完成")
         
     def set_voice(self, voice_style: str):
@@ -46,17 +106,23 @@ class TTSManager:
         voice_name = voice or VOICE_MAPPING.get(self.current_voice, "longfeifei_v2")
         logger.debug(f"[TTS_SYNTH] 语音結師: {voice_name}")
             
+        # 相同模型、音色和文本的语音只合成一次
+        cache_key = make_tts_cache_key(TTS_MODEL_ID, voice_name, text, AUDIO_FORMAT.name) if TTS_CACHE_ENABLED else None
+        if cache_key:
+            cached_audio = tts_cache.get(cache_key)
+            if cached_audio is not None:
+                logger.debug(f"[TTS_CACHE] 命中语音缓存: {len(cached_audio)} bytes")
+                return cached_audio
+            
         try:
-            # 使用SpeechSynthesizer生成语音
-            logger.debug(f"[TTS_SYNTH] 创建 SpeechSynthesizer (model={TTS_MODEL_ID})")
-            synthesizer = SpeechSynthesizer(
-                model=TTS_MODEL_ID,
-                voice=voice_name
-            )
-                
-            # 生成语音数据 - 直接调用 call() 方法返回 bytes
-            logger.debug(f"[TTS_SYNTH] 调用 synthesizer.call(text)...")
-            audio_bytes = synthesizer.call(text)
+            # 从连接池借出合成器（复用已建立的连接）
+            logger.debug(f"[TTS_SYNTH] 借出合成连接 (model={TTS_MODEL_ID}, voice={voice_name})")
+            sink = _CollectingSink()
+            speech_pool.run(text, sink, TTS_MODEL_ID, voice_name, resolve_sdk_format())
+            if sink.error is not None:
+                raise RuntimeError(sink.error)
+            # 裁剪首尾静音、统一响度（仅 WAV），处理后的结果写入缓存
+            audio_bytes = process_clip(bytes(sink.audio))
                 
             if audio_bytes:
                 logger.info(f"[TTS_SYNTH] ✅ 语音合成成功, 数据大小: {len(audio_bytes)} bytes")
@@ -67,8 +133,12 @@ class TTSManager:
                     logger.debug("[TTS_SYNTH] 检测到 WAV 格式")
                 elif audio_bytes.startswith(b'ID3') or audio_bytes.startswith(b'\xff\xfb'):
                     logger.debug("[TTS_SYNTH] 检测到 MP3 格式")
+                elif audio_bytes.startswith(b'OggS'):
+                    logger.debug("[TTS_SYNTH] 检测到 Ogg 格式")
                 else:
                     logger.warning(f"[TTS_SYNTH] 未知的音频格式 (\u6557位: {audio_bytes[:4]})")
+                if cache_key:
+                    tts_cache.put(cache_key, audio_bytes)
             else:
                 logger.warning("[TTS_SYNTH] ⚠️ 语音合成返回空数整")
                         
@@ -79,57 +149,208 @@ class TTSManager:
             print(f"[ERROR] 语音合成失败: {str(e)}")
             return None
     
-    def synthesize_alert_speech(self, trigger_val: str, style: str) -> Optional[bytes]:
+    def submit_speech(self, text: str, voice: Optional[str] = None,
+                      priority: int = PRIORITY_CHAT, group: Optional[str] = None) -> Future:
         """
-        为系统主动提醒生成语音（包括分神提醒和情绪鼓励）
+        把合成任务提交到语音合成执行器（按优先级排队），返回 Future
+        队列已满时抛出 TTSQueueFull
         """
-        if not trigger_val:
+        voice_name = voice or VOICE_MAPPING.get(self.current_voice, "longfeifei_v2")
+        return tts_executor.submit(self.synthesize_speech, text, voice_name,
+                                   priority=priority, voice=voice_name, group=group)
+    
+    def synthesize_speech_queued(self, text: str, voice: Optional[str] = None,
+                                 priority: int = PRIORITY_CHAT) -> Optional[bytes]:
+        """经执行器排队合成并等待结果（同步调用方使用），排队失败时返回 None"""
+        try:
+            return self.submit_speech(text, voice, priority).result()
+        except (TTSQueueFull, CancelledError):
             return None
-            
-        # 确定要使用的提醒文本
-        from config.constants import DISTRACTION_REMINDERS, ENCOURAGE_REMINDERS
-        
-        if trigger_val.startswith("distracted_"):
-            # 分神提醒
-            reminder_text = DISTRACTION_REMINDERS.get(style, DISTRACTION_REMINDERS["默认"])
-        elif trigger_val.startswith("encourage_"):
-            # 情绪鼓励
-            reminder_text = ENCOURAGE_REMINDERS.get(style, ENCOURAGE_REMINDERS["默认"])
-        else:
-            # 默认处理
-            reminder_text = DISTRACTION_REMINDERS.get(style, DISTRACTION_REMINDERS["默认"])
-        
-        return self.synthesize_speech(reminder_text, VOICE_MAPPING.get(style))
     
-    def validate_audio(self, audio_bytes: bytes) -> bool:
+    async def synthesize_speech_async(self, text: str, voice: Optional[str] = None,
+                                      priority: int = PRIORITY_CHAT, group: Optional[str] = None) -> Optional[bytes]:
+        """经执行器排队合成并异步等待结果；任务被取消（已过期）或排队失败时返回 None"""
+        try:
+            future = self.submit_speech(text, voice, priority, group)
+        except TTSQueueFull:
+            return None
+        return await self._await_job(future)
+    
+    @staticmethod
+    async def _await_job(future: Future):
         """
-        验证音频数据的有效性
+        在事件循环中等待执行器任务
+        任务被分组取消时返回 None，而不是把取消传播给当前协程
         """
-        if not audio_bytes:
-            return False
+        loop = asyncio.get_running_loop()
+        waiter = loop.create_future()
+        future.add_done_callback(
+            lambda _: loop.call_soon_threadsafe(lambda: waiter.done() or waiter.set_result(None))
+        )
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        if future.cancelled():
+            return None
+        return future.result()
+    
+    async def synthesize_speech_stream(self, text: str, voice: Optional[str] = None,
+                                       priority: int = PRIORITY_CHAT,
+                                       group: Optional[str] = None) -> AsyncGenerator[bytes, None]:
+        """
+        流式生成语音：使用 SDK 的回调接口，音频帧一到达就返回（按 TTS_STREAM_CHUNK_BYTES 合并）
+        合成在语音合成执行器中排队执行；任务被分组取消时静默结束。
+        流式接口失败且尚未产出任何音频时，回退到阻塞的 synthesize_speech
+        """
+        if not TTS_STREAMING_ENABLED or not DASHSCOPE_API_KEY:
+            audio_bytes = await self.synthesize_speech_async(text, voice, priority, group)
+            if audio_bytes:
+                yield audio_bytes
+            return
+            
+        voice_name = voice or VOICE_MAPPING.get(self.current_voice, "longfeifei_v2")
+        cache_key = make_tts_cache_key(TTS_MODEL_ID, voice_name, text, AUDIO_FORMAT.name) if TTS_CACHE_ENABLED else None
+        if cache_key:
+            cached_audio = await asyncio.to_thread(tts_cache.get, cache_key)
+            if cached_audio is not None:
+                logger.debug(f"[TTS_CACHE] 命中语音缓存: {len(cached_audio)} bytes")
+                yield cached_audio
+                return
+            
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        start_time = time.time()
+        sent_bytes = 0
+        buffer = bytearray()
+        complete_audio = bytearray()  # 完整音频，合成成功后写入缓存
+        error = None
+            
+        def run_streaming():
+            # 在工作线程中提交文本并等待合成结束，音频帧通过回调送回事件循环
+            try:
+                speech_pool.run(text, _StreamingCallback(loop, queue), TTS_MODEL_ID, voice_name, resolve_sdk_format())
+            except Exception as e:
+                loop.call_soon_threadsafe(queue.put_nowait, ("error", str(e)))
             
         try:
-            # 尝试将字节数据写入临时WAV文件并验证
-            import tempfile
-            with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as temp_file:
-                temp_file.write(audio_bytes)
-                temp_filename = temp_file.name
-                
-            # 验证WAV文件
-            with wave.open(temp_filename, 'rb') as wav_file:
-                frames = wav_file.getnframes()
-                sample_rate = wav_file.getframerate()
+            worker = tts_executor.submit(run_streaming, priority=priority, voice=voice_name, group=group)
+        except TTSQueueFull:
+            return
+        # 排队期间被取消（用户已发送下一条消息）时通知等待方
+        worker.add_done_callback(
+            lambda f: f.cancelled() and loop.call_soon_threadsafe(queue.put_nowait, ("cancelled", None))
+        )
+        try:
+            while True:
+                try:
+                    kind, value = await asyncio.wait_for(queue.get(), TTS_STREAM_FRAME_TIMEOUT)
+                except asyncio.TimeoutError:
+                    error = f"{TTS_STREAM_FRAME_TIMEOUT}s 内未收到音频帧"
+                    break
+                if kind == "data":
+                    if not sent_bytes and not buffer:
+                        logger.debug(f"[TTS_STREAM] 首帧音频到达: {time.time() - start_time:.2f}s")
+                    buffer.extend(value)
+                    if cache_key:
+                        complete_audio.extend(value)
+                    if len(buffer) >= TTS_STREAM_CHUNK_BYTES:
+                        sent_bytes += len(buffer)
+                        yield bytes(buffer)
+                        buffer.clear()
+                elif kind == "error":
+                    error = value
+                    break
+                elif kind == "cancelled":
+                    logger.debug("[TTS_STREAM] 合成任务已过期，跳过")
+                    return
+                else:
+                    break
                 
-            # 清理临时文件
-            os.unlink(temp_filename)
+            if buffer:
+                sent_bytes += len(buffer)
+                yield bytes(buffer)
+        finally:
+            worker.cancel()
+            
+        if error is not None:
+            logger.error(f"[TTS_STREAM] ❌ 流式合成失败: {error}")
+            if not sent_bytes:
+                # 尚未输出任何音频，回退到阻塞合成
+                audio_bytes = await self.synthesize_speech_async(text, voice_name, priority, group)
+                if audio_bytes:
+                    yield audio_bytes
+            return
+        logger.debug(f"[TTS_STREAM] ✅ 流式合成完成: {sent_bytes} bytes, {time.time() - start_time:.2f}s")
+        if cache_key and complete_audio:
+            await asyncio.to_thread(lambda: tts_cache.put(cache_key, process_clip(bytes(complete_audio))))
+    
+    @staticmethod
+    def _alert_text(alert_type: str, style: str) -> str:
+        """获取提醒类型与风格对应的固定提醒语"""
+        reminders = ENCOURAGE_REMINDERS if alert_type == "encourage" else DISTRACTION_REMINDERS
+        return reminders.get(style, reminders["默认"])
+    
+    def _render_alert_clip(self, alert_type: str, style: str) -> Optional[bytes]:
+        """合成一条提醒语音并常驻内存"""
+        audio_bytes = self.synthesize_speech(self._alert_text(alert_type, style), VOICE_MAPPING.get(style))
+        if audio_bytes:
+            with self._alert_lock:
+                self._alert_clips[(alert_type, style)] = audio_bytes
+        return audio_bytes
+    
+    def warm_up_alerts(self, timeout: Optional[float] = None):
+        """
+        预热提醒语音：以最低优先级提交所有（提醒类型 × 风格）组合的合成任务，
+        在执行器空闲时后台完成，之后的提醒直接从内存返回，无需等待合成
+        指定 timeout 时最多等待该时间直到全部完成（多进程模式在 fork 前预热，工作进程共享结果）
+        """
+        if self._warm_up_started or not DASHSCOPE_API_KEY:
+            return
+        self._warm_up_started = True
             
-            # 检查音频参数是否合理
-            return frames > 0 and sample_rate > 0
+        futures = []
+        for alert_type in ("distracted", "encourage"):
+            reminders = ENCOURAGE_REMINDERS if alert_type == "encourage" else DISTRACTION_REMINDERS
+            for style in reminders:
+                try:
+                    futures.append(tts_executor.submit(self._render_alert_clip, alert_type, style,
+                                                       priority=PRIORITY_WARMUP,
+                                                       voice=VOICE_MAPPING.get(style, "default")))
+                except TTSQueueFull:
+                    break
+        logger.info(f"[TTS_WARMUP] 已提交 {len(futures)} 条提醒语音预热任务")
+        if timeout is not None and futures:
+            done, _ = wait(futures, timeout=timeout)
+            logger.info(f"[TTS_WARMUP] {len(done)}/{len(futures)} 条预热任务在 {timeout}s 内完成, "
+                        f"已缓存 {len(self._alert_clips)} 条提醒语音")
+    
+    def synthesize_alert_speech(self, trigger_val: str, style: str) -> Optional[bytes]:
+        """
+        为系统主动提醒生成语音（包括分神提醒和情绪鼓励）
+        优先使用预热好的语音；预热尚未完成时当场合成（结果同样常驻内存）
+        """
+        if not trigger_val:
+            return None
             
-        except Exception:
-            # 清理临时文件（如果存在）
-            try:
-                os.unlink(temp_filename)
-            except:
-                pass
-            return False
\ No newline at end of file
+        # 触发值形如 distracted_<时间戳> / encourage_<时间戳>，未知类型按分神提醒处理
+        alert_type = "encourage" if trigger_val.startswith("encourage_") else "distracted"
+        if style not in VOICE_MAPPING:
+            style = "默认"
+            
+        clip = self._alert_clips.get((alert_type, style))
+        if clip is not None:
+            return clip
+        logger.debug(f"[TTS_WARMUP] 提醒语音尚未预热，以最高优先级合成: {alert_type}/{style}")
+        try:
+            return tts_executor.submit(self._render_alert_clip, alert_type, style, priority=PRIORITY_ALERT,
+                                       voice=VOICE_MAPPING[style]).result()
+        except TTSQueueFull:
+            return None
+    
+    def validate_audio(self, audio_bytes: bytes) -> bool:
+        """
+        验证音频数据的有效性（直接在内存中解析头部，不落盘）
+        """
+        return validate_audio_bytes(audio_bytes)
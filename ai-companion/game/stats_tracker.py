@@ -1,8 +1,10 @@
+import copy
 import json
 import time
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 from config.constants import LEVEL_CONFIG, ACHIEVEMENT_CONFIG, STORAGE_KEY
+from core.state_backend import SessionState
 from utils.logger import logger
 
 
@@ -11,7 +13,11 @@ class StatsTracker:
     学习统计数据追踪器
     """
     
-    def __init__(self):
+    def __init__(self, state: Optional[SessionState] = None):
+        # 会话状态存取入口，为空时只保存在内存中
+        self.state = state
+        self._user_data: Optional[Dict] = None
+        
         # 默认用户数据
         self.default_data = {
             "points": 0,                    # 总积分（升级积分，只增不减）
@@ -45,26 +51,42 @@ class StatsTracker:
             }
         }
         
-        # 初始化用户数据
-        self.user_data = self.load_user_data()
+    @property
+    def user_data(self) -> Dict:
+        """用户数据，第一次访问时才从状态后端加载"""
+        if self._user_data is None:
+            self._user_data = self.load_user_data()
+        return self._user_data
+    
+    @user_data.setter
+    def user_data(self, value: Dict):
+        self._user_data = value
     
     def load_user_data(self) -> Dict:
-        """从本地存储加载用户数据"""
+        """从状态后端加载用户数据（缺少的字段用默认值补齐）"""
+        data = copy.deepcopy(self.default_data)
+        if self.state is None:
+            return data
         try:
-            # 这里模拟从localStorage加载数据，实际应用中需要通过Gradio接口实现
-            # 目前返回默认数据
-            return self.default_data.copy()
+            stored = self.state.load(STORAGE_KEY)
+            if isinstance(stored, dict):
+                data.update(stored)
         except Exception as e:
-            print(f"加载用户数据失败: {e}")
-            return self.default_data.copy()
+            logger.warning(f"加载用户数据失败: {e}")
+        return data
+    
+    def reload(self):
+        """丢弃内存中的数据，下次访问时重新加载（其它进程更新过该会话时调用）"""
+        self._user_data = None
     
     def save_user_data(self):
-        """保存用户数据到本地存储"""
+        """保存用户数据到状态后端"""
+        if self.state is None or self._user_data is None:
+            return
         try:
-            # 这里模拟保存到localStorage，实际应用中需要通过Gradio接口实现
-            pass
+            self.state.save(STORAGE_KEY, self._user_data)
         except Exception as e:
-            print(f"保存用户数据失败: {e}")
+            logger.warning(f"保存用户数据失败: {e}")
     
     def get_today_str(self) -> str:
         """获取今日日期字符串"""
@@ -0,0 +1,65 @@
+"""
+回复缓存键测试：缓存由所有会话共享，只有发送给模型的完整上下文相同时才能命中
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.ai_agent import AIAgent  # noqa: E402
+from core.message_store import MessageStore  # noqa: E402
+from core.response_cache import ResponseCache, make_cache_key  # noqa: E402
+
+PROMPT = "请给我一些学习建议"
+
+
+def make_agent(*exchanges):
+    """构建一个带有给定对话历史的智能体"""
+    agent = AIAgent(MessageStore())
+    for user_input, reply in exchanges:
+        agent.add_message("user", user_input)
+        agent.add_message("assistant", reply)
+    return agent
+
+
+def key_for(agent: AIAgent, prompt: str = PROMPT) -> str:
+    """按聊天路径的顺序计算缓存键：先加入用户消息，再按上游消息列表计算"""
+    agent.add_message("user", prompt)
+    return agent.get_cache_key(agent.build_messages())
+
+
+def test_same_context_shares_key():
+    first = make_agent(("我叫小明，数学总考不好", "别担心，我们一起找方法。"))
+    second = make_agent(("我叫小明，数学总考不好", "别担心，我们一起找方法。"))
+    assert key_for(first) == key_for(second)
+
+
+def test_different_earlier_context_misses():
+    # 最后一轮对话相同，更早的上下文不同
+    first = make_agent(("我叫小明，数学总考不好", "别担心，我们一起找方法。"), ("谢谢", "不客气！"))
+    second = make_agent(("我在准备英语四级", "好的，先从词汇开始。"), ("谢谢", "不客气！"))
+    first_key, second_key = key_for(first), key_for(second)
+    assert first_key != second_key
+
+    cache = ResponseCache()
+    cache.put(first_key, "小明，数学可以先从错题本开始。")
+    assert cache.get(second_key) is None
+    assert cache.get(first_key) == "小明，数学可以先从错题本开始。"
+
+
+def test_summary_is_part_of_key():
+    messages = [{"role": "system", "content": "你是学习伙伴"}, {"role": "user", "content": PROMPT}]
+    with_summary = messages[:1] + [{"role": "system", "content": "之前的对话摘要：用户叫小明"}] + messages[1:]
+    assert make_cache_key("默认", messages) != make_cache_key("默认", with_summary)
+
+
+def test_style_is_part_of_key():
+    messages = [{"role": "system", "content": "你是学习伙伴"}, {"role": "user", "content": PROMPT}]
+    assert make_cache_key("默认", messages) != make_cache_key("幽默", messages)
+
+
+def test_prompt_normalization():
+    messages = [{"role": "user", "content": PROMPT}]
+    spaced = [{"role": "user", "content": f"  {PROMPT}  "}]
+    assert make_cache_key("默认", messages) == make_cache_key("默认", spaced)
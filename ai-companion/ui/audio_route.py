@@ -0,0 +1,156 @@
+from typing import Any, Optional, Tuple
+
+import gradio as gr
+from starlette.requests import Request
+from starlette.responses import Response
+
+from config.settings import (
+    AUDIO_STORE_DIR,
+    AUDIO_URL_PATH,
+    AUDIO_URL_MAX_AGE,
+    AUDIO_PUBLIC_BASE_URL
+)
+from core.audio_store import audio_store, StoredAudio
+from utils.logger import logger
+from utils.metrics import metrics
+
+# 音频路由是否已注册到当前服务（魔搭创空间模式由平台启动 Gradio，无法注册自定义路由）
+_route_registered = False
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    解析 Range 请求头，返回闭区间 (start, end)
+    只支持单段范围；多段或格式不合法时返回 None（按完整文件响应），范围无法满足时抛出 ValueError
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, sep, last = (part.strip() for part in spec.partition("-"))
+    if not sep or not (first or last) or (first and not first.isdigit()) or (last and not last.isdigit()):
+        return None
+    if first:
+        start = int(first)
+        end = int(last) if last else size - 1
+        if last and end < start:
+            return None
+    else:
+        # bytes=-N：最后 N 个字节
+        suffix = int(last)
+        if suffix == 0:
+            raise ValueError("empty suffix range")
+        start, end = max(0, size - suffix), size - 1
+    if start >= size:
+        raise ValueError("range not satisfiable")
+    return start, min(end, size - 1)
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    """If-None-Match / If-Range 比较（弱比较）"""
+    candidates = [tag.strip() for tag in header.split(",")]
+    return "*" in candidates or any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+def serve_audio(name: str, request: Request) -> Response:
+    """
+    音频文件路由：GET/HEAD {AUDIO_URL_PATH}/{name}
+    文件名即内容哈希，响应带强 ETag 和长期缓存头；支持条件请求（304）和单段 Range 请求（206）
+    """
+    stored = audio_store.lookup(name)
+    if stored is None:
+        metrics.inc("audio_route.not_found")
+        return Response(status_code=404)
+
+    etag = f'"{stored.digest}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={AUDIO_URL_MAX_AGE}, immutable",
+        "Accept-Ranges": "bytes",
+    }
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, etag):
+        metrics.inc("audio_route.not_modified")
+        return Response(status_code=304, headers=headers)
+
+    byte_range = None
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (not if_range or _etag_matches(if_range, etag)):
+        try:
+            byte_range = parse_range(range_header, stored.size)
+        except ValueError:
+            metrics.inc("audio_route.unsatisfiable")
+            headers["Content-Range"] = f"bytes */{stored.size}"
+            return Response(status_code=416, headers=headers)
+
+    start, end = byte_range or (0, stored.size - 1)
+    try:
+        with open(stored.path, 'rb') as f:
+            f.seek(start)
+            body = f.read(end - start + 1)
+    except OSError:
+        metrics.inc("audio_route.not_found")
+        return Response(status_code=404)
+
+    if byte_range is None:
+        metrics.inc("audio_route.full")
+        return Response(body, status_code=200, headers=headers, media_type=stored.mime_type)
+    metrics.inc("audio_route.partial")
+    headers["Content-Range"] = f"bytes {start}-{end}/{stored.size}"
+    return Response(body, status_code=206, headers=headers, media_type=stored.mime_type)
+
+
+def register_audio_route(app):
+    """把音频路由注册到 FastAPI 应用（需在挂载 Gradio 之前调用）"""
+    global _route_registered
+    # 同步处理函数由 FastAPI 放到线程池执行，读文件不阻塞事件循环
+    app.add_api_route(f"{AUDIO_URL_PATH}/{{name}}", serve_audio, methods=["GET", "HEAD"], include_in_schema=False)
+    _route_registered = True
+    logger.info(f"[AUDIO_ROUTE] 音频文件路由已注册: {AUDIO_URL_PATH}/<hash>.<ext>")
+
+
+def allow_store_files():
+    """
+    把音频存储目录登记为 Gradio 静态路径：没有音频路由时，回调返回存储中的文件路径，
+    Gradio 直接提供该文件，不再为每次事件复制一份到自己的缓存目录
+    """
+    set_static_paths = getattr(gr, "set_static_paths", None)
+    if set_static_paths is not None:
+        set_static_paths(paths=[AUDIO_STORE_DIR])
+
+
+def _base_url(request) -> Optional[str]:
+    """对外访问地址：优先取配置，其次按（反向代理）请求头推断"""
+    if AUDIO_PUBLIC_BASE_URL:
+        return AUDIO_PUBLIC_BASE_URL.rstrip("/")
+    if request is None:
+        return None
+    headers = request.headers
+    host = headers.get("x-forwarded-host") or headers.get("host")
+    if not host:
+        return None
+    scheme = (headers.get("x-forwarded-proto") or getattr(getattr(request, "url", None), "scheme", None)
+              or "http").split(",")[0].strip()
+    return f"{scheme}://{host.split(',')[0].strip()}"
+
+
+def audio_url(stored: StoredAudio, request=None) -> Optional[str]:
+    """音频文件的绝对 URL；音频路由未注册或无法确定访问地址时返回 None"""
+    if not _route_registered:
+        return None
+    base = _base_url(request)
+    return f"{base}{AUDIO_URL_PATH}/{stored.name}" if base else None
+
+
+def audio_output(data: Optional[bytes], request=None) -> Any:
+    """
+    把合成音频转换为 gr.Audio 的输出值：
+    优先返回音频 URL（事件响应只带一个链接，浏览器按 URL 缓存并渐进加载），
+    其次返回存储中的文件路径（由 Gradio 提供文件），存储不可用时原样返回字节
+    """
+    if not data:
+        return None
+    stored = audio_store.put(data)
+    if stored is None:
+        return data
+    return audio_url(stored, request) or stored.path
@@ -6,7 +6,10 @@ from .assets import (
     REPORT_BUTTON_HTML, DATA_DASHBOARD_HTML, WEEKLY_REPORT_MODAL_HTML,
     GACHA_PANEL_HTML, INVENTORY_PANEL_HTML
 )
-from config.settings import INITIAL_MESSAGE
+from config.settings import INITIAL_MESSAGE, CHAT_CONCURRENCY_LIMIT
+from config.constants import QUICK_TOOL_PROMPTS
+from core.audio_format import AUDIO_FORMAT
+from .audio_route import allow_store_files
 from utils.logger import logger
 import os
 
@@ -23,6 +26,9 @@ class UILayout:
         """
         创建主界面布局（原版复刻）
         """
+        # 合成音频存放在按内容寻址的存储目录中，允许 Gradio 直接提供这些文件
+        allow_store_files()
+        
         # 加载 JS 文件
         load_js_content = None
         event_handlers_js = None
@@ -195,7 +201,12 @@ class UILayout:
                         
                         # 走神语音提醒触发链路 (使用 CSS 隐藏而非 visible=False，确保 DOM 存在)
                         alert_trigger = gr.Textbox(visible=True, elem_id="alert-trigger", elem_classes=["hidden-component"])
-                        alert_audio = gr.Audio(visible=True, autoplay=True, elem_id="alert-audio", elem_classes=["hidden-component"])
+                        # 语音组件直接下发合成得到的编码音频（TTS_AUDIO_FORMAT），服务端不解码再编码
+                        alert_audio = gr.Audio(visible=True, autoplay=True, type="filepath", format=AUDIO_FORMAT.extension,
+                                               elem_id="alert-audio", elem_classes=["hidden-component"])
+                        # 点击消息按需播放的语音
+                        message_audio = gr.Audio(visible=True, autoplay=True, type="filepath", format=AUDIO_FORMAT.extension,
+                                                 elem_id="message-audio", elem_classes=["hidden-component"])
                     
                     # 播放模式选择面板（初始隐藏）
                     with gr.Group(visible=False, elem_id="playback-mode-group") as playback_mode_group:
@@ -215,11 +226,14 @@ class UILayout:
                         )
                     
                     # 【修复】播放器初始隐藏，勾选语音后才显示
+                    # 流式播放：回复按句合成，每段音频到达后接续播放
                     voice_output = gr.Audio(
                         label="🔊 语音播报",
                         autoplay=True,
+                        streaming=True,
                         visible=False,
-                        type="numpy",
+                        type="filepath",
+                        format=AUDIO_FORMAT.extension,
                         show_label=False,
                         elem_id="voice-output",
                         elem_classes=["compact-player"]
@@ -302,55 +316,66 @@ class UILayout:
                         send_btn = gr.Button("发送", elem_id="send-btn", scale=1)
                         
             # 【编变】绑定回调函数
-            # 绑定发送消息事件
+            # 绑定发送消息事件（异步流式回调，允许多个会话在同一事件循环中并发）
+            # 对话记录保存在服务端会话中，Chatbot 只作为输出，浏览器每次只上传新消息
             send_btn.click(
                 fn=callbacks.get('on_send_message', lambda *args: ([], "", None)),
-                inputs=[msg, chatbot, style_select, voice_toggle],
+                inputs=[msg, style_select, voice_toggle],
                 outputs=[chatbot, msg, voice_output],
-                queue=True
+                queue=True,
+                concurrency_limit=CHAT_CONCURRENCY_LIMIT
             )
             msg.submit(
                 fn=callbacks.get('on_send_message', lambda *args: ([], "", None)),
-                inputs=[msg, chatbot, style_select, voice_toggle],
+                inputs=[msg, style_select, voice_toggle],
                 outputs=[chatbot, msg, voice_output],
-                queue=True
+                queue=True,
+                concurrency_limit=CHAT_CONCURRENCY_LIMIT
             )
             
             # 【修复 UX-1】快捷工具按钮回调 - 自动填充并发送
             from functools import partial
             
-            def auto_send_suggestion(suggestion_text, current_msg, chat_history, style, voice_enabled):
+            async def auto_send_suggestion(suggestion_text, current_msg, style, voice_enabled,
+                                           request: gr.Request = None):
                 # 填充提示词
                 message_to_send = current_msg + suggestion_text if current_msg else suggestion_text
-                # 直接调用发送回调，它是生成器函数
-                yield from callbacks.get('on_send_message', lambda *args: ([], "", None))(
-                    message_to_send, chat_history, style, voice_enabled
-                )
+                send_message = callbacks.get('on_send_message')
+                if send_message is None:
+                    yield [], "", None
+                    return
+                # 直接调用发送回调，它是异步生成器函数
+                async for update in send_message(message_to_send, style, voice_enabled, request):
+                    yield update
             
             advice_btn.click(
-                fn=partial(auto_send_suggestion, "请给我一些学习建议"),
-                inputs=[msg, chatbot, style_select, voice_toggle],
+                fn=partial(auto_send_suggestion, QUICK_TOOL_PROMPTS["advice"]),
+                inputs=[msg, style_select, voice_toggle],
                 outputs=[chatbot, msg, voice_output],
-                queue=True
+                queue=True,
+                concurrency_limit=CHAT_CONCURRENCY_LIMIT
             )
             
             plan_btn.click(
-                fn=partial(auto_send_suggestion, "请帮我制定一个学习计划"),
-                inputs=[msg, chatbot, style_select, voice_toggle],
+                fn=partial(auto_send_suggestion, QUICK_TOOL_PROMPTS["plan"]),
+                inputs=[msg, style_select, voice_toggle],
                 outputs=[chatbot, msg, voice_output],
-                queue=True
+                queue=True,
+                concurrency_limit=CHAT_CONCURRENCY_LIMIT
             )
             
             encourage_btn.click(
-                fn=partial(auto_send_suggestion, "鼓励我坚持学习"),
-                inputs=[msg, chatbot, style_select, voice_toggle],
+                fn=partial(auto_send_suggestion, QUICK_TOOL_PROMPTS["encourage"]),
+                inputs=[msg, style_select, voice_toggle],
                 outputs=[chatbot, msg, voice_output],
-                queue=True
+                queue=True,
+                concurrency_limit=CHAT_CONCURRENCY_LIMIT
             )
             
-            # 【修复 UX-2】清空对话回调
-            def clear_chat_history():
-                return [], ""
+            # 【修复 UX-2】清空对话回调（同时重置服务端保存的对话，否则下一条消息会带回旧记录）
+            def clear_chat_history(request: gr.Request = None):
+                result = callbacks.get('on_reset_click', lambda *args: None)(request)
+                return (result[0] if isinstance(result, tuple) else []), ""
             
             clear_btn.click(
                 fn=clear_chat_history,
@@ -358,8 +383,8 @@ class UILayout:
             )
             
             # 【修复 Phase 3】绑定功能按钮回调
-            def show_checkin_result():
-                result = callbacks.get('on_checkin_click', lambda: "")()
+            def show_checkin_result(request: gr.Request = None):
+                result = callbacks.get('on_checkin_click', lambda *args: "")(request)
                 return result if isinstance(result, str) else result[1] if len(result) > 1 else ""
             
             checkin_button.click(
@@ -382,6 +407,14 @@ class UILayout:
                 outputs=[voice_output]
             )
             
+            # 点击聊天中的助手消息，按需合成并播放该条消息
+            chatbot.select(
+                fn=callbacks.get('on_play_message', lambda *args: None),
+                inputs=[style_select],
+                outputs=[message_audio],
+                queue=True
+            )
+            
             # 修复 P2-1: 绑定分神提醒事件
             alert_trigger.change(
                 fn=callbacks.get('on_alert_trigger', lambda *args: None),
@@ -390,6 +423,10 @@ class UILayout:
                 queue=True
             )
             
+            # 页面关闭时释放该用户的会话状态
+            if 'on_session_end' in callbacks:
+                demo.unload(callbacks['on_session_end'])
+            
         return demo, combined_js
 
 
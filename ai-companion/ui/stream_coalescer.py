@@ -0,0 +1,123 @@
+import json
+import time
+from typing import Any, Optional
+
+from config.settings import (
+    UI_FLUSH_MODE,
+    UI_FLUSH_INTERVAL_MS,
+    UI_FLUSH_MIN_CHARS,
+    UI_FLUSH_MAX_DELAY_MS
+)
+from utils.logger import logger
+from utils.metrics import metrics
+
+# 句子边界字符（中英文标点与换行）
+SENTENCE_BOUNDARIES = frozenset("。！？!?；;…~\n")
+
+
+def estimate_payload_bytes(value: Any) -> int:
+    """估算一个 Gradio 输出值序列化后的字节数"""
+    try:
+        return len(json.dumps(value, ensure_ascii=False).encode('utf-8'))
+    except (TypeError, ValueError):
+        return 0
+
+
+class StreamCoalescer:
+    """
+    UI 流式输出合并器
+
+    将上游的逐 token 增量合并为更少的 Chatbot 更新帧，减少 Gradio 重复序列化
+    与浏览器重渲染。支持以下刷新策略：
+        - "time":     距上次刷新超过 interval_ms 时刷新
+        - "size":     累积未刷新字符数达到 min_chars 时刷新
+        - "sentence": 遇到句子边界时刷新（超过 max_delay_ms 仍未出现边界也会刷新）
+        - "none":     每个增量都刷新（旧行为）
+    首个增量总是立即刷新，保证首字延迟不受影响。
+    """
+
+    def __init__(self,
+                 mode: str = UI_FLUSH_MODE,
+                 interval_ms: int = UI_FLUSH_INTERVAL_MS,
+                 min_chars: int = UI_FLUSH_MIN_CHARS,
+                 max_delay_ms: int = UI_FLUSH_MAX_DELAY_MS,
+                 base_payload_bytes: int = 0):
+        """
+        Args:
+            mode: 刷新策略
+            interval_ms: 时间策略的刷新间隔（毫秒）
+            min_chars: 大小策略的最小刷新字符数
+            max_delay_ms: 句子策略下的最长等待时间（毫秒）
+            base_payload_bytes: 首帧中除当前回复外的负载字节数（历史消息等）；
+                之后的帧由 Gradio 按与上一帧的差异发送，只计入回复新增的部分
+        """
+        if mode not in ("time", "size", "sentence", "none"):
+            logger.warning(f"[UI_STREAM] 未知的刷新策略 {mode}，使用 time")
+            mode = "time"
+        self.mode = mode
+        self.interval = interval_ms / 1000
+        self.min_chars = min_chars
+        self.max_delay = max_delay_ms / 1000
+        self.base_payload_bytes = base_payload_bytes
+
+        self.pending_chars = 0
+        self.last_flush_time: Optional[float] = None
+        self.delta_count = 0
+        self.frames = 0
+        self.bytes_sent = 0
+        self._last_frame_bytes = 0
+
+    def add(self, delta: str) -> bool:
+        """
+        加入一个上游增量，返回是否应当立即刷新到 UI
+        """
+        self.delta_count += 1
+        self.pending_chars += len(delta)
+        now = time.monotonic()
+
+        if self.last_flush_time is None or self.mode == "none":
+            due = True
+        elif self.mode == "time":
+            due = now - self.last_flush_time >= self.interval
+        elif self.mode == "size":
+            due = self.pending_chars >= self.min_chars
+        else:
+            due = (delta[-1:] in SENTENCE_BOUNDARIES
+                   or now - self.last_flush_time >= self.max_delay)
+
+        if due:
+            self.pending_chars = 0
+            self.last_flush_time = now
+        return due
+
+    def flush(self) -> bool:
+        """
+        上游文本已全部生成时调用，返回是否还有未刷新到 UI 的增量（调用方应立即刷新）
+        开启语音时回复的最后一帧要等语音合成结束，不能让尾部文本一直等到那时才显示
+        """
+        if not self.pending_chars:
+            return False
+        self.pending_chars = 0
+        self.last_flush_time = time.monotonic()
+        return True
+
+    def record_frame(self, reply_text: str):
+        """记录一次实际发送到 UI 的帧（帧中包含目前为止的全部文本）"""
+        self.pending_chars = 0
+        reply_bytes = len(reply_text.encode('utf-8'))
+        if self.frames == 0:
+            self.bytes_sent += self.base_payload_bytes + reply_bytes
+        else:
+            self.bytes_sent += max(0, reply_bytes - self._last_frame_bytes)
+        self._last_frame_bytes = reply_bytes
+        self.frames += 1
+
+    def finish(self):
+        """回复结束，导出本次回复的帧数与字节数指标"""
+        metrics.inc("ui_stream.replies")
+        metrics.inc("ui_stream.deltas", self.delta_count)
+        metrics.inc("ui_stream.frames", self.frames)
+        metrics.observe("ui_stream.frames_per_reply", self.frames)
+        metrics.observe("ui_stream.bytes_per_reply", self.bytes_sent)
+        logger.debug(f"[UI_STREAM] 回复完成: 策略={self.mode}, 上游增量={self.delta_count}, "
+                     f"发送帧数={self.frames}, 发送字节≈{self.bytes_sent}")
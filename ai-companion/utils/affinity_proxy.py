@@ -0,0 +1,150 @@
+import os
+import re
+import zlib
+from typing import AsyncIterator, List, Optional
+
+import httpx
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+from config.settings import WORKER_HEALTH_PATH
+from utils.logger import logger
+from utils.metrics import metrics
+
+# 逐跳头部只在单个连接上有效，不能转发
+HOP_BY_HOP_HEADERS = frozenset({
+    b"connection", b"keep-alive", b"proxy-authenticate", b"proxy-authorization",
+    b"te", b"trailer", b"trailers", b"transfer-encoding", b"upgrade"
+})
+
+_PROXY_METHODS = ["GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"]
+
+# Gradio 请求中携带会话 ID 的位置：心跳路径、JSON 请求体
+_HEARTBEAT_PATTERN = re.compile(r"/heartbeat/([^/]+)")
+_SESSION_HASH_PATTERN = re.compile(rb'"session_hash"\s*:\s*"([^"]{1,128})"')
+_AFFINITY_BODY_LIMIT = 64 * 1024  # 只在不超过该大小的请求体中查找会话 ID
+
+
+def affinity_key(request: Request, body: bytes) -> str:
+    """
+    取出请求的亲和键：优先使用 Gradio 会话 ID（查询参数、心跳路径或 JSON 请求体），
+    没有会话 ID 的请求（页面、静态资源、上传等）按客户端地址分配
+    """
+    session_hash = request.query_params.get("session_hash")
+    if session_hash:
+        return session_hash
+    match = _HEARTBEAT_PATTERN.search(request.url.path)
+    if match:
+        return match.group(1)
+    if body and len(body) <= _AFFINITY_BODY_LIMIT:
+        match = _SESSION_HASH_PATTERN.search(body)
+        if match:
+            return match.group(1).decode('utf-8', 'replace')
+    forwarded_for = request.headers.get("x-forwarded-for")
+    if forwarded_for:
+        return forwarded_for.split(",")[0].strip()
+    return request.client.host if request.client else ""
+
+
+class AffinityProxy:
+    """
+    按会话亲和的本地反向代理，运行在多进程模式的路由进程中
+    Gradio 的一次事件由多个请求完成（/queue/join 提交、/queue/data 以 SSE 流式取回结果、
+    /heartbeat 检测页面关闭），它们必须由同一个进程处理，因此不能简单地让工作进程共用一个监听端口：
+    这里按会话 ID 的哈希选择工作进程，同一会话的请求始终转发到同一个进程
+        - 响应按原始字节流式转发，SSE 和 Range 请求不受影响
+        - 目标进程正在重启（连接被拒绝）时转发到下一个进程
+        - 附加 X-Forwarded-For / Host / Proto，工作进程仍能看到真实的客户端地址
+    """
+
+    def __init__(self, upstreams: List[str], connect_timeout: float = 5.0):
+        if not upstreams:
+            raise ValueError("至少需要一个工作进程")
+        self.upstreams = upstreams
+        self.connect_timeout = connect_timeout
+        self._client: Optional[httpx.AsyncClient] = None
+        self.app = Starlette(routes=[
+            Route(WORKER_HEALTH_PATH, self.health, methods=["GET"]),
+            Route("/{path:path}", self.forward, methods=_PROXY_METHODS)
+        ])
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # 在路由进程的事件循环中懒加载；SSE 连接可能持续很久，不限制读取时间和连接数
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(None, connect=self.connect_timeout),
+                limits=httpx.Limits(max_connections=None, max_keepalive_connections=64)
+            )
+        return self._client
+
+    def pick(self, key: str) -> int:
+        """按亲和键选择工作进程的序号"""
+        return zlib.crc32(key.encode('utf-8')) % len(self.upstreams)
+
+    async def health(self, request: Request) -> Response:
+        return JSONResponse({"status": "ok", "role": "router", "pid": os.getpid(), "upstreams": len(self.upstreams)})
+
+    @staticmethod
+    def _upstream_headers(request: Request) -> list:
+        """转发给工作进程的请求头：去掉逐跳头部，附加 X-Forwarded-*"""
+        headers = [(k, v) for k, v in request.headers.raw
+                   if k.lower() not in HOP_BY_HOP_HEADERS and k.lower() != b"content-length"]
+        client_host = request.client.host if request.client else ""
+        forwarded_for = request.headers.get("x-forwarded-for")
+        forwarded_for = f"{forwarded_for}, {client_host}" if forwarded_for else client_host
+        headers = [(k, v) for k, v in headers if k.lower() != b"x-forwarded-for"]
+        headers.append((b"x-forwarded-for", forwarded_for.encode('latin-1')))
+        if "x-forwarded-proto" not in request.headers:
+            headers.append((b"x-forwarded-proto", request.url.scheme.encode('latin-1')))
+        if "x-forwarded-host" not in request.headers and "host" in request.headers:
+            headers.append((b"x-forwarded-host", request.headers["host"].encode('latin-1')))
+        return headers
+
+    @staticmethod
+    async def _relay(response: httpx.Response) -> AsyncIterator[bytes]:
+        """逐块转发响应体，客户端断开时关闭到工作进程的连接"""
+        try:
+            async for chunk in response.aiter_raw():
+                yield chunk
+        finally:
+            await response.aclose()
+
+    async def forward(self, request: Request) -> Response:
+        body = await request.body()
+        start = self.pick(affinity_key(request, body))
+        headers = self._upstream_headers(request)
+        target = request.url.path + (f"?{request.url.query}" if request.url.query else "")
+
+        for attempt in range(len(self.upstreams)):
+            index = (start + attempt) % len(self.upstreams)
+            upstream_request = self.client.build_request(
+                request.method, self.upstreams[index] + target, headers=headers, content=body)
+            try:
+                upstream_response = await self.client.send(upstream_request, stream=True)
+            except httpx.ConnectError:
+                metrics.inc("router.failover")
+                logger.warning(f"[ROUTER] 工作进程 {index} 无法连接，转发到下一个")
+                continue
+            except httpx.TransportError as e:
+                # 请求已发出后工作进程退出，无法确定是否已处理，不再重试
+                metrics.inc("router.errors")
+                logger.warning(f"[ROUTER] 工作进程 {index} 转发失败: {str(e)}")
+                return PlainTextResponse("bad gateway", status_code=502)
+            metrics.inc("router.requests")
+            response = StreamingResponse(self._relay(upstream_response), status_code=upstream_response.status_code)
+            # 原样保留重复的头部（如多个 Set-Cookie）；响应体按原始字节转发，Content-Encoding / Length 仍然有效
+            response.raw_headers = [(k, v) for k, v in upstream_response.headers.raw
+                                    if k.lower() not in HOP_BY_HOP_HEADERS]
+            return response
+
+        metrics.inc("router.unavailable")
+        return PlainTextResponse("no worker available", status_code=503)
+
+    def serve(self, host: str, port: int, log_level: str = "info"):
+        """在当前进程运行路由（阻塞），访问日志由工作进程记录"""
+        logger.info(f"[ROUTER] 监听 {host}:{port}, 转发到 {len(self.upstreams)} 个工作进程")
+        uvicorn.run(self.app, host=host, port=port, log_level=log_level, access_log=False)
@@ -0,0 +1,58 @@
+import asyncio
+import os
+import threading
+from typing import AsyncGenerator, Generator, Optional, TypeVar
+
+T = TypeVar("T")
+
+_background_loop: Optional[asyncio.AbstractEventLoop] = None
+_background_loop_lock = threading.Lock()
+
+
+def get_background_loop() -> asyncio.AbstractEventLoop:
+    """
+    获取后台事件循环（懒加载，在独立守护线程中常驻运行）
+    供同步调用方驱动异步代码使用
+    """
+    global _background_loop
+    if _background_loop is None:
+        with _background_loop_lock:
+            if _background_loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(
+                    target=loop.run_forever,
+                    name="async-bridge-loop",
+                    daemon=True
+                )
+                thread.start()
+                _background_loop = loop
+    return _background_loop
+
+
+def _reset_background_loop():
+    """fork 出的子进程中没有父进程的事件循环线程，丢弃继承来的引用，首次使用时重新创建"""
+    global _background_loop, _background_loop_lock
+    _background_loop = None
+    _background_loop_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_background_loop)
+
+
+def run_async_generator(agen: AsyncGenerator[T, None]) -> Generator[T, None, None]:
+    """
+    将异步生成器包装为同步生成器
+    异步生成器在后台事件循环中执行，调用方线程只负责逐项取回结果
+    """
+    loop = get_background_loop()
+    try:
+        while True:
+            try:
+                item = asyncio.run_coroutine_threadsafe(agen.__anext__(), loop).result()
+            except StopAsyncIteration:
+                break
+            yield item
+    finally:
+        # 调用方提前结束迭代时，确保异步生成器的清理逻辑（关闭连接等）被执行
+        asyncio.run_coroutine_threadsafe(agen.aclose(), loop).result()
@@ -0,0 +1,201 @@
+import struct
+from typing import List, NamedTuple, Optional
+
+import numpy as np
+
+from config.settings import (
+    AUDIO_TRIM_SILENCE,
+    AUDIO_SILENCE_THRESHOLD_DB,
+    AUDIO_SILENCE_KEEP_MS,
+    AUDIO_NORMALIZE,
+    AUDIO_TARGET_DBFS,
+    AUDIO_MAX_GAIN_DB
+)
+
+_FULL_SCALE = 32768.0
+_ANALYSIS_FRAME_MS = 10  # 静音检测的分析帧长
+
+
+class WavInfo(NamedTuple):
+    """WAV 格式信息"""
+    sample_rate: int
+    channels: int
+    sample_width: int   # 每个样本的字节数
+    data_offset: int    # PCM 数据起始位置
+    data_size: int      # PCM 数据字节数（已按实际长度截断）
+
+    @property
+    def frame_count(self) -> int:
+        return self.data_size // (self.channels * self.sample_width)
+
+    @property
+    def duration(self) -> float:
+        return self.frame_count / self.sample_rate if self.sample_rate else 0.0
+
+
+def is_wav(data: bytes) -> bool:
+    return len(data) >= 12 and data[:4] == b'RIFF' and data[8:12] == b'WAVE'
+
+
+def is_mp3(data: bytes) -> bool:
+    """ID3 标签或 MPEG 帧同步字"""
+    return data[:3] == b'ID3' or (len(data) >= 2 and data[0] == 0xFF and (data[1] & 0xE0) == 0xE0)
+
+
+def parse_wav(data: bytes) -> WavInfo:
+    """
+    解析 WAV 头（只读 fmt 与 data 块），格式不正确时抛出 ValueError
+    流式合成的 WAV 头中 data 长度可能是占位值，这里按实际数据长度截断
+    """
+    if not is_wav(data):
+        raise ValueError("not a RIFF/WAVE stream")
+    view = memoryview(data)
+    pos = 12
+    fmt = None
+    while pos + 8 <= len(data):
+        chunk_id = bytes(view[pos:pos + 4])
+        (chunk_size,) = struct.unpack_from('<I', view, pos + 4)
+        body = pos + 8
+        if chunk_id == b'fmt ':
+            if chunk_size < 16:
+                raise ValueError("fmt chunk too short")
+            audio_format, channels, sample_rate, _, _, bits = struct.unpack_from('<HHIIHH', view, body)
+            if audio_format not in (1, 0xFFFE) or bits != 16:
+                raise ValueError(f"unsupported WAV encoding (format={audio_format}, bits={bits})")
+            fmt = (sample_rate, channels, bits // 8)
+        elif chunk_id == b'data':
+            if fmt is None:
+                raise ValueError("data chunk before fmt chunk")
+            size = min(chunk_size, len(data) - body)
+            frame_bytes = fmt[1] * fmt[2]
+            size -= size % frame_bytes
+            return WavInfo(fmt[0], fmt[1], fmt[2], body, size)
+        pos = body + chunk_size + (chunk_size & 1)
+    raise ValueError("no data chunk")
+
+
+def wav_to_array(data: bytes, info: Optional[WavInfo] = None) -> np.ndarray:
+    """把 WAV 的 PCM 数据映射为 int16 数组（形状为 [帧数, 声道数]，零拷贝）"""
+    info = info or parse_wav(data)
+    samples = np.frombuffer(memoryview(data)[info.data_offset:info.data_offset + info.data_size], dtype='<i2')
+    return samples.reshape(-1, info.channels)
+
+
+def array_to_wav(samples: np.ndarray, sample_rate: int) -> bytes:
+    """把 int16 数组编码为 WAV 字节"""
+    samples = np.ascontiguousarray(samples, dtype='<i2')
+    channels = samples.shape[1] if samples.ndim == 2 else 1
+    data_size = samples.nbytes
+    header = struct.pack(
+        '<4sI4s4sIHHIIHH4sI',
+        b'RIFF', 36 + data_size, b'WAVE',
+        b'fmt ', 16, 1, channels, sample_rate, sample_rate * channels * 2, channels * 2, 16,
+        b'data', data_size
+    )
+    return header + samples.tobytes()
+
+
+def validate_audio(data: bytes) -> bool:
+    """校验音频数据：WAV 需要头部合法且包含样本，MP3 需要帧同步字"""
+    if not data:
+        return False
+    if is_wav(data):
+        try:
+            info = parse_wav(data)
+        except (ValueError, struct.error):
+            return False
+        return info.sample_rate > 0 and info.frame_count > 0
+    return is_mp3(data)
+
+
+def audio_duration(data: bytes) -> Optional[float]:
+    """WAV 音频时长（秒），无法确定时返回 None"""
+    try:
+        return parse_wav(data).duration
+    except (ValueError, struct.error):
+        return None
+
+
+def _frame_levels_db(samples: np.ndarray, sample_rate: int) -> np.ndarray:
+    """按 10ms 分帧计算每帧 RMS 电平（dBFS）"""
+    frame_len = max(1, sample_rate * _ANALYSIS_FRAME_MS // 1000)
+    mono = samples.astype(np.float32).mean(axis=1) if samples.ndim == 2 else samples.astype(np.float32)
+    frame_count = len(mono) // frame_len
+    if frame_count == 0:
+        return np.empty(0, dtype=np.float32)
+    frames = mono[:frame_count * frame_len].reshape(frame_count, frame_len)
+    rms = np.sqrt(np.mean(np.square(frames), axis=1)) / _FULL_SCALE
+    return 20 * np.log10(np.maximum(rms, 1e-10))
+
+
+def trim_silence(samples: np.ndarray, sample_rate: int,
+                 threshold_db: float = AUDIO_SILENCE_THRESHOLD_DB,
+                 keep_ms: int = AUDIO_SILENCE_KEEP_MS) -> np.ndarray:
+    """裁剪首尾静音（返回原数组的切片，不复制），全是静音时原样返回"""
+    levels = _frame_levels_db(samples, sample_rate)
+    voiced = np.flatnonzero(levels > threshold_db)
+    if voiced.size == 0:
+        return samples
+    frame_len = max(1, sample_rate * _ANALYSIS_FRAME_MS // 1000)
+    keep = sample_rate * keep_ms // 1000
+    start = max(0, int(voiced[0]) * frame_len - keep)
+    end = min(len(samples), (int(voiced[-1]) + 1) * frame_len + keep)
+    return samples[start:end]
+
+
+def normalize_loudness(samples: np.ndarray,
+                       target_dbfs: float = AUDIO_TARGET_DBFS,
+                       max_gain_db: float = AUDIO_MAX_GAIN_DB) -> np.ndarray:
+    """按 RMS 把响度调整到目标电平，增益受上限和峰值（不削波）约束"""
+    if samples.size == 0:
+        return samples
+    as_float = samples.astype(np.float32)
+    rms = float(np.sqrt(np.mean(np.square(as_float))))
+    peak = float(np.max(np.abs(as_float)))
+    if rms <= 0 or peak <= 0:
+        return samples
+    gain_db = min(target_dbfs - 20 * np.log10(rms / _FULL_SCALE), max_gain_db)
+    gain = min(10 ** (gain_db / 20), (_FULL_SCALE - 1) / peak)
+    if abs(gain - 1.0) < 0.01:
+        return samples
+    return np.clip(np.rint(as_float * gain), -_FULL_SCALE, _FULL_SCALE - 1).astype('<i2')
+
+
+def process_clip(data: bytes) -> bytes:
+    """
+    合成结果后处理：裁剪首尾静音并做响度归一化
+    只处理 16-bit PCM WAV，其它格式或无法解析的数据原样返回
+    """
+    if not (AUDIO_TRIM_SILENCE or AUDIO_NORMALIZE) or not is_wav(data):
+        return data
+    try:
+        info = parse_wav(data)
+    except (ValueError, struct.error):
+        return data
+    samples = wav_to_array(data, info)
+    processed = samples
+    if AUDIO_TRIM_SILENCE:
+        processed = trim_silence(processed, info.sample_rate)
+    if AUDIO_NORMALIZE:
+        processed = normalize_loudness(processed)
+    if processed is samples:
+        return data
+    return array_to_wav(processed, info.sample_rate)
+
+
+def concat_audio(segments: List[bytes]) -> bytes:
+    """
+    拼接多段音频：参数一致的 WAV 合并样本并重写头部，
+    MP3 等按帧组织的格式直接按字节拼接
+    """
+    segments = [s for s in segments if s]
+    if not segments:
+        return b""
+    if len(segments) == 1 or not all(is_wav(s) for s in segments):
+        return b"".join(segments)
+    infos = [parse_wav(s) for s in segments]
+    first = infos[0]
+    if any((i.sample_rate, i.channels) != (first.sample_rate, first.channels) for i in infos):
+        raise ValueError("cannot concatenate WAV segments with different formats")
+    samples = np.concatenate([wav_to_array(s, i) for s, i in zip(segments, infos)])
+    return array_to_wav(samples, first.sample_rate)
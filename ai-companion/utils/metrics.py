@@ -0,0 +1,120 @@
+import threading
+import time
+from collections import deque
+from typing import Dict, Any, Optional
+
+from utils.logger import logger
+
+
+class Histogram:
+    """
+    滑动窗口直方图，保留最近 window 个样本用于计算分位数
+    """
+
+    def __init__(self, window: int = 1000):
+        self._samples = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value: float):
+        """记录一个样本"""
+        self._samples.append(value)
+        self.count += 1
+        self.total += value
+
+    @staticmethod
+    def _pick(ordered, pct: float) -> float:
+        """从已排序样本中取分位数"""
+        index = min(len(ordered) - 1, max(0, int(round(pct / 100 * (len(ordered) - 1)))))
+        return ordered[index]
+
+    def percentile(self, pct: float) -> Optional[float]:
+        """计算窗口内样本的分位数（pct 取 0-100），无样本时返回 None"""
+        if not self._samples:
+            return None
+        return self._pick(sorted(self._samples), pct)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """获取统计快照"""
+        if not self._samples:
+            return {"count": self.count}
+        ordered = sorted(self._samples)
+        pick = lambda pct: self._pick(ordered, pct)
+
+        return {
+            "count": self.count,
+            "avg": round(self.total / self.count, 4),
+            "p50": round(pick(50), 4),
+            "p95": round(pick(95), 4),
+            "p99": round(pick(99), 4),
+            "max": round(ordered[-1], 4)
+        }
+
+
+class MetricsRegistry:
+    """
+    进程内指标注册表（线程安全）
+    支持计数器、瞬时值和直方图，可通过 snapshot() 导出
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, float] = {}
+        self._gauges: Dict[str, float] = {}
+        self._histograms: Dict[str, Histogram] = {}
+        self._next_report = 0.0
+
+    def inc(self, name: str, amount: float = 1):
+        """计数器累加"""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def set_gauge(self, name: str, value: float):
+        """设置瞬时值"""
+        with self._lock:
+            self._gauges[name] = value
+
+    def observe(self, name: str, value: float):
+        """向直方图记录一个样本"""
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram()
+            histogram.observe(value)
+
+    def get_counter(self, name: str) -> float:
+        """读取计数器当前值"""
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def percentile(self, name: str, pct: float) -> Optional[float]:
+        """读取直方图分位数"""
+        with self._lock:
+            histogram = self._histograms.get(name)
+            return histogram.percentile(pct) if histogram else None
+
+    def snapshot(self) -> Dict[str, Any]:
+        """导出所有指标"""
+        with self._lock:
+            return {
+                "counters": dict(self._counters),
+                "gauges": dict(self._gauges),
+                "histograms": {name: h.snapshot() for name, h in self._histograms.items()}
+            }
+
+    def report_if_due(self, interval: float) -> bool:
+        """
+        距上次导出超过 interval 秒时把快照写入日志，返回是否导出
+        可以在请求路径上随时调用：多个调用方共用同一个节奏，同一时段只有一个会导出
+        """
+        now = time.monotonic()
+        with self._lock:
+            if now < self._next_report:
+                return False
+            self._next_report = now + interval
+        logger.info(f"[METRICS] {self.snapshot()}")
+        return True
+
+
+# 导出全局实例
+metrics = MetricsRegistry()
@@ -0,0 +1,217 @@
+import gc
+import http.client
+import os
+import signal
+import time
+from typing import Callable, List, Optional, Tuple
+
+from config.settings import (
+    WORKER_HEALTH_PATH,
+    WORKER_HEALTH_INTERVAL,
+    WORKER_HEALTH_TIMEOUT,
+    WORKER_HEALTH_MAX_FAILURES,
+    WORKER_STARTUP_GRACE,
+    WORKER_RESTART_BACKOFF_MAX,
+    WORKER_GRACEFUL_TIMEOUT
+)
+from utils.logger import logger
+
+# 监控循环的轮询间隔（秒）
+_POLL_INTERVAL = 0.5
+
+
+class ChildProcess:
+    """由主进程管理的一个子进程（工作进程或路由进程）"""
+
+    def __init__(self, name: str, target: Callable[[], None], health_address: Optional[Tuple[str, int]] = None):
+        self.name = name
+        self.target = target
+        self.health_address = health_address  # 健康检查地址 (host, port)，为 None 时不检查
+        self.pid: Optional[int] = None
+        self.started_at = 0.0
+        self.restart_at: Optional[float] = None
+        self.crashes = 0          # 连续崩溃次数（进程稳定运行超过启动宽限期后清零）
+        self.health_failures = 0  # 连续健康检查失败次数
+
+
+class PreforkSupervisor:
+    """
+    预派生（pre-fork）进程管理器，只负责启动和监控子进程，本身不处理请求
+        - 调用方在 run() 之前完成导入模块、构建界面等初始化，子进程以写时复制方式共享这些内存
+        - 子进程退出后自动重启；启动后很快就退出视为崩溃，按指数退避延迟重启
+        - 定期请求子进程的健康检查接口，连续失败（进程卡死）时强制结束并重启
+        - 收到 SIGTERM / SIGINT 时通知所有子进程退出，超时后强制结束
+    fork 前进程内不能有其它线程在运行，否则子进程可能继承被占用的锁
+    """
+
+    def __init__(self,
+                 health_path: str = WORKER_HEALTH_PATH,
+                 health_interval: float = WORKER_HEALTH_INTERVAL,
+                 health_timeout: float = WORKER_HEALTH_TIMEOUT,
+                 max_health_failures: int = WORKER_HEALTH_MAX_FAILURES,
+                 startup_grace: float = WORKER_STARTUP_GRACE,
+                 backoff_max: float = WORKER_RESTART_BACKOFF_MAX,
+                 graceful_timeout: float = WORKER_GRACEFUL_TIMEOUT):
+        self.health_path = health_path
+        self.health_interval = health_interval
+        self.health_timeout = health_timeout
+        self.max_health_failures = max_health_failures
+        self.startup_grace = startup_grace
+        self.backoff_max = backoff_max
+        self.graceful_timeout = graceful_timeout
+        self.children: List[ChildProcess] = []
+        self._stopping = False
+
+    def add(self, name: str, target: Callable[[], None], health_address: Optional[Tuple[str, int]] = None):
+        """登记一个子进程：target 在子进程中运行（通常一直阻塞到进程退出）"""
+        self.children.append(ChildProcess(name, target, health_address))
+
+    def run(self):
+        """启动所有子进程并进入监控循环，直到收到停止信号后关闭所有子进程"""
+        if not hasattr(os, "fork"):
+            raise RuntimeError("当前平台不支持 fork")
+        # 把初始化阶段创建的对象移出垃圾回收的跟踪范围，避免子进程里的 GC 写这些对象导致内存页被复制
+        gc.collect()
+        gc.freeze()
+
+        previous_handlers = {
+            signum: signal.signal(signum, self._on_signal) for signum in (signal.SIGTERM, signal.SIGINT)
+        }
+        logger.info(f"[PREFORK] 主进程 pid={os.getpid()}, 启动 {len(self.children)} 个子进程")
+        try:
+            for child in self.children:
+                self._spawn(child)
+            next_health_check = time.monotonic() + self.health_interval
+            while not self._stopping:
+                self._reap()
+                self._restart_due()
+                if time.monotonic() >= next_health_check:
+                    self._check_health()
+                    next_health_check = time.monotonic() + self.health_interval
+                time.sleep(_POLL_INTERVAL)
+        finally:
+            self._shutdown()
+            for signum, handler in previous_handlers.items():
+                signal.signal(signum, handler)
+
+    def _on_signal(self, signum, frame):
+        logger.info(f"[PREFORK] 收到信号 {signum}，准备停止")
+        self._stopping = True
+
+    def _spawn(self, child: ChildProcess):
+        pid = os.fork()
+        if pid == 0:
+            # 子进程：恢复默认信号处理（服务器会安装自己的优雅退出处理），运行结束后直接退出
+            code = 0
+            try:
+                signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                signal.signal(signal.SIGINT, signal.SIG_DFL)
+                child.target()
+            except SystemExit as e:
+                code = e.code if isinstance(e.code, int) else 1
+            except BaseException:
+                logger.error(f"[PREFORK] {child.name} 异常退出", exc_info=True)
+                code = 1
+            finally:
+                os._exit(code)
+
+        child.pid = pid
+        child.started_at = time.monotonic()
+        child.restart_at = None
+        child.health_failures = 0
+        logger.info(f"[PREFORK] 启动 {child.name} (pid={pid})")
+
+    def _find(self, pid: int) -> Optional[ChildProcess]:
+        for child in self.children:
+            if child.pid == pid:
+                return child
+        return None
+
+    def _reap(self):
+        """回收已退出的子进程，并安排重启"""
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            child = self._find(pid)
+            if child is None:
+                continue
+            child.pid = None
+            if self._stopping:
+                continue
+
+            now = time.monotonic()
+            # 稳定运行过一段时间后再退出的不算连续崩溃
+            child.crashes = 0 if now - child.started_at > self.startup_grace else child.crashes + 1
+            delay = min(self.backoff_max, 0.5 * 2 ** child.crashes) if child.crashes else 0.0
+            child.restart_at = now + delay
+            logger.warning(f"[PREFORK] {child.name} (pid={pid}) 已退出, code={os.waitstatus_to_exitcode(status)}, "
+                           f"{delay:.1f}s 后重启")
+
+    def _restart_due(self):
+        now = time.monotonic()
+        for child in self.children:
+            if child.pid is None and child.restart_at is not None and now >= child.restart_at:
+                self._spawn(child)
+
+    def _probe(self, address: Tuple[str, int]) -> bool:
+        """请求一次健康检查接口，返回是否正常"""
+        connection = http.client.HTTPConnection(address[0], address[1], timeout=self.health_timeout)
+        try:
+            connection.request("GET", self.health_path)
+            response = connection.getresponse()
+            response.read()
+            return response.status == 200
+        except (OSError, http.client.HTTPException):
+            return False
+        finally:
+            connection.close()
+
+    def _check_health(self):
+        """检查所有已过启动宽限期的子进程，连续失败的强制结束（随后由 _reap 重启）"""
+        now = time.monotonic()
+        for child in self.children:
+            if child.pid is None or child.health_address is None or now - child.started_at < self.startup_grace:
+                continue
+            if self._probe(child.health_address):
+                child.health_failures = 0
+                continue
+            child.health_failures += 1
+            logger.warning(f"[PREFORK] {child.name} (pid={child.pid}) 健康检查失败 "
+                           f"({child.health_failures}/{self.max_health_failures})")
+            if child.health_failures >= self.max_health_failures:
+                logger.error(f"[PREFORK] {child.name} (pid={child.pid}) 无响应，强制重启")
+                self._kill(child.pid, signal.SIGKILL)
+
+    @staticmethod
+    def _kill(pid: int, signum: int):
+        try:
+            os.kill(pid, signum)
+        except ProcessLookupError:
+            pass
+
+    def _shutdown(self):
+        """通知所有子进程退出，超时后强制结束"""
+        self._stopping = True
+        alive = [child for child in self.children if child.pid is not None]
+        for child in alive:
+            self._kill(child.pid, signal.SIGTERM)
+
+        deadline = time.monotonic() + self.graceful_timeout
+        while any(child.pid is not None for child in self.children) and time.monotonic() < deadline:
+            self._reap()
+            time.sleep(0.1)
+
+        for child in self.children:
+            if child.pid is not None:
+                logger.warning(f"[PREFORK] {child.name} (pid={child.pid}) 未能按时退出，强制结束")
+                self._kill(child.pid, signal.SIGKILL)
+                try:
+                    os.waitpid(child.pid, 0)
+                except ChildProcessError:
+                    pass
+                child.pid = None
+        logger.info("[PREFORK] 所有子进程已停止")